@@ -1,10 +1,23 @@
 """
 Admin panel configuration for the Voyage app.
 """
-from django.db.models import Avg
+from urllib.parse import urlencode
+
+from django.db.models import Count, Q
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.html import format_html
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from .utils import (
+    analytics,
+    rollup_average,
+    subquery_count,
+    subquery_rollup_avg,
+    subquery_sum,
+)
+from .utils.grading import MAX_GRADE
+from .utils.pagination import EstimatedCountPaginator, KeysetChangeList
 from .models import (
     Faculty,
     Content,
@@ -13,7 +26,24 @@ from .models import (
     Student,
     Assignment,
     StudentAssignment,
+    StudentRepository,
+    FacultyCourse,
+    ProgramCourseRollup,
+    StudentCourseRollup,
 )
+from .tasks import enqueue, provision_repositories
+
+
+def count_link(count, model, **params):
+    """
+    Returns count linked to the model's changelist filtered by params, or 0.
+    Multi-relation params must be registered in the target admin's list_filter.
+    """
+    if not count:
+        return 0
+    opts = model._meta
+    url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+    return format_html('<a href="{}?{}">{}</a>', url, urlencode(params), count)
 
 
 @admin.register(Faculty)
@@ -31,50 +61,164 @@ class FacultyAdmin(admin.ModelAdmin):
         "num_assignments_by_faculty",
     )
 
+    list_select_related = ("user",)
+
+    def get_queryset(self, request):
+        """
+        annotates per-row counts so the changelist runs a fixed number of queries
+        """
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                courses_count=subquery_count(FacultyCourse.objects.all(), "faculty"),
+                graded_count=subquery_count(
+                    StudentAssignment.objects.filter(grade__isnull=False), "reviewer"
+                ),
+                assignments_count=subquery_count(
+                    Assignment.objects.all(), "content__faculty"
+                ),
+            )
+        )
+
     def num_courses_taught(self, obj):
         """
         Returns the number of courses taught by the faculty.
         """
-        courses = obj.courses()
-        ids = [i.id for i in courses]
-        if courses:
-            html = '<a href="/admin/voyage/course/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(courses)}</a>')
-        return 0
+        return count_link(
+            obj.courses_count, Course, assignment__content__faculty__id__exact=obj.pk
+        )
 
     num_courses_taught.short_description = "Courses Taught"
+    num_courses_taught.admin_order_field = "courses_count"
 
     def num_assignments_graded(self, obj):
         """
         Returns number of assignments that have been graded
         """
-        assignments = obj.assignments_graded()
-        ids = [i.id for i in assignments]
-        if assignments:
-            html = '<a href="/admin/voyage/studentassignment/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(assignments)}</a>')
-
-        return 0
+        return count_link(
+            obj.graded_count,
+            StudentAssignment,
+            reviewer__id__exact=obj.pk,
+            grade__isnull=False,
+        )
 
     num_assignments_graded.short_description = "Assignments Graded"
+    num_assignments_graded.admin_order_field = "graded_count"
 
     def num_assignments_by_faculty(self, obj):
         """
         Returns the total number of assignments associated with the faculty.
         """
-        assignments = obj.num_assignments()
-        ids = [a.id for a in assignments]
-        if assignments:
-            html = '<a href="/admin/voyage/assignment/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(assignments)}</a>')
+        return count_link(
+            obj.assignments_count, Assignment, content__faculty__id__exact=obj.pk
+        )
 
-        return 0
+    num_assignments_by_faculty.admin_order_field = "assignments_count"
+
+
+class GradeStatisticsMixin:
+    """
+    Adds grade distribution columns to a changelist, computed for the whole
+    page in one pass by utils/analytics.py rather than a query per row
+    """
+
+    statistics_scope = None
+
+    def get_changelist_instance(self, request):
+        """
+        attaches the statistics of each row on the page as obj.grade_stats
+        """
+        changelist = super().get_changelist_instance(request)
+        rows = list(changelist.result_list)
+        stats = analytics.grade_statistics(
+            self.statistics_scope, [obj.pk for obj in rows]
+        )
+        for obj in rows:
+            obj.grade_stats = stats.get(obj.pk)
+        return changelist
+
+    def median_grade(self, obj):
+        """
+        median of the graded submissions
+        """
+        stats = getattr(obj, "grade_stats", None)
+        return stats["median"] if stats else None
+
+    def grade_spread(self, obj):
+        """
+        standard deviation and interquartile range of the grades
+        """
+        stats = getattr(obj, "grade_stats", None)
+        if not stats or stats["std"] is None:
+            return None
+        return "σ {} · {}–{}".format(stats["std"], stats["p25"], stats["p75"])
+
+    def grade_histogram(self, obj):
+        """
+        grades in buckets of analytics.BUCKET_WIDTH points, counts on hover
+        """
+        stats = getattr(obj, "grade_stats", None)
+        if not stats:
+            return None
+        return format_html(
+            '<span title="{}">{}</span>',
+            " ".join(map(str, stats["histogram"])),
+            analytics.sparkline(stats["histogram"]),
+        )
+
+    grade_histogram.short_description = "Distribution"
+
+    def late_submissions(self, obj):
+        """
+        submissions after the due date, with the median latency on hover
+        """
+        stats = getattr(obj, "grade_stats", None)
+        if not stats:
+            return None
+        return format_html(
+            '<span title="median {} h after due">{} of {}</span>',
+            stats["latency_median"],
+            stats["late"],
+            stats["submitted"],
+        )
+
+    late_submissions.short_description = "Late"
+
+
+class AverageGradeFilter(admin.SimpleListFilter):
+    """
+    Filters students by their annotated average grade
+    """
+
+    title = "average grade"
+    parameter_name = "avg_grade"
+
+    ranges = {
+        "lt60": {"avg_grade__lt": 60},
+        "60to80": {"avg_grade__gte": 60, "avg_grade__lt": 80},
+        "gte80": {"avg_grade__gte": 80},
+        "none": {"avg_grade__isnull": True},
+    }
+
+    def lookups(self, request, model_admin):
+        """
+        grade bands shown in the sidebar
+        """
+        return (
+            ("lt60", "Below 60"),
+            ("60to80", "60 to 80"),
+            ("gte80", "80 and above"),
+            ("none", "Not graded"),
+        )
+
+    def queryset(self, request, queryset):
+        """
+        filters on the avg_grade annotation added by StudentAdmin
+        """
+        if self.value() in self.ranges:
+            return queryset.filter(**self.ranges[self.value()])
+        return queryset
 
 
 @admin.register(Student)
@@ -90,198 +234,344 @@ class StudentAdmin(admin.ModelAdmin):
         "program_name",
         "num_courses_enrolled",
         "num_assignments",
+        "num_submitted",
         "average_grade",
     )
 
+    list_filter = ("is_active", "program", AverageGradeFilter)
+
+    list_select_related = ("user", "program")
+
+    def get_queryset(self, request):
+        """
+        annotates per-row counts and grades read from the gradebook rollups,
+        so the changelist runs a fixed number of queries
+        """
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                courses_count=subquery_count(
+                    ProgramCourseRollup.objects.all(), "program", outer_ref="program"
+                ),
+                assignments_count=subquery_sum(
+                    ProgramCourseRollup.objects.all(),
+                    "program",
+                    "assignment_count",
+                    outer_ref="program",
+                ),
+                submitted_count=subquery_sum(
+                    StudentCourseRollup.objects.all(), "student", "submitted_count"
+                ),
+                avg_grade=subquery_rollup_avg(
+                    StudentCourseRollup.objects.all(), "student"
+                ),
+            )
+        )
+
     def program_name(self, obj):
         """
         Returns the name of the program in which the student is enrolled.
         """
         return obj.program.name
 
+    program_name.admin_order_field = "program__name"
+
     def num_courses_enrolled(self, obj):
         """
         number of courses each student is enrolled in
         """
-        courses = obj.courses()
-        ids = [i.id for i in courses]
-        if courses:
-            html = '<a href="/admin/voyage/course/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(courses)}</a>')
+        return count_link(
+            obj.courses_count, Course, assignment__program__id__exact=obj.program_id
+        )
 
-        return 0
+    num_courses_enrolled.admin_order_field = "courses_count"
 
     def num_assignments(self, obj):
         """
         number of assignments assigned to the student
         """
-        assignments = obj.assignments()
-        ids = [i.id for i in assignments]
-        if assignments:
-            html = '<a href="/admin/voyage/assignment/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(assignments)}</a>')
+        return count_link(
+            obj.assignments_count, Assignment, program__id__exact=obj.program_id
+        )
 
-        return 0
+    num_assignments.admin_order_field = "assignments_count"
+
+    def num_submitted(self, obj):
+        """
+        number of assignments submitted by the student
+        """
+        return obj.submitted_count
+
+    num_submitted.admin_order_field = "submitted_count"
 
     def average_grade(self, obj):
         """
         Returns the average grade of assignments submitted by the student.
         """
-        submitted_assignments = obj.studentassignment_set.filter(grade__isnull=False)
-        if submitted_assignments.exists():
-            average = submitted_assignments.aggregate(Avg("grade"))["grade__avg"]
-            return round(average, 2)
+        if obj.avg_grade is not None:
+            return round(obj.avg_grade, 2)
         return None
 
+    average_grade.admin_order_field = "avg_grade"
+
 
 @admin.register(Content)
 class ContentAdmin(admin.ModelAdmin):
     """
     class content methods
     """
+
     list_display = ("name", "faculty", "repo", "num_courses", "num_assignments")
 
+    list_select_related = ("faculty",)
+
+    def get_queryset(self, request):
+        """
+        annotates course and assignment counts for each content
+        """
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                courses_count=Count("assignment__course", distinct=True),
+                assignments_count=Count("assignment", distinct=True),
+            )
+        )
+
     def num_courses(self, obj):
         """
         number of courses that use each content
         """
-        assignments = obj.assignment_set.all()
-        courses = set(i.course for i in assignments)
-        ids = [i.id for i in courses]
-        if courses:
-            html = '<a href="/admin/voyage/course/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(courses)}</a>')
+        return count_link(
+            obj.courses_count, Course, assignment__content__id__exact=obj.pk
+        )
 
-        return 0
+    num_courses.admin_order_field = "courses_count"
 
     def num_assignments(self, obj):
         """
         number of assignments that use each content
         """
-        assignments = obj.assignment_set.all()
-        ids = [i.id for i in assignments]
-        if assignments:
-            html = '<a href="/admin/voyage/assignment/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(assignments)}</a>')
+        return count_link(obj.assignments_count, Assignment, content__id__exact=obj.pk)
 
-        return 0
+    num_assignments.admin_order_field = "assignments_count"
 
 
 @admin.register(Program)
-class ProgramAdmin(admin.ModelAdmin):
+class ProgramAdmin(GradeStatisticsMixin, admin.ModelAdmin):
     """
     Custom admin interface for Program model.
     """
 
-    list_display = ("name", "num_courses", "num_students")
+    list_display = (
+        "name",
+        "num_courses",
+        "num_students",
+        "median_grade",
+        "grade_spread",
+        "grade_histogram",
+        "late_submissions",
+    )
+
+    statistics_scope = "program"
+
+    def get_queryset(self, request):
+        """
+        annotates course and student counts for each program, counted in
+        subqueries on the program's course rollups and students
+        """
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                courses_count=subquery_count(
+                    ProgramCourseRollup.objects.all(), "program"
+                ),
+                students_count=subquery_count(Student.objects.all(), "program"),
+            )
+        )
 
     def num_courses(self, obj):
         """
         number of courses in each program
         """
-        assignments = obj.assignment_set.all()
-        courses = set(i.course for i in assignments)
-        ids = [i.id for i in courses]
-        if courses:
-            html = '<a href="/admin/voyage/course/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(courses)}</a>')
+        return count_link(
+            obj.courses_count, Course, assignment__program__id__exact=obj.pk
+        )
 
-        return 0
+    num_courses.admin_order_field = "courses_count"
 
     def num_students(self, obj):
         """
         number of students in each program
         """
-        students = obj.students()
-        ids = [i.id for i in students]
-        if students:
-            html = '<a href="/admin/voyage/student/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(students)}</a>')
+        return count_link(obj.students_count, Student, program__id__exact=obj.pk)
 
-        return 0
+    num_students.admin_order_field = "students_count"
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(GradeStatisticsMixin, admin.ModelAdmin):
     """
     Custom admin interface for Course model.
     """
 
-    list_display = ("name", "num_assignments", "num_completed_assignments")
+    list_display = (
+        "name",
+        "num_assignments",
+        "num_completed_assignments",
+        "average_grade",
+        "median_grade",
+        "grade_spread",
+        "grade_histogram",
+        "late_submissions",
+    )
+
+    statistics_scope = "course"
+
+    list_filter = (
+        "assignment__program",
+        "assignment__content",
+        "assignment__content__faculty",
+    )
+
+    def get_queryset(self, request):
+        """
+        annotates assignment counts and average grades from the course's
+        program rollups, and 100% graded counts from the grade index
+        """
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                assignments_count=subquery_sum(
+                    ProgramCourseRollup.objects.all(), "course", "assignment_count"
+                ),
+                completed_count=subquery_count(
+                    StudentAssignment.objects.filter(grade__gte=MAX_GRADE),
+                    "assignment__course",
+                ),
+                avg_grade=subquery_rollup_avg(
+                    ProgramCourseRollup.objects.all(), "course"
+                ),
+            )
+        )
 
     def num_assignments(self, obj):
         """
         number of assignments in each course
         """
-        assignments = obj.assignments
-        ids = [i.id for i in assignments]
-        if assignments:
-            html = '<a href="/admin/voyage/assignment/?id__in='
-            for i in ids:
-                html = "".join((html, f"{i},"))
-            return format_html(html[:-1] + f'">{len(assignments)}</a>')
+        return count_link(obj.assignments_count, Assignment, course__id__exact=obj.pk)
 
-        return 0
+    num_assignments.admin_order_field = "assignments_count"
 
     def num_completed_assignments(self, obj):
         """
         Number of assignments that are completed and graded 100%.
         """
-        assignments = obj.assignment_set.all()
-        max_grade = 100.0
-        graded_assignments = set()
+        return count_link(
+            obj.completed_count,
+            StudentAssignment,
+            assignment__course__id__exact=obj.pk,
+            grade__gte=MAX_GRADE,
+        )
 
-        for assignment in assignments:
-            graded_assignments.update(
-                assignment.studentassignment_set.filter(grade__gte=max_grade)
-            )
-
-        count = len(graded_assignments)
+    num_completed_assignments.admin_order_field = "completed_count"
 
-        if count:
-            url = (
-                reverse("admin:voyage_studentassignment_changelist")
-                + f'?id__in={",".join(map(str, graded_assignments.values_list("id", flat=True)))}'
-            )
-            return format_html('<a href="{}">{}</a>', url, count)
+    def average_grade(self, obj):
+        """
+        Returns the average grade across all submissions in the course.
+        """
+        return round(obj.avg_grade, 2) if obj.avg_grade is not None else None
 
-        return 0
+    average_grade.admin_order_field = "avg_grade"
 
 
 @admin.register(Assignment)
-class AssignmentAdmin(admin.ModelAdmin):
+class AssignmentAdmin(GradeStatisticsMixin, admin.ModelAdmin):
     """
     Custom admin interface for Assignment model.
     """
 
-    list_display = ("__str__", "average_grade", "due")
+    list_display = (
+        "__str__",
+        "num_submissions",
+        "num_completed",
+        "average_grade",
+        "median_grade",
+        "grade_spread",
+        "grade_histogram",
+        "late_submissions",
+        "due",
+    )
+
+    statistics_scope = "assignment"
 
     list_display_links = ("__str__", "average_grade", "due")
 
+    list_filter = ("content__faculty",)
+
+    list_select_related = ("content",)
+
+    def get_queryset(self, request):
+        """
+        annotates submission counts and average grades from the assignment's
+        rollup, and 100% graded counts from the grade index
+        """
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                submissions_count=Coalesce("assignmentrollup__submitted_count", 0),
+                completed_count=subquery_count(
+                    StudentAssignment.objects.filter(grade__gte=MAX_GRADE),
+                    "assignment",
+                ),
+                avg_grade=rollup_average("assignmentrollup__"),
+            )
+        )
+
+    def num_submissions(self, obj):
+        """
+        number of student submissions for the assignment
+        """
+        return count_link(
+            obj.submissions_count,
+            StudentAssignment,
+            assignment__id__exact=obj.pk,
+            submitted__isnull=False,
+        )
+
+    num_submissions.admin_order_field = "submissions_count"
+
+    def num_completed(self, obj):
+        """
+        number of submissions graded 100%
+        """
+        return count_link(
+            obj.completed_count,
+            StudentAssignment,
+            assignment__id__exact=obj.pk,
+            grade__gte=MAX_GRADE,
+        )
+
+    num_completed.admin_order_field = "completed_count"
+
     def average_grade(self, obj):
         """
         Returns the average grade of assignments associated with this assignment.
         """
-        result = obj.studentassignment_set.aggregate(Avg("grade"))["grade__avg"]
-        return round(result, 2) if result is not None else None
+        return round(obj.avg_grade, 2) if obj.avg_grade is not None else None
+
+    average_grade.admin_order_field = "avg_grade"
 
 
 @admin.register(StudentAssignment)
 class StudentAssignmentAdmin(admin.ModelAdmin):
     """
-    Default admin interface for StudentAssignment model.
+    Admin interface for StudentAssignment model, the largest table,
+    with cursor pagination and estimated counts.
     """
 
     list_display = (
@@ -304,8 +594,80 @@ class StudentAssignmentAdmin(admin.ModelAdmin):
         "feedback",
     )
 
+    list_filter = ("assignment__course", "reviewer")
+
+    list_select_related = ("student__user", "assignment__content", "reviewer__user")
+
+    ordering = ("-id",)
+
+    date_hierarchy = "submitted"
+
+    paginator = EstimatedCountPaginator
+
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        """
+        pages by primary key cursor instead of OFFSET
+        """
+        return KeysetChangeList
+
     def student_name(self, obj):
         """
         returns student name
         """
         return obj.student.user
+
+    student_name.admin_order_field = "student__user__username"
+
+
+@admin.register(StudentRepository)
+class StudentRepositoryAdmin(admin.ModelAdmin):
+    """
+    Admin interface for the provisioned student repos, one per
+    StudentAssignment, with the same pagination as StudentAssignment.
+    """
+
+    list_display = ("url", "student_assignment", "status", "attempts", "provisioned")
+
+    list_filter = ("status",)
+
+    list_select_related = (
+        "student_assignment__student__user",
+        "student_assignment__assignment__content",
+    )
+
+    search_fields = ("url",)
+
+    readonly_fields = ("student_assignment",)
+
+    ordering = ("-id",)
+
+    actions = ("retry_provisioning",)
+
+    paginator = EstimatedCountPaginator
+
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        """
+        pages by primary key cursor instead of OFFSET
+        """
+        return KeysetChangeList
+
+    @admin.action(description="Retry provisioning of the selected repos")
+    def retry_provisioning(self, request, queryset):
+        """
+        marks the selected repos pending and provisions them in the background
+        """
+        if not settings.REPO_TARGET_URL:
+            self.message_user(request, "REPO_TARGET_URL is not set.", messages.ERROR)
+            return
+        queryset = queryset.exclude(status=StudentRepository.Status.READY)
+        assignment_ids = list(
+            queryset.values_list("student_assignment__assignment", flat=True).distinct()
+        )
+        count = queryset.update(status=StudentRepository.Status.PENDING)
+        if count:
+            enqueue(provision_repositories, assignment_ids=assignment_ids)
+        self.message_user(request, f"{count} repos queued for provisioning.")
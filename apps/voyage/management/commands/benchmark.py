@@ -0,0 +1,102 @@
+"""
+benchmarks the voyage admin and dashboards at several data scales
+"""
+import json
+import platform
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from apps.voyage.utils import benchmarks
+from apps.voyage.utils.synthetic import SCALES
+
+
+class Command(BaseCommand):
+    """
+    Seeds a throwaway test database per scale, then times and counts the
+    queries of every changelist, dashboard, list view and assignment POST,
+    with an empty cache (cold) and right after (warm).
+    """
+
+    help = "Benchmark the voyage hot paths against synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales", nargs="+", choices=sorted(SCALES), default=["small"]
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--baseline", help="JSON results to compare against")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="allowed relative slowdown before a path counts as a regression",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="record the slowest voyage functions for each path",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for scale in options["scales"]:
+            results[scale] = self.run_scale(scale, options)
+
+        with open(options["output"], "w", encoding="utf-8") as output:
+            json.dump(
+                {
+                    "created": datetime.now().isoformat(timespec="seconds"),
+                    "database": connection.vendor,
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                output,
+                indent=2,
+            )
+        self.stdout.write(f"Wrote {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as baseline:
+                previous = json.load(baseline)["results"]
+            regressions = benchmarks.compare(results, previous, options["threshold"])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmark regressions")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def run_scale(self, scale, options):
+        """
+        Seeds a fresh test database for scale and benchmarks every path
+        """
+        setup_test_environment(debug=False)
+        databases = setup_databases(verbosity=0, interactive=False, aliases={"default"})
+        try:
+            self.stdout.write(f"Seeding {scale} dataset")
+            benchmarks.seed(scale, SCALES[scale], seed=options["seed"])
+            results = benchmarks.Benchmark(
+                repeat=options["repeat"], profile=options["profile"]
+            ).run()
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{scale:>6} {name:<30} {result['status']} "
+                f"cold {result['queries']:>6} queries {result['median_ms']:>10.1f}ms "
+                f"(db {result['db_ms']:.1f}ms) "
+                f"warm {result['warm_queries']:>6} queries "
+                f"{result['warm_median_ms']:>10.1f}ms"
+            )
+        return results
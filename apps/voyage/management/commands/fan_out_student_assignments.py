@@ -0,0 +1,25 @@
+"""
+creates the missing StudentAssignment rows of every student
+"""
+from django.core.management.base import BaseCommand
+
+from ...models import StudentAssignment
+from ...utils.fanout import BATCH_SIZE, create_missing
+
+
+class Command(BaseCommand):
+    """
+    Backfills a StudentAssignment row for every student and every assignment
+    of their program. Existing rows are left as they are.
+    """
+
+    help = "Create the missing StudentAssignment rows for every student"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        before = StudentAssignment.objects.count()
+        create_missing(batch_size=options["batch_size"])
+        created = StudentAssignment.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(f"Created {created} StudentAssignments"))
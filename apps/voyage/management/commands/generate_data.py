@@ -0,0 +1,62 @@
+"""
+generates synthetic voyage data at a chosen scale
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.voyage.utils import gradebook, teaching
+from apps.voyage.utils.synthetic import SCALES, SyntheticData
+
+
+class Command(BaseCommand):
+    """
+    Bulk-creates a reproducible dataset for load testing and benchmarks.
+    """
+
+    help = "Generate synthetic faculty, students and submissions with bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+        for name in SCALES["small"]:
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                type=int,
+                help=f"number of {name.replace('_', ' ')} (overrides --scale)",
+            )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix",
+            default="load",
+            help="prefix for usernames and names, must differ between runs",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--skip-rollups",
+            action="store_true",
+            help="don't rebuild the gradebook rollups and teaching links afterwards",
+        )
+
+    def handle(self, *args, **options):
+        sizes = dict(SCALES[options["scale"]])
+        for name in sizes:
+            if options[name] is not None:
+                sizes[name] = options[name]
+
+        started = time.monotonic()
+        generator = SyntheticData(
+            seed=options["seed"],
+            prefix=options["prefix"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        generator.generate(**sizes)
+
+        if not options["skip_rollups"]:
+            rows = gradebook.rebuild(batch_size=options["batch_size"])
+            self.stdout.write(f"Gradebook rollups: {rows}")
+            rows = teaching.rebuild(batch_size=options["batch_size"])
+            self.stdout.write(f"Teaching links: {rows}")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Generated data in {elapsed:.1f}s"))
@@ -0,0 +1,43 @@
+"""
+imports a roster or grades CSV file
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.imports import BATCH_SIZE, CsvImportError
+from ...tasks import IMPORTS
+
+
+class Command(BaseCommand):
+    """
+    Runs a roster or grade import in this process, printing its progress.
+    """
+
+    help = "Import students (roster) or grades from a CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(IMPORTS))
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        def progress(summary):
+            self.stdout.write(
+                f"{summary['rows']} rows: {summary['created']} created, "
+                f"{summary['updated']} updated, {summary['error_count']} errors"
+            )
+
+        importer = IMPORTS[options["kind"]](
+            batch_size=options["batch_size"], progress=progress
+        )
+        try:
+            with open(options["path"], "rb") as file:
+                summary = importer.run(file)
+        except (OSError, CsvImportError) as error:
+            raise CommandError(error)
+
+        for error in summary["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if summary["error_count"] > len(summary["errors"]):
+            self.stderr.write(
+                f"... and {summary['error_count'] - len(summary['errors'])} more"
+            )
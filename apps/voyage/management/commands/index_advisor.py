@@ -0,0 +1,44 @@
+"""
+reports full table scans in the plans of the hot grading queries
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ...utils.query_plans import HOT_QUERIES, full_scans
+
+
+class Command(BaseCommand):
+    """
+    Runs EXPLAIN on every registered hot query and lists the full scans.
+    """
+
+    help = "EXPLAIN the hot grading queries and report full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--plans", action="store_true", help="print the full query plans"
+        )
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="exit with an error if any query scans a whole table",
+        )
+
+    def handle(self, *args, **options):
+        scanning = []
+        for name, queryset in HOT_QUERIES.items():
+            plan, scans = full_scans(queryset(), options["database"])
+            if scans:
+                scanning.append(name)
+                for table, detail in scans:
+                    self.stdout.write(
+                        self.style.WARNING(f"{name}: full scan of {table} ({detail})")
+                    )
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: indexed"))
+            if options["plans"]:
+                self.stdout.write(plan + "\n")
+
+        if scanning and options["fail_on_scan"]:
+            raise CommandError(f"{len(scanning)} queries scan a full table")
@@ -0,0 +1,62 @@
+"""
+summarizes the profiles captured by ProfilingMiddleware
+"""
+import glob
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Merges captured pstats files and prints the functions with the most time.
+    """
+
+    help = "Summarize the top functions across captured request profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            default=getattr(settings, "PROFILING_DIR", None),
+            help="directory of .prof files (defaults to PROFILING_DIR)",
+        )
+        parser.add_argument(
+            "--view",
+            default="",
+            help="only include profiles whose file name contains this view name",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "tottime", "ncalls"],
+            default="cumulative",
+        )
+        parser.add_argument("--limit", type=int, default=30)
+        parser.add_argument(
+            "--filter",
+            default="",
+            help="regex restricting the printed functions, e.g. apps/voyage",
+        )
+
+    def handle(self, *args, **options):
+        if not options["dir"]:
+            raise CommandError("Set PROFILING_DIR or pass --dir")
+
+        pattern = os.path.join(options["dir"], f"*{options['view']}*.prof")
+        files = sorted(glob.glob(pattern))
+        if not files:
+            raise CommandError(f"No profiles match {pattern}")
+
+        self.stdout.write(f"{len(files)} profiles")
+        report = io.StringIO()
+        stats = pstats.Stats(*files, stream=report)
+        restrictions = [options["limit"]]
+        if options["filter"]:
+            # the filter matches full paths, so keep them
+            restrictions.insert(0, options["filter"])
+        else:
+            stats.strip_dirs()
+        stats.sort_stats(options["sort"]).print_stats(*restrictions)
+        self.stdout.write(report.getvalue())
@@ -0,0 +1,50 @@
+"""
+provisions the student repos of assignments
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.provisioning import Provisioner
+
+
+class Command(BaseCommand):
+    """
+    Pushes the content repo of every assignment, or of the given ones, to the
+    repos of its students in this process. Repos that are already provisioned
+    are skipped, so an interrupted run can simply be started again.
+    """
+
+    help = "Provision the student repos of assignments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assignment", type=int, action="append")
+        parser.add_argument("--student", type=int, action="append")
+        parser.add_argument("--workers", type=int)
+        parser.add_argument("--attempts", type=int)
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also retry repos whose provisioning failed before",
+        )
+
+    def handle(self, *args, **options):
+        def progress(summary):
+            self.stdout.write(f"{summary['ready']} ready, {summary['failed']} failed")
+
+        try:
+            provisioner = Provisioner(
+                workers=options["workers"],
+                attempts=options["attempts"],
+                progress=progress,
+            )
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+        summary = provisioner.run(
+            options["student"],
+            options["assignment"],
+            retry_failed=options["retry_failed"],
+        )
+        style = self.style.ERROR if summary["failed"] else self.style.SUCCESS
+        self.stdout.write(
+            style(f"{summary['ready']} repos ready, {summary['failed']} failed")
+        )
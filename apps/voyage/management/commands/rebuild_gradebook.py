@@ -0,0 +1,36 @@
+"""
+rebuilds and verifies the gradebook rollup tables
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.voyage.utils import gradebook
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the gradebook rollups from StudentAssignment rows.
+    """
+
+    help = "Rebuild the gradebook rollup tables from scratch and verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="only compare the stored rollups with a fresh computation",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            count = gradebook.rebuild(batch_size=options["batch_size"])
+            self.stdout.write(f"Rebuilt {count} gradebook rollup rows")
+
+        mismatches = gradebook.verify()
+        for model, lookup, stored, expected in mismatches:
+            self.stderr.write(
+                f"{model.__name__} {lookup}: stored {stored}, expected {expected}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} gradebook rollup rows differ")
+        self.stdout.write(self.style.SUCCESS("Gradebook rollups verified"))
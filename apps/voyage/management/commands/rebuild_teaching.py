@@ -0,0 +1,36 @@
+"""
+rebuilds and verifies the teaching link tables
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.voyage.utils import teaching
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the teaching links from Assignment rows.
+    """
+
+    help = "Rebuild the teaching link tables from scratch and verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify-only",
+            action="store_true",
+            help="only compare the stored links with a fresh computation",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options["verify_only"]:
+            count = teaching.rebuild(batch_size=options["batch_size"])
+            self.stdout.write(f"Rebuilt {count} teaching link rows")
+
+        mismatches = teaching.verify()
+        for model, lookup, stored, expected in mismatches:
+            self.stderr.write(
+                f"{model.__name__} {lookup}: stored {stored}, expected {expected}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} teaching link rows differ")
+        self.stdout.write(self.style.SUCCESS("Teaching links verified"))
@@ -0,0 +1,223 @@
+"""
+request instrumentation middleware for voyage app
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger("apps.voyage.metrics")
+
+# collapses IN (%s, %s, ...) lists so the same query with more ids matches
+IN_LIST = re.compile(r"\((?:%s, )+%s\)")
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a view runs more queries than its query_budget and
+    QUERY_BUDGET_STRICT is enabled, e.g. in tests.
+    """
+
+
+def fingerprint(sql):
+    """
+    Returns the SQL with parameter lists collapsed, so repeated queries match
+    """
+    return IN_LIST.sub("(...)", sql)
+
+
+class QueryMetrics:
+    """
+    Database execute wrapper that counts and times every query
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        """
+        Returns {fingerprint: count} for queries run at least threshold times
+        """
+        return {
+            sql: count
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        }
+
+
+@contextmanager
+def recording(metrics):
+    """
+    Runs the queries of every database connection through metrics
+    """
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        yield
+
+
+class QueryMetricsMiddleware:
+    """
+    Records the number of queries, DB time, repeated queries and response time
+    of every request, adds them as a Server-Timing header and logs them as JSON.
+    Views can declare a query_budget attribute; exceeding it logs a warning,
+    or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is set.
+    A streaming response is logged once its body is consumed or closed,
+    including the queries run while streaming; its Server-Timing header can
+    only cover the view, and its budget is never raised mid-stream.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.duplicate_threshold = getattr(settings, "QUERY_DUPLICATE_THRESHOLD", 5)
+
+    def __call__(self, request):
+        metrics = QueryMetrics()
+        started = time.perf_counter()
+        with recording(metrics):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        response["Server-Timing"] = (
+            f'db;desc="{metrics.count} queries";dur={metrics.duration * 1000:.2f}, '
+            f"total;dur={elapsed * 1000:.2f}"
+        )
+
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, metrics, started
+            )
+        else:
+            self.report(request, response, metrics, elapsed)
+        return response
+
+    def stream(self, content, request, response, metrics, started):
+        """
+        Yields the body of a streaming response, recording the queries it
+        runs, and reports the request when the body is exhausted or closed
+        """
+        try:
+            with recording(metrics):
+                yield from content
+        finally:
+            elapsed = time.perf_counter() - started
+            self.report(request, response, metrics, elapsed, strict=False)
+
+    def report(self, request, response, metrics, elapsed, strict=True):
+        """
+        Logs the metrics of a request, raising QueryBudgetExceeded when it is
+        over budget in strict mode. An async streaming response is reported
+        before its body runs, so it is marked partial.
+        """
+        match = getattr(request, "resolver_match", None)
+        budget = getattr(request, "query_budget", None)
+        record = {
+            "view": match.view_name if match else None,
+            "path": request.path,
+            "method": request.method,
+            "status": response.status_code,
+            "queries": metrics.count,
+            "db_ms": round(metrics.duration * 1000, 2),
+            "total_ms": round(elapsed * 1000, 2),
+            "duplicates": metrics.duplicates(self.duplicate_threshold),
+            "query_budget": budget,
+            "streaming": response.streaming,
+            "partial": response.streaming and response.is_async,
+        }
+        over_budget = budget is not None and metrics.count > budget
+        if over_budget or record["duplicates"]:
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+        if strict and over_budget and getattr(settings, "QUERY_BUDGET_STRICT", False):
+            raise QueryBudgetExceeded(
+                f"{record['view']} ran {metrics.count} queries, budget {budget}"
+            )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """
+        Picks up the query_budget declared on the view function or class,
+        including REST framework views, viewsets and viewset actions
+        """
+        view = getattr(view_func, "view_class", getattr(view_func, "cls", view_func))
+        initkwargs = getattr(view_func, "initkwargs", None) or {}
+        request.query_budget = initkwargs.get(
+            "query_budget", getattr(view, "query_budget", None)
+        )
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in cProfile capture for a sampled fraction of requests, or any request
+    carrying the PROFILING_HEADER with PROFILING_TOKEN, under PROFILING_PATHS.
+    Each profile is written to PROFILING_DIR as a pstats file; summarize them
+    with the profile_summary management command. Disabled unless PROFILING_DIR
+    is set. Place it first in MIDDLEWARE so the other middleware is included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = getattr(settings, "PROFILING_DIR", None)
+        if not self.directory:
+            raise MiddlewareNotUsed
+        os.makedirs(self.directory, exist_ok=True)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.paths = tuple(getattr(settings, "PROFILING_PATHS", ("/",)))
+        self.header = getattr(settings, "PROFILING_HEADER", "X-Profile")
+        self.token = getattr(settings, "PROFILING_TOKEN", None)
+
+    def should_profile(self, request):
+        """
+        Returns True if the request is authorized or sampled for profiling
+        """
+        if not request.path.startswith(self.paths):
+            return False
+        supplied = request.headers.get(self.header)
+        if supplied and self.token and constant_time_compare(supplied, self.token):
+            return True
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        name = "{}-{}-{}.prof".format(
+            time.strftime("%Y%m%d-%H%M%S"),
+            re.sub(r"[^\w.-]+", "_", view),
+            uuid.uuid4().hex[:8],
+        )
+        profiler.dump_stats(os.path.join(self.directory, name))
+        response["X-Profile-Id"] = name
+        return response
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="content",
+            options={"verbose_name": "Content", "verbose_name_plural": "Content"},
+        ),
+        migrations.AlterField(
+            model_name="studentassignment",
+            name="submitted",
+            field=models.DateTimeField(
+                blank=True, db_index=True, default=None, null=True
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="assignment",
+            unique_together={("program", "course", "content")},
+        ),
+    ]
@@ -0,0 +1,184 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Totals the existing student assignments into the new rollup tables, as
+    manage.py rebuild_gradebook does
+    """
+    StudentAssignment = apps.get_model("voyage", "StudentAssignment")
+    aggregates = {
+        "submitted_count": models.Count("id", filter=models.Q(submitted__isnull=False)),
+        "graded_count": models.Count("id", filter=models.Q(grade__isnull=False)),
+        "grade_sum": models.Sum("grade", default=0),
+    }
+    groupings = {
+        "StudentCourseRollup": {
+            "student_id": "student",
+            "course_id": "assignment__course",
+        },
+        "AssignmentRollup": {"assignment_id": "assignment"},
+        "ProgramCourseRollup": {
+            "program_id": "assignment__program",
+            "course_id": "assignment__course",
+        },
+    }
+    for name, fields in groupings.items():
+        model = apps.get_model("voyage", name)
+        rows = (
+            StudentAssignment.objects.order_by()
+            .values(*fields.values())
+            .annotate(**aggregates)
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    submitted_count=row["submitted_count"],
+                    graded_count=row["graded_count"],
+                    # SQLite sums decimals as floats
+                    grade_sum=Decimal(str(row["grade_sum"])).quantize(Decimal("0.01")),
+                    **{field: row[path] for field, path in fields.items()},
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0002_studentassignment_submitted_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("submitted_count", models.IntegerField(default=0)),
+                ("graded_count", models.IntegerField(default=0)),
+                (
+                    "grade_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "assignment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="voyage.assignment",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="StudentCourseRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("submitted_count", models.IntegerField(default=0)),
+                ("graded_count", models.IntegerField(default=0)),
+                (
+                    "grade_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.course"
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.student"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("student", "course")},
+            },
+        ),
+        migrations.CreateModel(
+            name="ProgramCourseRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("submitted_count", models.IntegerField(default=0)),
+                ("graded_count", models.IntegerField(default=0)),
+                (
+                    "grade_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.course"
+                    ),
+                ),
+                (
+                    "program",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.program"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("program", "course")},
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0003_gradebook_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="studentassignment",
+            index=models.Index(
+                fields=["student", "submitted"], name="voyage_sa_student_submitted"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentassignment",
+            index=models.Index(
+                fields=["reviewer", "grade"], name="voyage_sa_reviewer_grade"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentassignment",
+            index=models.Index(
+                fields=["assignment", "grade"], name="voyage_sa_assignment_grade"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentassignment",
+            index=models.Index(
+                condition=models.Q(("submitted__isnull", True)),
+                fields=["student"],
+                name="voyage_sa_student_pending",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="studentassignment",
+            index=models.Index(
+                condition=models.Q(("grade__isnull", False)),
+                fields=["reviewer"],
+                name="voyage_sa_reviewer_graded",
+            ),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:20
+
+import logging
+from decimal import Decimal
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Keeps one row per (student, assignment) before the constraint is added:
+    the graded one with the best grade, else the latest submitted one.
+    The gradebook rollups counted the removed rows, so they are rebuilt.
+    """
+    StudentAssignment = apps.get_model("voyage", "StudentAssignment")
+    duplicates = (
+        StudentAssignment.objects.values("student_id", "assignment_id")
+        .annotate(rows=models.Count("id"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    removed = 0
+    for pair in duplicates.iterator():
+        pks = list(
+            StudentAssignment.objects.filter(
+                student_id=pair["student_id"], assignment_id=pair["assignment_id"]
+            )
+            .order_by(
+                models.F("grade").desc(nulls_last=True),
+                models.F("submitted").desc(nulls_last=True),
+                "-pk",
+            )
+            .values_list("pk", flat=True)
+        )
+        removed += StudentAssignment.objects.filter(pk__in=pks[1:]).delete()[0]
+        logger.warning(
+            "Removed %d duplicate rows of student %s, assignment %s, kept row %s",
+            len(pks) - 1,
+            pair["student_id"],
+            pair["assignment_id"],
+            pks[0],
+        )
+    if removed:
+        rebuild_rollups(apps)
+
+
+def rebuild_rollups(apps):
+    """
+    Replaces the gradebook rollups with totals of the remaining rows, as
+    manage.py rebuild_gradebook does
+    """
+    StudentAssignment = apps.get_model("voyage", "StudentAssignment")
+    aggregates = {
+        "submitted_count": models.Count("id", filter=models.Q(submitted__isnull=False)),
+        "graded_count": models.Count("id", filter=models.Q(grade__isnull=False)),
+        "grade_sum": models.Sum("grade", default=0),
+    }
+    groupings = {
+        "StudentCourseRollup": {
+            "student_id": "student",
+            "course_id": "assignment__course",
+        },
+        "AssignmentRollup": {"assignment_id": "assignment"},
+        "ProgramCourseRollup": {
+            "program_id": "assignment__program",
+            "course_id": "assignment__course",
+        },
+    }
+    for name, fields in groupings.items():
+        model = apps.get_model("voyage", name)
+        rows = (
+            StudentAssignment.objects.order_by()
+            .values(*fields.values())
+            .annotate(**aggregates)
+        )
+        model.objects.all().delete()
+        model.objects.bulk_create(
+            [
+                model(
+                    submitted_count=row["submitted_count"],
+                    graded_count=row["graded_count"],
+                    # SQLite sums decimals as floats
+                    grade_sum=Decimal(str(row["grade_sum"])).quantize(Decimal("0.01")),
+                    **{field: row[path] for field, path in fields.items()},
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0004_studentassignment_grading_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="studentassignment",
+            constraint=models.UniqueConstraint(
+                fields=("student", "assignment"), name="voyage_sa_student_assignment"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0005_studentassignment_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentRepository",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("url", models.CharField(max_length=240)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("provisioning", "Provisioning"),
+                            ("ready", "Ready"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("error", models.TextField(blank=True, default=None, null=True)),
+                (
+                    "provisioned",
+                    models.DateTimeField(blank=True, default=None, null=True),
+                ),
+                (
+                    "student_assignment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="repository",
+                        to="voyage.studentassignment",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Student repositories",
+            },
+        ),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_links(apps, schema_editor):
+    """
+    Counts the existing assignments into the new link tables, as
+    manage.py rebuild_teaching does
+    """
+    Assignment = apps.get_model("voyage", "Assignment")
+    links = {
+        "FacultyCourse": {"faculty_id": "content__faculty", "course_id": "course"},
+        "FacultyProgram": {"faculty_id": "content__faculty", "program_id": "program"},
+        "ProgramCourse": {"program_id": "program", "course_id": "course"},
+    }
+    for name, fields in links.items():
+        model = apps.get_model("voyage", name)
+        rows = (
+            Assignment.objects.order_by()
+            .values(*fields.values())
+            .annotate(assignment_count=models.Count("id"))
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    assignment_count=row["assignment_count"],
+                    **{field: row[path] for field, path in fields.items()},
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0006_student_repositories"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProgramCourse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("assignment_count", models.IntegerField(default=0)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.course"
+                    ),
+                ),
+                (
+                    "program",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.program"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("program", "course")},
+            },
+        ),
+        migrations.CreateModel(
+            name="FacultyProgram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("assignment_count", models.IntegerField(default=0)),
+                (
+                    "faculty",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.faculty"
+                    ),
+                ),
+                (
+                    "program",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.program"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("faculty", "program")},
+            },
+        ),
+        migrations.CreateModel(
+            name="FacultyCourse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dtm_created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="DTM Created"),
+                ),
+                (
+                    "dtm_updated",
+                    models.DateTimeField(auto_now=True, verbose_name="DTM Updated"),
+                ),
+                ("assignment_count", models.IntegerField(default=0)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.course"
+                    ),
+                ),
+                (
+                    "faculty",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="voyage.faculty"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("faculty", "course")},
+            },
+        ),
+        migrations.RunPython(fill_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0007_teaching_links"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="studentassignment",
+            name="voyage_sa_student_pending",
+        ),
+        migrations.RemoveIndex(
+            model_name="studentassignment",
+            name="voyage_sa_reviewer_graded",
+        ),
+        migrations.AlterField(
+            model_name="studentassignment",
+            name="assignment",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="voyage.assignment",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="studentassignment",
+            name="reviewer",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                default=None,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                to="voyage.faculty",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="studentassignment",
+            name="student",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="voyage.student",
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+
+def fill_assignment_counts(apps, schema_editor):
+    """
+    Counts the existing assignments into the program x course rollups, which
+    replace the ProgramCourse links, as manage.py rebuild_gradebook does
+    """
+    Assignment = apps.get_model("voyage", "Assignment")
+    ProgramCourseRollup = apps.get_model("voyage", "ProgramCourseRollup")
+    rows = (
+        Assignment.objects.order_by()
+        .values("program", "course")
+        .annotate(assignment_count=models.Count("id"))
+    )
+    for row in rows:
+        ProgramCourseRollup.objects.update_or_create(
+            program_id=row["program"],
+            course_id=row["course"],
+            defaults={"assignment_count": row["assignment_count"]},
+        )
+    ProgramCourseRollup.objects.filter(assignment_count=0).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("voyage", "0008_drop_redundant_sa_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="programcourserollup",
+            name="assignment_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_assignment_counts, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name="ProgramCourse",
+        ),
+    ]
@@ -3,10 +3,11 @@ database tables  for voyage app
 """
 import random
 from datetime import datetime, timedelta
+from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django.db import models
 from qux.models import QuxModel
-# import git
+from .utils.relations import countable, relation
 
 
 class Faculty(QuxModel):
@@ -38,19 +39,22 @@ class Faculty(QuxModel):
 
         return faculty
 
+    @relation("Program", "facultyprogram__faculty")
     def programs(self):
         """
         this returns the  programs
         """
-        return Program.objects.filter(assignment__content__faculty=self).distinct()
+        return Program.objects.filter(facultyprogram__faculty=self)
 
+    @relation("Course", "facultycourse__faculty")
     def courses(self):
         """
         returns courses
         """
 
-        return Course.objects.filter(assignment__content__faculty=self).distinct()
+        return Course.objects.filter(facultycourse__faculty=self)
 
+    @relation("Content", "faculty")
     def content(self, program=None, course=None):
         """
         returns content
@@ -66,23 +70,30 @@ class Faculty(QuxModel):
 
         return self.content_set.all()
 
+    @countable
     def assignments_graded(self, assignment=None):
         """
-        this returns assignments graded if thre is
-        assignments else all the assignments
+        this returns the submissions graded by the faculty, of one
+        assignment if given else of all the assignments
         """
         queryset = self.studentassignment_set.filter(grade__isnull=False)
         if assignment:
             queryset = queryset.filter(assignment=assignment)
-        return list(queryset)
+        return queryset
+
+    @relation("Assignment", "content__faculty")
+    def assignments(self):
+        """
+        returns the assignments of the faculty's content
+        """
+        return Assignment.objects.filter(content__faculty=self)
 
     def num_assignments(self):
         """
         returns number of assignments
         """
+        return self.count_assignments()
 
-        return Assignment.objects.filter(content__faculty=self)
-    
 
 class Program(QuxModel):
     """
@@ -96,12 +107,27 @@ class Program(QuxModel):
     def __str__(self):
         return self.name
 
+    @relation("Student", "program")
     def students(self):
         """
         Returns students.
         """
         return self.student_set.all()
 
+    @relation("Course", "programcourserollup__program")
+    def courses(self):
+        """
+        Returns the courses with assignments in the program.
+        """
+        return Course.objects.filter(programcourserollup__program=self)
+
+    @relation("Assignment", "program")
+    def assignments(self):
+        """
+        Returns the assignments of the program.
+        """
+        return self.assignment_set.all()
+
     @classmethod
     def create_random_program(cls):
         """
@@ -128,31 +154,33 @@ class Course(QuxModel):
     def __str__(self):
         return self.name
 
+    @relation("Program", "programcourserollup__course")
     def programs(self):
         """
         Returns a set of programs associated with the course.
         """
-        return Program.objects.filter(assignment__course=self).distinct()
-    @property
+        return Program.objects.filter(programcourserollup__course=self)
+
+    @relation("Student", "program__assignment__course")
     def students(self):
         """
         Returns a set of students associated with the course.
         """
-        return Student.objects.filter(program__assignment__course=self)
-
+        return Student.objects.filter(program__assignment__course=self).distinct()
 
+    @relation("Content", "assignment__course")
     def content(self):
         """
         Returns a set of content associated with the course.
         """
         return Content.objects.filter(assignment__course=self).distinct()
 
-    @property
+    @relation("Assignment", "course")
     def assignments(self):
         """
         Returns a set of assignments associated with the course.
         """
-        return set(self.assignment_set.all())
+        return self.assignment_set.all()
 
     @classmethod
     def create_random_course(cls):
@@ -179,6 +207,27 @@ class Content(QuxModel):
         verbose_name = "Content"
         verbose_name_plural = "Content"
 
+    @relation("Assignment", "content")
+    def assignments(self):
+        """
+        Returns the assignments using the content.
+        """
+        return self.assignment_set.all()
+
+    @relation("Course", "assignment__content")
+    def courses(self):
+        """
+        Returns the courses using the content.
+        """
+        return Course.objects.filter(assignment__content=self).distinct()
+
+    @relation("Program", "assignment__content")
+    def programs(self):
+        """
+        Returns the programs using the content.
+        """
+        return Program.objects.filter(assignment__content=self).distinct()
+
     @classmethod
     def create_random_content(cls):
         """
@@ -208,18 +257,21 @@ class Student(QuxModel):
     is_active = models.BooleanField(default=True)
     program = models.ForeignKey(Program, on_delete=models.DO_NOTHING)
 
+    @relation("Course", "assignment__program__student")
     def courses(self):
         """
         Returns a set of courses associated with the student's program.
         """
         return Course.objects.filter(assignment__program__student=self).distinct()
 
+    @relation("Assignment", "program__student")
     def assignments(self):
         """
         Returns all assignments associated with the student's program.
         """
-        return self.program.assignment_set.all()
+        return Assignment.objects.filter(program_id=self.program_id)
 
+    @countable
     def assignments_submitted(self, assignment=None):
         """
         Returns a set of submitted assignments, optionally filtered by assignment.
@@ -231,6 +283,7 @@ class Student(QuxModel):
             )
         return self.studentassignment_set.filter(submitted__isnull=False)
 
+    @countable
     def assignments_not_submited(self, assignment=None):
         """
         Returns assignments that have not been submitted, optionally filtered by assignment.
@@ -242,6 +295,7 @@ class Student(QuxModel):
             )
         return self.studentassignment_set.filter(submitted__isnull=True)
 
+    @countable
     def assignments_graded(self, assignment=None):
         """
         Returns graded assignments, optionally filtered by assignment.
@@ -300,6 +354,7 @@ class Assignment(QuxModel):
         """
         return self.content.name
 
+    @relation("Student", "program__assignment")
     def students(self):
         """
         Returns a set of students who have been assigned this assignment.
@@ -307,11 +362,13 @@ class Assignment(QuxModel):
 
         return Student.objects.filter(program__assignment=self).distinct()
 
+    @countable
     def submissions(self, graded=None):
         """
         Return a queryset of submissions that are either all, graded, or not graded.
+        Rows of students who haven't submitted yet are not submissions.
         """
-        submissions_query = self.studentassignment_set.all()
+        submissions_query = self.studentassignment_set.filter(submitted__isnull=False)
 
         if graded is not None:
             if graded:
@@ -320,24 +377,6 @@ class Assignment(QuxModel):
                 submissions_query = submissions_query.filter(grade__isnull=True)
 
         return submissions_query
-    
-    # def clone_repo_for_student(self, course_repo_url, student_username):
-    #     """
-    #     when assignment is created this will help 
-    #     """
-    #     repo = git.Repo.clone_from(course_repo_url, f'https://github.com/{student_username}/{self.content}')
-    #     return repo
-
-    # def save(self, **kwargs):
-    #     """
-    #     to save data 
-    #     """
-    #     students = Student.objects.all()
-
-    #     for student in students:
-    #         self.clone_repo_for_student(self.content.repo, student.user.username)
-
-    #     return super().save(**kwargs)
 
     @classmethod
     def create_random_assignment(cls):
@@ -373,8 +412,10 @@ class StudentAssignment(QuxModel):
     Represents an assignment submitted by a student, along with grading details.
     """
 
-    student = models.ForeignKey(Student, on_delete=models.CASCADE)
-    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)
+    # the foreign keys lead the composite indexes in Meta, which serve their
+    # lookups, so they don't get single-column indexes of their own
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, db_index=False)
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, db_index=False)
     grade = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -382,13 +423,38 @@ class StudentAssignment(QuxModel):
         null=True,
         blank=True,
     )
-    submitted = models.DateTimeField(default=None, null=True, blank=True)
+    submitted = models.DateTimeField(default=None, null=True, blank=True, db_index=True)
     reviewed = models.DateTimeField(default=None, null=True, blank=True)
     reviewer = models.ForeignKey(
-        Faculty, on_delete=models.DO_NOTHING, default=None, null=True, blank=True
+        Faculty,
+        on_delete=models.DO_NOTHING,
+        default=None,
+        null=True,
+        blank=True,
+        db_index=False,
     )
     feedback = models.TextField(default=None, null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # every student has one row per assignment of their program
+            models.UniqueConstraint(
+                fields=["student", "assignment"], name="voyage_sa_student_assignment"
+            ),
+        ]
+        indexes = [
+            # Student.assignments_submitted / assignments_not_submited
+            models.Index(
+                fields=["student", "submitted"], name="voyage_sa_student_submitted"
+            ),
+            # Faculty.assignments_graded
+            models.Index(fields=["reviewer", "grade"], name="voyage_sa_reviewer_grade"),
+            # Assignment.submissions and the completed/average grade annotations
+            models.Index(
+                fields=["assignment", "grade"], name="voyage_sa_assignment_grade"
+            ),
+        ]
+
     @classmethod
     def create_random_student_assignment(cls):
         """
@@ -397,25 +463,157 @@ class StudentAssignment(QuxModel):
         """
 
         students = Student.objects.all()
-        assignments = Assignment.objects.all()
         faculties = Faculty.objects.all()
+        student_assignment = None
         for _ in range(1, 11):
             student = random.choice(students)
+            assignments = Assignment.objects.filter(program_id=student.program_id)
+            if not assignments:
+                continue
             assignment = random.choice(assignments)
             faculty = random.choice(faculties)
 
             submitted_date = datetime.now() - timedelta(days=random.randint(0, 7))
             reviewed_date = submitted_date + timedelta(days=random.randint(0, 7))
+            grade = random.choice([None, Decimal(random.randint(6000, 10000)) / 100])
 
-            student_assignment = cls(
+            # a student submits an assignment once, so a repeated pick
+            # replaces the earlier submission
+            student_assignment, _ = cls.objects.update_or_create(
                 student=student,
                 assignment=assignment,
-                grade=random.choice([None, random.uniform(60, 100)]),
-                submitted=submitted_date,
-                reviewed=reviewed_date,
-                reviewer=faculty,
-                feedback=f"Feedback for Assignment_{assignment.id}",
+                defaults={
+                    "grade": grade,
+                    "submitted": submitted_date,
+                    "reviewed": reviewed_date,
+                    "reviewer": faculty,
+                    "feedback": f"Feedback for Assignment_{assignment.id}",
+                },
             )
-            student_assignment.save()
 
         return student_assignment
+
+
+class GradebookRollup(QuxModel):
+    """
+    Denormalized submission and grade totals, kept up to date incrementally
+    from StudentAssignment and Assignment saves and deletes (see signals.py).
+    """
+
+    submitted_count = models.IntegerField(default=0)
+    graded_count = models.IntegerField(default=0)
+    grade_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average_grade(self):
+        """
+        Returns the average of the graded submissions, or None
+        """
+        if not self.graded_count:
+            return None
+        return round(self.grade_sum / self.graded_count, 2)
+
+
+class StudentCourseRollup(GradebookRollup):
+    """
+    Gradebook totals for one student in one course.
+    """
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ["student", "course"]
+
+
+class AssignmentRollup(GradebookRollup):
+    """
+    Gradebook totals for one assignment.
+    """
+
+    assignment = models.OneToOneField(Assignment, on_delete=models.CASCADE)
+
+
+class ProgramCourseRollup(GradebookRollup):
+    """
+    Gradebook totals and the number of assignments of one course within one
+    program. A row exists while the course has assignments in the program.
+    """
+
+    program = models.ForeignKey(Program, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    assignment_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ["program", "course"]
+
+
+class TeachingLink(QuxModel):
+    """
+    A pair of entities linked through at least one assignment, with the number
+    of those assignments, kept up to date from Assignment and Content saves and
+    deletes (see signals.py). Rows are removed when the count drops to 0.
+    Programs and courses are linked by ProgramCourseRollup.
+    """
+
+    assignment_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class FacultyCourse(TeachingLink):
+    """
+    A course in which a faculty member's content is assigned.
+    """
+
+    faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ["faculty", "course"]
+
+
+class FacultyProgram(TeachingLink):
+    """
+    A program in which a faculty member's content is assigned.
+    """
+
+    faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE)
+    program = models.ForeignKey(Program, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ["faculty", "program"]
+
+
+class StudentRepository(QuxModel):
+    """
+    The copy of an assignment's content repo provisioned for one student,
+    see utils/provisioning.py.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        PROVISIONING = "provisioning"
+        READY = "ready"
+        FAILED = "failed"
+
+    student_assignment = models.OneToOneField(
+        StudentAssignment, on_delete=models.CASCADE, related_name="repository"
+    )
+    url = models.CharField(max_length=240)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING, db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(default=None, null=True, blank=True)
+    provisioned = models.DateTimeField(default=None, null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Student repositories"
+
+    def __str__(self):
+        return self.url
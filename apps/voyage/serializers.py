@@ -0,0 +1,202 @@
+"""
+API serializers for voyage app
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .models import (
+    Assignment,
+    Content,
+    Course,
+    Faculty,
+    Program,
+    Student,
+    StudentAssignment,
+)
+from .utils.grading import MAX_GRADE
+
+FIELDS_PARAM = "fields"
+
+
+def requested_fields(request):
+    """
+    Returns the set of field names in ?fields=a,b or None when not given
+    """
+    if request is None or not request.query_params.get(FIELDS_PARAM):
+        return None
+    return {
+        name.strip()
+        for name in request.query_params[FIELDS_PARAM].split(",")
+        if name.strip()
+    }
+
+
+class SparseFieldsMixin:
+    """
+    Limits the serialized fields of the top level serializer to ?fields=
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get("request"))
+        if wanted is None:
+            return
+        unknown = wanted - set(self.fields)
+        if unknown:
+            raise ValidationError(
+                {FIELDS_PARAM: f"Unknown fields: {', '.join(sorted(unknown))}"}
+            )
+        for name in set(self.fields) - wanted:
+            self.fields.pop(name)
+
+
+class ContentSummarySerializer(serializers.ModelSerializer):
+    """
+    Content nested in a faculty member
+    """
+
+    class Meta:
+        model = Content
+        fields = ["id", "name", "repo"]
+
+
+class FacultySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Faculty with their content and annotated course, assignment and grading counts
+    """
+
+    username = serializers.CharField(source="user.username", read_only=True)
+    content = ContentSummarySerializer(source="content_set", many=True, read_only=True)
+    courses_count = serializers.IntegerField(read_only=True)
+    assignments_count = serializers.IntegerField(read_only=True)
+    graded_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Faculty
+        fields = [
+            "id",
+            "username",
+            "github",
+            "is_active",
+            "content",
+            "courses_count",
+            "assignments_count",
+            "graded_count",
+        ]
+
+
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Student with annotated assignment, submission and grade figures
+    """
+
+    username = serializers.CharField(source="user.username", read_only=True)
+    program_name = serializers.CharField(source="program.name", read_only=True)
+    assignments_count = serializers.IntegerField(read_only=True)
+    submitted_count = serializers.IntegerField(read_only=True)
+    avg_grade = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Student
+        fields = [
+            "id",
+            "username",
+            "github",
+            "is_active",
+            "program",
+            "program_name",
+            "assignments_count",
+            "submitted_count",
+            "avg_grade",
+        ]
+
+
+class ProgramSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Program with annotated course and student counts
+    """
+
+    courses_count = serializers.IntegerField(read_only=True)
+    students_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Program
+        fields = ["id", "name", "start", "end", "courses_count", "students_count"]
+
+
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Course with annotated assignment, submission and grade figures
+    """
+
+    assignments_count = serializers.IntegerField(read_only=True)
+    submissions_count = serializers.IntegerField(read_only=True)
+    avg_grade = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ["id", "name", "assignments_count", "submissions_count", "avg_grade"]
+
+
+class AssignmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Assignment with its related names and annotated submission figures
+    """
+
+    name = serializers.CharField(source="content.name", read_only=True)
+    faculty = serializers.IntegerField(source="content.faculty_id", read_only=True)
+    program_name = serializers.CharField(source="program.name", read_only=True)
+    course_name = serializers.CharField(source="course.name", read_only=True)
+    submissions_count = serializers.IntegerField(read_only=True)
+    graded_count = serializers.IntegerField(read_only=True)
+    avg_grade = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Assignment
+        fields = [
+            "id",
+            "name",
+            "program",
+            "program_name",
+            "course",
+            "course_name",
+            "content",
+            "faculty",
+            "due",
+            "instructions",
+            "rubric",
+            "submissions_count",
+            "graded_count",
+            "avg_grade",
+        ]
+
+
+class StudentAssignmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    One student's submission and its grading details
+    """
+
+    class Meta:
+        model = StudentAssignment
+        fields = [
+            "id",
+            "student",
+            "assignment",
+            "grade",
+            "submitted",
+            "reviewed",
+            "reviewer",
+            "feedback",
+        ]
+
+
+class GradeEntrySerializer(serializers.Serializer):
+    """
+    One entry of a bulk grading request
+    """
+
+    student_assignment_id = serializers.IntegerField()
+    grade = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=MAX_GRADE
+    )
+    feedback = serializers.CharField(required=False, allow_blank=True, allow_null=True)
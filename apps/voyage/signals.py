@@ -0,0 +1,179 @@
+"""
+signals for voyage app
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Assignment, Content, Student, StudentAssignment
+from .tasks import create_student_assignments, enqueue
+from .utils import caching, gradebook, teaching
+
+
+@receiver(pre_save, sender=StudentAssignment)
+def remember_student_assignment(sender, instance, raw=False, **kwargs):
+    """
+    Keeps the stored state of the row so post_save can apply only the difference
+    """
+    if raw:
+        return
+    instance._gradebook_before = (
+        gradebook.stored_snapshot(instance.pk) if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=StudentAssignment)
+def update_gradebook_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Updates the gradebook rollups after a StudentAssignment is saved
+    """
+    if raw:
+        return
+    before = getattr(instance, "_gradebook_before", None)
+    after = gradebook.snapshot(instance)
+    gradebook.record_change(before, after)
+    caching.record_changes([(before, after)])
+
+
+@receiver(post_delete, sender=StudentAssignment)
+def update_gradebook_on_delete(sender, instance, **kwargs):
+    """
+    Removes a deleted StudentAssignment from the gradebook rollups
+    """
+    before = gradebook.snapshot(instance)
+    gradebook.record_change(before, None)
+    caching.record_changes([(before, None)])
+
+
+@receiver(post_save, sender=Assignment)
+def fan_out_assignment(sender, instance, created, raw=False, **kwargs):
+    """
+    Creates the StudentAssignment rows of a new assignment in the background
+    """
+    if created and not raw:
+        enqueue(create_student_assignments, assignment_ids=[instance.pk])
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_program(sender, instance, raw=False, **kwargs):
+    """
+    Keeps the stored program so post_save can tell if the student moved
+    """
+    if raw or not instance.pk:
+        return
+    instance._program_before = (
+        Student.objects.filter(pk=instance.pk)
+        .values_list("program_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Student)
+def fan_out_student(sender, instance, created, raw=False, **kwargs):
+    """
+    Creates the StudentAssignment rows of a student who joined a program
+    """
+    if raw:
+        return
+    if created or getattr(instance, "_program_before", None) != instance.program_id:
+        enqueue(create_student_assignments, student_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_dashboards(sender, instance, raw=False, **kwargs):
+    """
+    Invalidates the dashboards showing a saved or deleted student
+    """
+    if raw:
+        return
+    programs = {instance.program_id, getattr(instance, "_program_before", None)}
+    caching.students_changed([instance.pk], programs - {None})
+
+
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_delete, sender=Assignment)
+def remember_assignment_placement(sender, instance, raw=False, **kwargs):
+    """
+    Keeps the stored (program_id, course_id, content_id, faculty_id) of the
+    row, read once for the gradebook, the teaching links and the dashboards
+    """
+    if raw or not instance.pk:
+        return
+    instance._placement_before = (
+        Assignment.objects.filter(pk=instance.pk)
+        .values_list("program_id", "course_id", "content_id", "content__faculty_id")
+        .first()
+    )
+
+
+def _placement(instance):
+    """
+    Returns the placement of a saved Assignment, reusing the stored faculty
+    when its content didn't change
+    """
+    before = getattr(instance, "_placement_before", None)
+    if before and before[2] == instance.content_id:
+        faculty_id = before[3]
+    else:
+        faculty_id = (
+            Content.objects.filter(pk=instance.content_id)
+            .values_list("faculty_id", flat=True)
+            .first()
+        )
+    return instance.program_id, instance.course_id, instance.content_id, faculty_id
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def update_assignment_placement(sender, instance, signal, raw=False, **kwargs):
+    """
+    Moves the gradebook totals and teaching links of a saved or deleted
+    assignment, and invalidates the dashboards showing it
+    """
+    if raw:
+        return
+    before = getattr(instance, "_placement_before", None)
+    after = _placement(instance) if signal is post_save else None
+    gradebook.assignment_moved(instance.pk, before and before[:2], after and after[:2])
+    teaching.record_change(
+        before and (before[0], before[1], before[3]),
+        after and (after[0], after[1], after[3]),
+    )
+    caching.assignments_changed([state[:3] for state in (before, after) if state])
+
+
+@receiver(pre_save, sender=Content)
+def remember_content_faculty(sender, instance, raw=False, **kwargs):
+    """
+    Keeps the stored faculty so that both the old and new one are invalidated
+    """
+    if raw or not instance.pk:
+        return
+    instance._faculty_before = (
+        Content.objects.filter(pk=instance.pk)
+        .values_list("faculty_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content_dashboards(sender, instance, raw=False, **kwargs):
+    """
+    Invalidates the dashboards showing a saved or deleted content
+    """
+    if raw:
+        return
+    faculties = {instance.faculty_id, getattr(instance, "_faculty_before", None)}
+    caching.content_changed(instance.pk, faculties - {None})
+
+
+@receiver(post_save, sender=Content)
+def update_teaching_on_content(sender, instance, raw=False, **kwargs):
+    """
+    Moves the teaching links of a content's assignments to its new faculty;
+    deleted content takes its assignments, and their links, with it
+    """
+    if raw or not hasattr(instance, "_faculty_before"):
+        return
+    teaching.content_moved(instance.pk, instance._faculty_before, instance.faculty_id)
@@ -0,0 +1,87 @@
+"""
+celery tasks for voyage app
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from kombu.exceptions import OperationalError
+
+from .utils import fanout
+from .utils.imports import GradeImport, RosterImport
+from .utils.provisioning import Provisioner
+
+logger = logging.getLogger(__name__)
+
+IMPORTS = {"roster": RosterImport, "grades": GradeImport}
+
+
+def enqueue(task, **kwargs):
+    """
+    Queues task once the current transaction commits, running it in this
+    process instead when the broker can't be reached
+    """
+
+    def send():
+        try:
+            task.apply_async(kwargs=kwargs, retry=False)
+        except OperationalError:
+            logger.warning("Broker unavailable, running %s inline", task.name)
+            task.apply(kwargs=kwargs)
+
+    transaction.on_commit(send)
+
+
+@shared_task
+def create_student_assignments(student_ids=None, assignment_ids=None):
+    """
+    Creates the missing StudentAssignment rows of the given students or
+    assignments, then provisions their repos when REPO_TARGET_URL is set
+    """
+    created = fanout.create_missing(student_ids, assignment_ids)
+    if settings.REPO_TARGET_URL:
+        enqueue(
+            provision_repositories,
+            student_ids=student_ids,
+            assignment_ids=assignment_ids,
+        )
+    return created
+
+
+@shared_task(bind=True)
+def provision_repositories(
+    self, student_ids=None, assignment_ids=None, retry_failed=False
+):
+    """
+    Pushes the content repos of the given students or assignments to their
+    student repos, reporting the running counts as PROGRESS state
+    """
+
+    def progress(summary):
+        if not self.request.is_eager:
+            self.update_state(state="PROGRESS", meta=summary)
+
+    return Provisioner(progress=progress).run(
+        student_ids, assignment_ids, retry_failed=retry_failed
+    )
+
+
+@shared_task(bind=True)
+def import_csv(self, kind, name, delete=True):
+    """
+    Imports the CSV file stored as name in the default storage, reporting
+    the running counts as PROGRESS state, and returns the import summary
+    """
+
+    def progress(summary):
+        if not self.request.is_eager:
+            self.update_state(state="PROGRESS", meta=summary)
+
+    try:
+        with default_storage.open(name, "rb") as file:
+            return IMPORTS[kind](progress=progress).run(file)
+    finally:
+        if delete:
+            default_storage.delete(name)
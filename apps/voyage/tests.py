@@ -0,0 +1,1511 @@
+"""
+tests for voyage app
+"""
+import csv
+import gzip
+import html
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Avg, F, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from kombu.exceptions import OperationalError
+
+from .admin import StudentAssignmentAdmin
+from .middleware import QueryBudgetExceeded, QueryMetricsMiddleware
+from .models import (
+    Assignment,
+    AssignmentRollup,
+    Content,
+    Course,
+    Faculty,
+    FacultyProgram,
+    Program,
+    ProgramCourseRollup,
+    Student,
+    StudentAssignment,
+    StudentRepository,
+)
+from .tasks import create_student_assignments, import_csv
+from .utils import analytics, caching, exports, fanout, gradebook, teaching
+from .utils.grading import MAX_GRADE, bulk_grade
+from .utils.imports import GradeImport, RosterImport
+from .utils.provisioning import GitError, Provisioner
+from .utils.relations import RelationDescriptor
+
+DUE = datetime(2024, 1, 15, tzinfo=timezone.utc)
+
+
+class VoyageTestCase(TestCase):
+    """
+    Two programs sharing three courses, taught by two faculty members, with
+    a submission, graded or not, for most student and assignment pairs
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = get_user_model().objects
+        cls.faculty = [
+            Faculty.objects.create(
+                user=users.create(username=f"faculty{i}"), github=f"faculty-{i}"
+            )
+            for i in range(2)
+        ]
+        cls.programs = [
+            Program.objects.create(
+                name=f"Program {i}", start=DUE - timedelta(days=90), end=DUE
+            )
+            for i in range(2)
+        ]
+        cls.courses = [Course.objects.create(name=f"Course {i}") for i in range(3)]
+        cls.contents = [
+            Content.objects.create(
+                name=f"Content {i}",
+                faculty=cls.faculty[i % 2],
+                repo=f"https://github.com/faculty-{i % 2}/content-{i}",
+            )
+            for i in range(4)
+        ]
+        cls.assignments = [
+            Assignment.objects.create(
+                program=program,
+                course=course,
+                content=cls.contents[(i + j) % 4],
+                due=DUE,
+                instructions="Instructions",
+                rubric="Rubric",
+            )
+            for i, program in enumerate(cls.programs)
+            for j, course in enumerate(cls.courses)
+        ]
+        cls.students = [
+            Student.objects.create(
+                user=users.create(username=f"student{i}"),
+                github=f"student-{i}",
+                program=cls.programs[i % 2],
+            )
+            for i in range(6)
+        ]
+        for i, student in enumerate(cls.students):
+            for j, assignment in enumerate(cls.assignments):
+                if assignment.program_id != student.program_id or (i + j) % 4 == 0:
+                    continue
+                StudentAssignment.objects.create(
+                    student=student,
+                    assignment=assignment,
+                    submitted=DUE - timedelta(hours=i + j),
+                    grade=Decimal(50 + 10 * ((i + j) % 5)) if j % 3 else None,
+                    reviewer=assignment.content.faculty if j % 3 else None,
+                )
+
+    def setUp(self):
+        cache.clear()
+
+
+class DashboardQueryTests(VoyageTestCase):
+    """
+    The dashboards run a fixed number of queries, whatever the size of the
+    program, and one once cached
+    """
+
+    def test_student_dashboard(self):
+        url = reverse("student_dashboard", args=[self.students[0].pk])
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        dashboard = response.context["dashboard"]
+        self.assertEqual(len(dashboard["courses"]), 3)
+        self.assertEqual(len(dashboard["assignments"]), 3)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_faculty_dashboard(self):
+        url = reverse("faculty_dashboard", args=[self.faculty[0].pk])
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        courses = response.context["courses_taught"]
+        self.assertEqual(
+            [course["name"] for course in courses], ["Course 0", "Course 1", "Course 2"]
+        )
+        for course in courses:
+            self.assertEqual(course["students_count"], 6)
+            self.assertEqual(course["assignments_count"], 2)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_queries_do_not_grow_with_the_program(self):
+        url = reverse("student_dashboard", args=[self.students[0].pk])
+        Assignment.objects.create(
+            program=self.programs[0],
+            course=self.courses[0],
+            content=self.contents[3],
+            due=DUE,
+            instructions="Instructions",
+            rubric="Rubric",
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["dashboard"]["assignments"]), 4)
+
+
+class GradebookTests(VoyageTestCase):
+    """
+    The rollups stay equal to a fresh computation through saves, moves and
+    deletes of submissions and assignments
+    """
+
+    def assertRollupsCurrent(self):
+        self.assertEqual(gradebook.verify(), [])
+
+    def test_fixture(self):
+        self.assertRollupsCurrent()
+        self.assertTrue(AssignmentRollup.objects.exists())
+
+    def test_submission_changes(self):
+        submission = StudentAssignment.objects.filter(grade__isnull=True).first()
+        submission.grade = Decimal("75.50")
+        submission.save()
+        self.assertRollupsCurrent()
+
+        submission.grade = None
+        submission.submitted = None
+        submission.save()
+        self.assertRollupsCurrent()
+
+        StudentAssignment.objects.filter(grade__isnull=False).first().delete()
+        StudentAssignment.objects.create(
+            student=self.students[0], assignment=self.assignments[0], grade=90
+        )
+        self.assertRollupsCurrent()
+
+    def test_assignment_moves(self):
+        assignment = self.assignments[0]
+        assignment.course = self.courses[1]
+        assignment.save()
+        self.assertRollupsCurrent()
+
+        assignment.program = self.programs[1]
+        assignment.content = self.contents[1]
+        assignment.save()
+        self.assertRollupsCurrent()
+
+        course = Course.objects.create(name="Course 3")
+        assignment.course = course
+        assignment.save()
+        self.assertEqual(
+            ProgramCourseRollup.objects.get(course=course).assignment_count, 1
+        )
+        assignment.course = self.courses[2]
+        assignment.save()
+        self.assertFalse(ProgramCourseRollup.objects.filter(course=course).exists())
+        self.assertRollupsCurrent()
+
+    def test_deletes(self):
+        self.assignments[1].delete()
+        self.assertRollupsCurrent()
+        self.students[1].delete()
+        self.assertRollupsCurrent()
+        course = self.courses[2]
+        course.delete()
+        self.assertRollupsCurrent()
+        self.assertFalse(ProgramCourseRollup.objects.filter(course=course.pk).exists())
+
+    def test_random_submissions(self):
+        for _ in range(3):
+            StudentAssignment.create_random_student_assignment()
+        self.assertFalse(
+            StudentAssignment.objects.exclude(
+                assignment__program=F("student__program")
+            ).exists()
+        )
+        self.assertRollupsCurrent()
+
+
+class GradebookMigrationTests(TransactionTestCase):
+    """
+    Migrating a database with submissions fills the rollups with their totals
+    """
+
+    before = [("voyage", "0002_studentassignment_submitted_index")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        apps = self.executor.loader.project_state(self.before).apps
+        users = apps.get_model("auth", "User").objects
+        program = apps.get_model("voyage", "Program").objects.create(
+            name="Program", start=DUE - timedelta(days=90), end=DUE
+        )
+        faculty = apps.get_model("voyage", "Faculty").objects.create(
+            user=users.create(username="faculty"), github="faculty"
+        )
+        content = apps.get_model("voyage", "Content").objects.create(
+            name="Content", faculty=faculty, repo="https://github.com/faculty/content"
+        )
+        self.assignments = [
+            apps.get_model("voyage", "Assignment").objects.create(
+                program=program,
+                course=apps.get_model("voyage", "Course").objects.create(
+                    name=f"Course {i}"
+                ),
+                content=content,
+                due=DUE,
+                instructions="Instructions",
+                rubric="Rubric",
+            )
+            for i in range(2)
+        ]
+        self.StudentAssignment = apps.get_model("voyage", "StudentAssignment")
+        self.students = [
+            apps.get_model("voyage", "Student").objects.create(
+                user=users.create(username=f"student{i}"),
+                github=f"student-{i}",
+                program=program,
+            )
+            for i in range(3)
+        ]
+        for i, student in enumerate(self.students):
+            for j, assignment in enumerate(self.assignments):
+                self.StudentAssignment.objects.create(
+                    student=student,
+                    assignment=assignment,
+                    submitted=DUE,
+                    grade=Decimal("70.50") + i if i + j else None,
+                )
+
+    def tearDown(self):
+        self.migrate()
+
+    def migrate(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+    def assertRollupsFilled(self):
+        self.assertEqual(gradebook.verify(), [])
+        self.assertEqual(StudentAssignment.objects.count(), 6)
+        rollup = AssignmentRollup.objects.get(assignment_id=self.assignments[0].pk)
+        self.assertEqual(
+            (rollup.submitted_count, rollup.graded_count, rollup.grade_sum),
+            (3, 2, Decimal("144.00")),
+        )
+        rollup = ProgramCourseRollup.objects.get(
+            course_id=self.assignments[1].course_id
+        )
+        self.assertEqual((rollup.assignment_count, rollup.graded_count), (1, 3))
+
+    def test_rollups_are_filled(self):
+        self.migrate()
+        self.assertRollupsFilled()
+
+    def test_removed_duplicates_are_not_counted(self):
+        self.StudentAssignment.objects.create(
+            student=self.students[2], assignment=self.assignments[0], grade=10
+        )
+        with self.assertLogs("apps.voyage.migrations", "WARNING"):
+            self.migrate()
+        self.assertRollupsFilled()
+
+
+class TeachingLinkTests(VoyageTestCase):
+    """
+    The faculty links stay equal to a fresh computation through assignment
+    and content changes
+    """
+
+    def assertLinksCurrent(self):
+        self.assertEqual(teaching.verify(), [])
+
+    def test_fixture(self):
+        self.assertLinksCurrent()
+        self.assertEqual(
+            set(self.faculty[1].courses().values_list("pk", flat=True)),
+            {course.pk for course in self.courses},
+        )
+
+    def test_assignment_changes(self):
+        assignment = self.assignments[0]
+        assignment.content = self.contents[3]
+        assignment.save()
+        self.assertLinksCurrent()
+
+        assignment.program = self.programs[1]
+        assignment.course = Course.objects.create(name="Course 3")
+        assignment.save()
+        self.assertLinksCurrent()
+
+        assignment.delete()
+        self.assertLinksCurrent()
+
+    def test_content_changes(self):
+        content = self.contents[0]
+        content.faculty = self.faculty[1]
+        content.save()
+        self.assertLinksCurrent()
+
+        self.contents[2].delete()
+        self.assertLinksCurrent()
+        self.assertFalse(self.faculty[0].has_courses())
+        self.assertFalse(
+            FacultyProgram.objects.filter(faculty=self.faculty[0]).exists()
+        )
+
+
+class BulkGradeTests(VoyageTestCase):
+    """
+    bulk_grade writes the valid entries and reports the others by index
+    """
+
+    def test_errors_by_row(self):
+        faculty = self.faculty[0]
+        mine = StudentAssignment.objects.filter(
+            assignment__content__faculty=faculty, submitted__isnull=False
+        ).order_by("pk")
+        others = StudentAssignment.objects.exclude(assignment__content__faculty=faculty)
+        unsubmitted = mine.first()
+        unsubmitted.submitted = None
+        unsubmitted.save()
+        graded, duplicate = mine[0], mine[1]
+        entries = list(
+            enumerate(
+                [
+                    {"student_assignment_id": graded.pk, "grade": Decimal("88.50")},
+                    {"student_assignment_id": duplicate.pk, "grade": 70},
+                    {"student_assignment_id": duplicate.pk, "grade": 80},
+                    {"student_assignment_id": others.first().pk, "grade": 10},
+                    {"student_assignment_id": unsubmitted.pk, "grade": 10},
+                    {"student_assignment_id": 999999, "grade": 10},
+                ]
+            )
+        )
+
+        count, errors = bulk_grade(faculty, entries, user=faculty.user)
+
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            [
+                (error["index"], error["errors"]["student_assignment_id"])
+                for error in errors
+            ],
+            [
+                (2, ["Graded more than once in this request."]),
+                (3, ["Belongs to another faculty member's content."]),
+                (4, ["Has not been submitted."]),
+                (5, ["Does not exist."]),
+            ],
+        )
+        graded.refresh_from_db()
+        self.assertEqual(graded.grade, Decimal("88.50"))
+        self.assertEqual(graded.reviewer, faculty)
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.grade, 70)
+        self.assertEqual(LogEntry.objects.count(), 2)
+        self.assertEqual(gradebook.verify(), [])
+
+
+class KeysetChangeListTests(VoyageTestCase):
+    """
+    The StudentAssignment changelist pages by primary key cursor
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin", "admin@example.com")
+        )
+        self.url = reverse("admin:voyage_studentassignment_changelist")
+
+    @mock.patch.object(StudentAssignmentAdmin, "list_per_page", 5)
+    def test_pages_follow_the_cursor(self):
+        pks, url = [], self.url
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            changelist = response.context["cl"]
+            pks += [row.pk for row in changelist.result_list]
+            url = changelist.next_page_url and self.url + changelist.next_page_url
+        expected = list(
+            StudentAssignment.objects.order_by("-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(pks, expected)
+
+    @mock.patch.object(StudentAssignmentAdmin, "list_per_page", 5)
+    def test_filters_apply_after_the_cursor(self):
+        course = self.courses[1]
+        response = self.client.get(
+            self.url, {"assignment__course__id__exact": course.pk, "cursor": 10**6}
+        )
+        rows = response.context["cl"].result_list
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row.assignment.course_id == course.pk for row in rows))
+
+    def test_sorting_falls_back_to_numbered_pages(self):
+        response = self.client.get(self.url, {"o": "3", "cursor": 1})
+        changelist = response.context["cl"]
+        self.assertFalse(changelist.keyset_paged)
+        self.assertIsNone(changelist.next_page_url)
+        self.assertEqual(len(changelist.result_list), StudentAssignment.objects.count())
+
+
+class GradebookExportTests(VoyageTestCase):
+    """
+    Gradebooks stream as CSV to staff and to the faculty teaching them
+    """
+
+    def export(self, scope, pk, **params):
+        return self.client.get(reverse("gradebook_export", args=[scope, pk]), params)
+
+    def read(self, response):
+        content = b"".join(response.streaming_content)
+        if response["Content-Type"] == "application/gzip":
+            content = gzip.decompress(content)
+        return list(csv.reader(io.StringIO(content.decode())))
+
+    def test_faculty_course_export(self):
+        self.client.force_login(self.faculty[0].user)
+        course = self.courses[0]
+        response = self.export("course", course.pk)
+        self.assertEqual(response.status_code, 200)
+        rows = self.read(response)
+        self.assertEqual(rows[0], [name for name, _ in exports.COLUMNS])
+        expected = StudentAssignment.objects.filter(assignment__course=course)
+        self.assertEqual(
+            [int(row[0]) for row in rows[1:]],
+            list(expected.order_by("pk").values_list("pk", flat=True)),
+        )
+
+    def test_gzip_export(self):
+        self.client.force_login(
+            get_user_model().objects.create(username="staff", is_staff=True)
+        )
+        program = self.programs[1]
+        response = self.export("program", program.pk, gzip=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(".csv.gz", response["Content-Disposition"])
+        rows = self.read(response)
+        self.assertEqual(
+            len(rows) - 1,
+            StudentAssignment.objects.filter(assignment__program=program).count(),
+        )
+
+    def test_faculty_cannot_export_other_content(self):
+        self.client.force_login(self.faculty[0].user)
+        other = Assignment.objects.exclude(content__faculty=self.faculty[0]).first()
+        self.assertEqual(self.export("assignment", other.pk).status_code, 403)
+
+
+class CsvImportTests(VoyageTestCase):
+    """
+    Roster and grade files import batch by batch and through the API
+    """
+
+    def test_roster_import(self):
+        program = self.programs[0]
+        lines = ["username,email,github,program"] + [
+            f"new{i},new{i}@example.com,new-{i},{program.pk}" for i in range(5)
+        ]
+        lines += [
+            f"student0,taken@example.com,taken,{program.pk}",
+            f"upper,upper@example.com,Student-1,{program.pk}",
+            f"again,again@example.com,NEW-0,{program.pk}",
+        ]
+        with mock.patch("apps.voyage.tasks.enqueue") as enqueue:
+            summary = RosterImport(batch_size=2).run(io.StringIO("\n".join(lines)))
+
+        self.assertEqual((summary["rows"], summary["created"]), (8, 5))
+        taken = {"github": "Already used by a student or faculty member."}
+        self.assertEqual(
+            summary["errors"],
+            [
+                {"line": 7, "errors": {"username": "Already taken."}},
+                {"line": 8, "errors": taken},
+                {"line": 9, "errors": taken},
+            ],
+        )
+        created = Student.objects.filter(github__startswith="new-", program=program)
+        self.assertEqual(created.count(), 5)
+        enqueue.assert_called_once()
+        self.assertEqual(
+            sorted(enqueue.call_args.kwargs["student_ids"]),
+            sorted(created.values_list("pk", flat=True)),
+        )
+
+    def test_roster_import_fans_out_committed_batches(self):
+        lines = ["username,email,github,program"] + [
+            f"new{i},new{i}@example.com,new-{i},{self.programs[0].pk}" for i in range(4)
+        ]
+        with mock.patch("apps.voyage.tasks.enqueue") as enqueue, mock.patch(
+            "apps.voyage.utils.caching.students_changed",
+            side_effect=[None, IntegrityError("conflict")],
+        ), self.assertRaises(IntegrityError):
+            RosterImport(batch_size=2).run(io.StringIO("\n".join(lines)))
+
+        committed = Student.objects.filter(github__startswith="new-")
+        self.assertEqual(
+            sorted(committed.values_list("github", flat=True)), ["new-0", "new-1"]
+        )
+        enqueue.assert_called_once()
+        self.assertEqual(
+            sorted(enqueue.call_args.kwargs["student_ids"]),
+            sorted(committed.values_list("pk", flat=True)),
+        )
+
+    def test_grade_import(self):
+        submission = StudentAssignment.objects.filter(grade__isnull=True).first()
+        student = self.students[0]
+        assignment = Assignment.objects.filter(program=student.program).exclude(
+            studentassignment__student=student
+        )[0]
+        lines = [
+            "github,assignment,grade,reviewer",
+            f"{submission.student.github},{submission.assignment_id},91.5,faculty-1",
+            f"{student.github},{assignment.pk},60,",
+            f"nobody,{assignment.pk},60,",
+        ]
+        summary = GradeImport().run(io.StringIO("\n".join(lines)))
+
+        self.assertEqual((summary["created"], summary["updated"]), (1, 1))
+        self.assertEqual(summary["error_count"], 1)
+        submission.refresh_from_db()
+        self.assertEqual(submission.grade, Decimal("91.50"))
+        self.assertEqual(submission.reviewer, self.faculty[1])
+        self.assertTrue(
+            StudentAssignment.objects.filter(
+                student=student, assignment=assignment, grade=60
+            ).exists()
+        )
+        self.assertEqual(gradebook.verify(), [])
+
+    def test_api_import(self):
+        self.client.force_login(
+            get_user_model().objects.create(username="staff", is_staff=True)
+        )
+        upload = SimpleUploadedFile(
+            "roster.csv",
+            f"username,email,github,program\napi,api@example.com,api,"
+            f"{self.programs[1].pk}\n".encode(),
+        )
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media
+        ), mock.patch.object(
+            import_csv, "delay", side_effect=lambda *args: import_csv.apply(args)
+        ):
+            response = self.client.post(
+                reverse("api-import-list"), {"kind": "roster", "file": upload}
+            )
+            self.assertEqual(os.listdir(os.path.join(media, "imports")), [])
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(Student.objects.filter(github="api").exists())
+
+    def test_api_import_without_broker(self):
+        self.client.force_login(
+            get_user_model().objects.create(username="staff", is_staff=True)
+        )
+        upload = SimpleUploadedFile("grades.csv", b"github,assignment,grade\n")
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media
+        ), mock.patch.object(
+            import_csv, "delay", side_effect=OperationalError("unreachable")
+        ):
+            response = self.client.post(
+                reverse("api-import-list"), {"kind": "grades", "file": upload}
+            )
+            self.assertEqual(os.listdir(os.path.join(media, "imports")), [])
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ApiTests(VoyageTestCase):
+    """
+    The read API pages by cursor, serializes the requested fields only,
+    validates its filters and stays within each view's query budget
+    """
+
+    endpoints = {
+        "api-faculty-list": Faculty,
+        "api-student-list": Student,
+        "api-program-list": Program,
+        "api-course-list": Course,
+        "api-assignment-list": Assignment,
+        "api-studentassignment-list": StudentAssignment,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(
+            get_user_model().objects.create(username="staff", is_staff=True)
+        )
+
+    def test_endpoints(self):
+        for name, model in self.endpoints.items():
+            with self.subTest(name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [row["id"] for row in response.json()["results"]],
+                    list(model.objects.order_by("-pk").values_list("pk", flat=True)),
+                )
+                queries = int(response["Server-Timing"].split('"')[1].split()[0])
+                self.assertLessEqual(queries, response.wsgi_request.query_budget)
+
+    def test_aggregates(self):
+        response = self.client.get(reverse("api-course-list"))
+        course = response.json()["results"][-1]
+        self.assertEqual(course["id"], self.courses[0].pk)
+        self.assertEqual(course["assignments_count"], 2)
+        self.assertEqual(
+            course["submissions_count"],
+            StudentAssignment.objects.filter(
+                assignment__course=self.courses[0]
+            ).count(),
+        )
+
+    def test_cursor_pagination(self):
+        url = reverse("api-student-list") + "?page_size=4"
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([row["id"] for row in data["results"]])
+            self.assertNotIn("count", data)
+            url = data["next"]
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        self.assertEqual(
+            sum(pages, []),
+            sorted((student.pk for student in self.students), reverse=True),
+        )
+
+    def test_sparse_fields(self):
+        url = reverse("api-assignment-list")
+        response = self.client.get(url, {"fields": "id,avg_grade"})
+        self.assertEqual(
+            {tuple(row) for row in response.json()["results"]}, {("id", "avg_grade")}
+        )
+        response = self.client.get(url, {"fields": "id,secret"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        Student.objects.filter(pk=self.students[0].pk).update(is_active=False)
+        url = reverse("api-student-list")
+        for params, count in (
+            ({"is_active": "false"}, 1),
+            ({"is_active": "true"}, 5),
+            ({"is_active": "0", "program": self.programs[0].pk}, 1),
+            ({"program": self.programs[1].pk}, 3),
+        ):
+            with self.subTest(**params):
+                response = self.client.get(url, params)
+                self.assertEqual(len(response.json()["results"]), count)
+
+    def test_invalid_filters(self):
+        url = reverse("api-student-list")
+        response = self.client.get(url, {"is_active": "maybe"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("is_active", response.json())
+        response = self.client.get(url, {"program": "first"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("filters", response.json())
+
+    def test_staff_only(self):
+        self.client.force_login(self.faculty[0].user)
+        response = self.client.get(reverse("api-student-list"))
+        self.assertEqual(response.status_code, 403)
+
+
+class QueryMetricsMiddlewareTests(TestCase):
+    """
+    Every request is timed into a Server-Timing header and a JSON log line,
+    checked against the view's query budget
+    """
+
+    def setUp(self):
+        self.request = RequestFactory().get("/courses/")
+
+    def view(self, queries):
+        """
+        Returns a view running the given number of queries, with a budget of 2
+        """
+
+        def view(request):
+            for _ in range(queries):
+                Course.objects.count()
+            return HttpResponse("ok")
+
+        view.query_budget = 2
+        return view
+
+    def get(self, view):
+        middleware = QueryMetricsMiddleware(view)
+        middleware.process_view(self.request, view, (), {})
+        return middleware(self.request)
+
+    def test_within_budget(self):
+        with self.assertLogs("apps.voyage.metrics", "INFO") as logs:
+            response = self.get(self.view(2))
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;desc="2 queries";dur=[\d.]+, total;dur=[\d.]+$',
+        )
+        [line] = logs.records
+        self.assertEqual(line.levelname, "INFO")
+        record = json.loads(line.getMessage())
+        self.assertEqual(
+            {key: record[key] for key in ("path", "status", "queries", "query_budget")},
+            {"path": "/courses/", "status": 200, "queries": 2, "query_budget": 2},
+        )
+        self.assertFalse(record["streaming"])
+
+    def test_over_budget(self):
+        with self.assertLogs("apps.voyage.metrics", "WARNING") as logs:
+            self.get(self.view(3))
+        self.assertEqual(json.loads(logs.records[0].getMessage())["queries"], 3)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_budget(self):
+        with self.assertLogs("apps.voyage.metrics", "WARNING"), self.assertRaises(
+            QueryBudgetExceeded
+        ):
+            self.get(self.view(3))
+
+    @override_settings(QUERY_DUPLICATE_THRESHOLD=2)
+    def test_duplicates(self):
+        with self.assertLogs("apps.voyage.metrics", "WARNING") as logs:
+            self.get(self.view(2))
+        [(sql, count)] = json.loads(logs.records[0].getMessage())["duplicates"].items()
+        self.assertIn("COUNT(*)", sql)
+        self.assertEqual(count, 2)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_streaming(self):
+        def rows():
+            for _ in range(3):
+                yield f"{Course.objects.count()}\n"
+
+        def view(request):
+            Course.objects.count()
+            return StreamingHttpResponse(rows())
+
+        view.query_budget = 2
+        with self.assertLogs("apps.voyage.metrics", "INFO") as logs:
+            response = self.get(view)
+            self.assertEqual(logs.records, [])
+            self.assertIn('db;desc="1 queries"', response["Server-Timing"])
+            self.assertEqual(b"".join(response.streaming_content), b"0\n" * 3)
+        [line] = logs.records
+        record = json.loads(line.getMessage())
+        self.assertEqual(line.levelname, "WARNING")
+        self.assertEqual((record["queries"], record["streaming"]), (4, True))
+
+
+class RelationTests(VoyageTestCase):
+    """
+    The @relation methods return the same rows prefetched or not, memoized
+    until the instance is saved or refreshed, with count_ and has_ companions
+    """
+
+    models = (Faculty, Program, Course, Content, Student, Assignment)
+
+    @staticmethod
+    def relations(model):
+        return [
+            name
+            for name, attribute in vars(model).items()
+            if isinstance(attribute, RelationDescriptor)
+        ]
+
+    def test_prefetch_matches_queries(self):
+        for model in self.models:
+            names = self.relations(model)
+            with self.subTest(model=model.__name__):
+                objects = list(model.objects.order_by("pk"))
+                with self.assertNumQueries(len(objects) * len(names)):
+                    expected = [
+                        [
+                            sorted(row.pk for row in getattr(obj, name)())
+                            for name in names
+                        ]
+                        for obj in objects
+                    ]
+                with self.assertNumQueries(1 + len(names)):
+                    prefetched = [
+                        [
+                            sorted(row.pk for row in getattr(obj, name)())
+                            for name in names
+                        ]
+                        for obj in model.objects.order_by("pk").prefetch_related(*names)
+                    ]
+                self.assertEqual(prefetched, expected)
+                self.assertTrue(any(any(rows) for rows in expected))
+
+    def test_prefetch_queryset(self):
+        faculty = Faculty.objects.prefetch_related(
+            Prefetch("courses", queryset=Course.objects.filter(name="Course 1"))
+        ).get(pk=self.faculty[0].pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(faculty.courses()), [self.courses[1]])
+
+    def test_memoized_until_saved_or_refreshed(self):
+        faculty = Faculty.objects.get(pk=self.faculty[0].pk)
+        with self.assertNumQueries(1):
+            list(faculty.courses())
+            list(faculty.courses())
+        with self.assertNumQueries(2):
+            list(faculty.content(course=self.courses[0]))
+            list(faculty.content(course=self.courses[0]))
+
+        Assignment.objects.filter(content__faculty=faculty).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(faculty.courses()), 3)
+        faculty.save()
+        self.assertEqual(list(faculty.courses()), [])
+
+        Assignment.objects.create(
+            program=self.programs[0],
+            course=self.courses[2],
+            content=self.contents[0],
+            due=DUE,
+            instructions="Instructions",
+            rubric="Rubric",
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(list(faculty.courses()), [])
+        faculty.refresh_from_db()
+        self.assertEqual(list(faculty.courses()), [self.courses[2]])
+
+    def test_companions(self):
+        faculty = Faculty.objects.get(pk=self.faculty[0].pk)
+        with self.assertNumQueries(2):
+            self.assertEqual(faculty.count_programs(), 2)
+            self.assertTrue(faculty.has_courses())
+        self.assertEqual(faculty.num_assignments(), 3)
+        self.assertEqual(
+            faculty.count_content(course=self.courses[0]),
+            Content.objects.filter(
+                faculty=faculty, assignment__course=self.courses[0]
+            ).count(),
+        )
+
+        faculty = Faculty.objects.prefetch_related("courses").get(pk=faculty.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(faculty.count_courses(), 3)
+            self.assertTrue(faculty.has_courses())
+
+        graded = StudentAssignment.objects.filter(reviewer=faculty, grade__isnull=False)
+        self.assertEqual(faculty.count_assignments_graded(), graded.count())
+        assignment = graded[0].assignment
+        self.assertEqual(
+            faculty.count_assignments_graded(assignment),
+            graded.filter(assignment=assignment).count(),
+        )
+
+        student = self.students[0]
+        submissions = StudentAssignment.objects.filter(student=student)
+        self.assertEqual(student.count_assignments_submitted(), submissions.count())
+        self.assertEqual(
+            student.count_assignments_graded(),
+            submissions.filter(grade__isnull=False).count(),
+        )
+        self.assertFalse(student.has_assignments_not_submited())
+
+
+class AnalyticsTests(VoyageTestCase):
+    """
+    Grade statistics of known inputs, of groups without grades and of the
+    database's decimal grades
+    """
+
+    def frame(self, grades, latencies):
+        return pd.DataFrame(
+            {
+                "assignment_id": [1] * 5 + [2] * (len(grades) - 5),
+                "course_id": 1,
+                "program_id": 1,
+                "grade": grades,
+                "latency": latencies,
+            }
+        )
+
+    def test_known_grades(self):
+        frame = self.frame(
+            [60, 70, 80, 90, 100, np.nan, np.nan], [-2, -1, 0, 1, 3, 5, -4]
+        )
+        stats = analytics.as_dicts(analytics.statistics(frame, "assignment"))
+        self.assertEqual(
+            stats[1],
+            {
+                "submitted": 5,
+                "graded": 5,
+                "mean": 80.0,
+                "median": 80.0,
+                "std": 14.14,
+                "p10": 64.0,
+                "p25": 70.0,
+                "p75": 90.0,
+                "p90": 96.0,
+                "histogram": [0, 0, 0, 0, 0, 0, 1, 1, 1, 2],
+                "latency_mean": 0.2,
+                "latency_median": 0.0,
+                "late": 2,
+            },
+        )
+        # submitted but not graded
+        self.assertEqual((stats[2]["submitted"], stats[2]["graded"]), (2, 0))
+        self.assertIsNone(stats[2]["mean"])
+        self.assertIsNone(stats[2]["p90"])
+        self.assertEqual(stats[2]["histogram"], [0] * 10)
+        self.assertEqual(stats[2]["late"], 1)
+
+        [course] = analytics.as_dicts(analytics.statistics(frame, "course")).values()
+        self.assertEqual((course["submitted"], course["graded"]), (7, 5))
+        self.assertEqual(analytics.sparkline(course["histogram"]), "▁▁▁▁▁▁▅▅▅█")
+
+    def test_nothing_graded(self):
+        frame = self.frame([np.nan] * 6, [1] * 6)
+        stats = analytics.as_dicts(analytics.statistics(frame, "assignment"))
+        self.assertEqual(sorted(stats), [1, 2])
+        for row in stats.values():
+            self.assertEqual(row["graded"], 0)
+            self.assertIsNone(row["median"])
+            self.assertEqual(row["histogram"], [0] * 10)
+        self.assertEqual(analytics.sparkline(stats[1]["histogram"]), "")
+
+    def test_no_submissions(self):
+        self.assertEqual(analytics.grade_statistics("course", []), {})
+        StudentAssignment.objects.all().delete()
+        self.assertEqual(
+            analytics.report(), {"assignment": {}, "course": {}, "program": {}}
+        )
+
+    def test_database_grades(self):
+        assignment = self.assignments[1]
+        submissions = StudentAssignment.objects.filter(assignment=assignment)
+        first, *rest = submissions.order_by("pk")
+        submissions.filter(pk=first.pk).update(grade=Decimal("90.50"))
+        submissions.exclude(pk=first.pk).update(grade=Decimal("70.25"))
+
+        stats = analytics.grade_statistics("assignment", [assignment.pk])
+        self.assertEqual(list(stats), [assignment.pk])
+        row = stats[assignment.pk]
+        grades = sorted(submissions.values_list("grade", flat=True))
+        self.assertEqual(row["graded"], len(grades))
+        self.assertEqual(row["mean"], round(float(sum(grades) / len(grades)), 2))
+        self.assertIs(type(row["mean"]), float)
+        self.assertEqual(len(rest), 2)
+        self.assertEqual(row["median"], 70.25)
+        self.assertEqual(row["p90"], 86.45)
+        self.assertEqual(row["late"], 0)
+        self.assertLess(row["latency_mean"], 0)
+
+        report = analytics.report("program", [assignment.program_id])
+        self.assertEqual(report["assignment"][assignment.pk], row)
+        self.assertEqual(
+            report["program"][assignment.program_id]["submitted"],
+            StudentAssignment.objects.filter(
+                assignment__program=assignment.program_id
+            ).count(),
+        )
+        json.dumps(report)
+
+
+class AdminChangelistTests(VoyageTestCase):
+    """
+    The annotated changelist columns equal counts and averages computed
+    row by row, and their links open the rows they count
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(
+            get_user_model().objects.create(
+                username="admin", is_staff=True, is_superuser=True
+            )
+        )
+
+    def changelist(self, model, **params):
+        response = self.client.get(
+            reverse(f"admin:voyage_{model._meta.model_name}_changelist"), params
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.context["cl"]
+
+    def rows(self, model):
+        changelist = self.changelist(model)
+        return {obj.pk: obj for obj in changelist.result_list}, changelist.model_admin
+
+    def test_faculty_counts(self):
+        rows, _ = self.rows(Faculty)
+        for faculty in self.faculty:
+            with self.subTest(faculty=faculty.github):
+                row = rows[faculty.pk]
+                assignments = Assignment.objects.filter(content__faculty=faculty)
+                self.assertEqual(
+                    row.courses_count,
+                    assignments.values("course").distinct().count(),
+                )
+                self.assertEqual(row.assignments_count, assignments.count())
+                self.assertEqual(
+                    row.graded_count,
+                    StudentAssignment.objects.filter(
+                        reviewer=faculty, grade__isnull=False
+                    ).count(),
+                )
+
+    def test_student_columns(self):
+        rows, admin = self.rows(Student)
+        for student in self.students:
+            with self.subTest(student=student.github):
+                row = rows[student.pk]
+                submissions = StudentAssignment.objects.filter(student=student)
+                assignments = Assignment.objects.filter(program=student.program)
+                self.assertEqual(admin.program_name(row), student.program.name)
+                self.assertEqual(
+                    row.courses_count, assignments.values("course").distinct().count()
+                )
+                self.assertEqual(row.assignments_count, assignments.count())
+                self.assertEqual(
+                    admin.num_submitted(row),
+                    submissions.filter(submitted__isnull=False).count(),
+                )
+                average = submissions.aggregate(average=Avg("grade"))["average"]
+                self.assertEqual(admin.average_grade(row), round(float(average), 2))
+
+        graded = StudentAssignment.objects.filter(grade__isnull=False)
+        ungraded = self.students[0]
+        graded.filter(student=ungraded).update(grade=None)
+        gradebook.rebuild()
+        changelist = self.changelist(Student, avg_grade="none")
+        self.assertEqual(list(changelist.result_list), [ungraded])
+        self.assertIsNone(admin.average_grade(changelist.result_list[0]))
+
+    def test_count_links(self):
+        # a graded 100% submission, counted by the completed columns
+        submission = StudentAssignment.objects.filter(grade__isnull=False).first()
+        submission.grade = MAX_GRADE
+        submission.save()
+
+        columns = {
+            Faculty: [
+                "num_courses_taught",
+                "num_assignments_graded",
+                "num_assignments_by_faculty",
+            ],
+            Student: ["num_courses_enrolled", "num_assignments"],
+            Content: ["num_courses", "num_assignments"],
+            Program: ["num_courses", "num_students"],
+            Course: ["num_assignments", "num_completed_assignments"],
+            Assignment: ["num_submissions", "num_completed"],
+        }
+        links = 0
+        for model, names in columns.items():
+            rows, admin = self.rows(model)
+            for obj, name in itertools.product(rows.values(), names):
+                with self.subTest(model=model.__name__, pk=obj.pk, column=name):
+                    link = str(getattr(admin, name)(obj))
+                    if link == "0":
+                        continue
+                    url, count = re.fullmatch(
+                        r'<a href="(.+)">(\d+)</a>', link
+                    ).groups()
+                    response = self.client.get(html.unescape(url))
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        len(response.context["cl"].result_list), int(count)
+                    )
+                    links += 1
+        self.assertGreater(links, 30)
+
+    def test_course_and_assignment_grades(self):
+        submission = StudentAssignment.objects.filter(grade__isnull=False).first()
+        submission.grade = MAX_GRADE
+        submission.save()
+
+        for model, path in ((Course, "assignment__course"), (Assignment, "assignment")):
+            rows, admin = self.rows(model)
+            for obj in model.objects.all():
+                with self.subTest(model=model.__name__, pk=obj.pk):
+                    row = rows[obj.pk]
+                    submissions = StudentAssignment.objects.filter(**{path: obj})
+                    average = submissions.aggregate(average=Avg("grade"))["average"]
+                    self.assertEqual(
+                        admin.average_grade(row),
+                        None if average is None else round(float(average), 2),
+                    )
+                    self.assertEqual(
+                        row.completed_count,
+                        submissions.filter(grade__gte=MAX_GRADE).count(),
+                    )
+                    if model is Course:
+                        self.assertEqual(
+                            row.assignments_count, obj.assignment_set.count()
+                        )
+                    else:
+                        self.assertEqual(
+                            row.submissions_count,
+                            submissions.filter(submitted__isnull=False).count(),
+                        )
+                    stats = row.grade_stats
+                    self.assertEqual(admin.median_grade(row), stats["median"])
+                    self.assertEqual(stats["submitted"], submissions.count())
+
+    def test_content_and_program_counts(self):
+        rows, _ = self.rows(Content)
+        for content in self.contents:
+            with self.subTest(content=content.name):
+                assignments = Assignment.objects.filter(content=content)
+                self.assertEqual(
+                    rows[content.pk].courses_count,
+                    assignments.values("course").distinct().count(),
+                )
+                self.assertEqual(
+                    rows[content.pk].assignments_count, assignments.count()
+                )
+
+        rows, _ = self.rows(Program)
+        for program in self.programs:
+            with self.subTest(program=program.name):
+                self.assertEqual(
+                    rows[program.pk].courses_count,
+                    program.assignment_set.values("course").distinct().count(),
+                )
+                self.assertEqual(
+                    rows[program.pk].students_count, program.student_set.count()
+                )
+
+
+class FanOutTests(VoyageTestCase):
+    """
+    New assignments and students get a StudentAssignment row for every
+    student and assignment of their program once the transaction commits
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            create_student_assignments,
+            "apply_async",
+            side_effect=lambda kwargs=None, **options: create_student_assignments.apply(
+                kwargs=kwargs
+            ),
+        )
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertFannedOut(self):
+        for student in Student.objects.all():
+            self.assertEqual(
+                set(student.studentassignment_set.values_list("assignment", flat=True)),
+                set(
+                    Assignment.objects.filter(program=student.program_id).values_list(
+                        "pk", flat=True
+                    )
+                ),
+            )
+
+    def test_new_assignment(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = Assignment.objects.create(
+                program=self.programs[0],
+                course=self.courses[0],
+                content=self.contents[3],
+                due=DUE,
+                instructions="Instructions",
+                rubric="Rubric",
+            )
+            self.assertFalse(assignment.studentassignment_set.exists())
+        self.assertEqual(
+            self.apply_async.call_args.kwargs["kwargs"],
+            {"assignment_ids": [assignment.pk]},
+        )
+        self.assertEqual(
+            sorted(assignment.studentassignment_set.values_list("student", flat=True)),
+            [student.pk for student in self.students[::2]],
+        )
+        self.assertFalse(
+            assignment.studentassignment_set.filter(submitted__isnull=False).exists()
+        )
+        self.assertEqual(gradebook.verify(), [])
+
+    def test_new_and_moved_students(self):
+        users = get_user_model().objects
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(
+                user=users.create(username="new"),
+                github="new",
+                program=self.programs[1],
+            )
+        self.assertEqual(student.studentassignment_set.count(), 3)
+
+        moved = self.students[0]
+        graded = set(
+            moved.studentassignment_set.filter(grade__isnull=False).values_list(
+                "pk", "grade"
+            )
+        )
+        moved.program = self.programs[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+        self.assertEqual(
+            moved.studentassignment_set.filter(
+                assignment__program=self.programs[1]
+            ).count(),
+            3,
+        )
+        self.assertLessEqual(
+            graded,
+            set(moved.studentassignment_set.values_list("pk", "grade")),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_create_missing(self):
+        graded = set(
+            StudentAssignment.objects.filter(grade__isnull=False).values_list(
+                "pk", "grade"
+            )
+        )
+        fanout.create_missing(batch_size=4)
+        self.assertFannedOut()
+        total = StudentAssignment.objects.count()
+        self.assertEqual(total, 6 * 3)
+        fanout.create_missing(batch_size=4)
+        self.assertEqual(StudentAssignment.objects.count(), total)
+        self.assertLessEqual(
+            graded,
+            set(
+                StudentAssignment.objects.filter(grade__isnull=False).values_list(
+                    "pk", "grade"
+                )
+            ),
+        )
+
+
+@mock.patch("apps.voyage.signals.enqueue")
+class DashboardCacheTests(VoyageTestCase):
+    """
+    Cached dashboards are read again once a write they depend on commits,
+    and stay cached through unrelated writes
+    """
+
+    def student_dashboard(self, student, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse("student_dashboard", args=[student.pk]))
+        return response.context["dashboard"]
+
+    def faculty_dashboard(self, faculty, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse("faculty_dashboard", args=[faculty.pk]))
+        return {course["name"]: course for course in response.context["courses_taught"]}
+
+    def test_versions(self, enqueue):
+        entities = (("program", 1), ("student", 2))
+        token = caching.version(*entities)
+        self.assertEqual(caching.version(*entities), token)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            caching.bump(("program", 1), ("faculty", None))
+        self.assertEqual(caching.version(*entities), token)
+        for callback in callbacks:
+            callback()
+        bumped = caching.version(*entities)
+        self.assertNotEqual(bumped.split("-")[0], token.split("-")[0])
+        self.assertEqual(bumped.split("-")[1], token.split("-")[1])
+
+        # an evicted counter restarts from the clock, not from an older value
+        cache.delete(caching.VERSION_KEY.format("student", 2))
+        self.assertNotEqual(
+            caching.version(*entities).split("-")[1], token.split("-")[1]
+        )
+
+    def test_grading(self, enqueue):
+        student, other = self.students[0], self.students[1]
+        self.student_dashboard(student, 4)
+        self.student_dashboard(other, 4)
+
+        submission = student.studentassignment_set.first()
+        submission.grade = Decimal(95)
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.save()
+
+        assignments = {
+            row["id"]: row for row in self.student_dashboard(student, 4)["assignments"]
+        }
+        self.assertEqual(assignments[submission.assignment_id]["grade"], 95.0)
+        self.student_dashboard(other, 1)
+
+    def test_new_assignment(self, enqueue):
+        student, faculty = self.students[0], self.faculty[1]
+        self.assertEqual(len(self.student_dashboard(student, 4)["assignments"]), 3)
+        self.assertEqual(
+            self.faculty_dashboard(faculty, 5)["Course 0"]["assignments_count"], 2
+        )
+        self.student_dashboard(self.students[1], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Assignment.objects.create(
+                program=self.programs[0],
+                course=self.courses[0],
+                content=self.contents[3],
+                due=DUE,
+                instructions="Instructions",
+                rubric="Rubric",
+            )
+
+        self.assertEqual(len(self.student_dashboard(student, 4)["assignments"]), 4)
+        self.assertEqual(
+            self.faculty_dashboard(faculty, 5)["Course 0"]["assignments_count"], 3
+        )
+        self.student_dashboard(self.students[1], 1)
+
+    def test_new_student(self, enqueue):
+        faculty = self.faculty[0]
+        self.assertEqual(
+            self.faculty_dashboard(faculty, 5)["Course 0"]["students_count"], 6
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(
+                user=get_user_model().objects.create(username="new"),
+                github="new",
+                program=self.programs[0],
+            )
+        self.assertEqual(
+            self.faculty_dashboard(faculty, 5)["Course 0"]["students_count"], 7
+        )
+
+    def test_content_moves(self, enqueue):
+        self.faculty_dashboard(self.faculty[0], 5)
+        content = self.contents[1]
+        content.faculty = self.faculty[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            content.save()
+        self.faculty_dashboard(self.faculty[0], 5)
+        self.faculty_dashboard(self.faculty[0], 2)
+
+
+class FakeGit:
+    """
+    Stands in for provisioning.git: clones fail for the content repos in
+    broken, pushes fail for the urls in failing, and once for those in flaky
+    """
+
+    def __init__(self, broken=(), failing=(), flaky=()):
+        self.broken, self.failing, self.flaky = set(broken), set(failing), set(flaky)
+        self.pushes = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, cwd=None):
+        if args[0] == "clone" and args[-2] in self.broken:
+            raise GitError("repository not found")
+        if args[0] == "push":
+            url = args[2]
+            with self.lock:
+                self.pushes[url] += 1
+                tries = self.pushes[url]
+            if url in self.failing or (url in self.flaky and tries == 1):
+                raise GitError("connection reset")
+        return ""
+
+
+@override_settings(REPO_TARGET_URL="https://git.example.com/{github}/{assignment}")
+class ProvisioningTests(VoyageTestCase):
+    """
+    The worker pool records the outcome of every push, retrying failed ones
+    a bounded number of times and only when asked to
+    """
+
+    def setUp(self):
+        super().setUp()
+        mirrors = tempfile.TemporaryDirectory()
+        self.addCleanup(mirrors.cleanup)
+        patcher = mock.patch("apps.voyage.utils.provisioning.RETRY_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mirror_dir = mirrors.name
+
+    def provision(self, fake, **kwargs):
+        with mock.patch("apps.voyage.utils.provisioning.git", fake):
+            return Provisioner(workers=4, attempts=3, mirror_dir=self.mirror_dir).run(
+                **kwargs
+            )
+
+    def repo(self, submission):
+        return StudentRepository.objects.get(student_assignment=submission)
+
+    def test_failures_are_recorded_per_repo(self):
+        submissions = list(StudentAssignment.objects.order_by("pk"))
+        url = "https://git.example.com/{}/{}".format
+        failing = submissions[0]
+        flaky = submissions[1]
+        broken = self.contents[3]
+        fake = FakeGit(
+            broken=[broken.repo],
+            failing=[url(failing.student.github, failing.assignment_id)],
+            flaky=[url(flaky.student.github, flaky.assignment_id)],
+        )
+        with self.assertLogs("apps.voyage.utils.provisioning", "WARNING"):
+            summary = self.provision(fake)
+
+        unmirrored = StudentRepository.objects.filter(
+            student_assignment__assignment__content=broken
+        )
+        self.assertTrue(unmirrored.exists())
+        self.assertEqual(
+            set(unmirrored.values_list("status", "attempts", "error")),
+            {(StudentRepository.Status.FAILED, 1, "repository not found")},
+        )
+        repo = self.repo(failing)
+        self.assertEqual(
+            (repo.status, repo.attempts, repo.error, repo.provisioned),
+            (StudentRepository.Status.FAILED, 3, "connection reset", None),
+        )
+        repo = self.repo(flaky)
+        self.assertEqual(
+            (repo.status, repo.attempts), (StudentRepository.Status.READY, 2)
+        )
+        self.assertIsNotNone(repo.provisioned)
+
+        failed = unmirrored.count() + 1
+        self.assertEqual(
+            summary, {"ready": len(submissions) - failed, "failed": failed}
+        )
+        self.assertEqual(
+            StudentRepository.objects.filter(
+                status=StudentRepository.Status.READY
+            ).count(),
+            summary["ready"],
+        )
+
+        # ready and failed repos are left alone unless failures are retried
+        self.assertEqual(self.provision(FakeGit()), {"ready": 0, "failed": 0})
+        summary = self.provision(FakeGit(), retry_failed=True)
+        self.assertEqual(summary, {"ready": failed, "failed": 0})
+        self.assertEqual(self.repo(failing).attempts, 4)
+        self.assertFalse(
+            StudentRepository.objects.exclude(
+                status=StudentRepository.Status.READY
+            ).exists()
+        )
@@ -0,0 +1,29 @@
+"""
+api urls for voyage app
+"""
+
+from rest_framework.routers import DefaultRouter
+from ..views.apiviews import (
+    AssignmentViewSet,
+    CourseViewSet,
+    FacultyViewSet,
+    ImportViewSet,
+    ProgramViewSet,
+    StudentAssignmentViewSet,
+    StudentViewSet,
+)
+
+router = DefaultRouter()
+router.register("faculty", FacultyViewSet, basename="api-faculty")
+router.register("students", StudentViewSet, basename="api-student")
+router.register("programs", ProgramViewSet, basename="api-program")
+router.register("courses", CourseViewSet, basename="api-course")
+router.register("assignments", AssignmentViewSet, basename="api-assignment")
+router.register(
+    "student-assignments",
+    StudentAssignmentViewSet,
+    basename="api-studentassignment",
+)
+router.register("imports", ImportViewSet, basename="api-import")
+
+urlpatterns = router.urls
@@ -11,6 +11,7 @@ from ..views.appviews import (
     CreateNewCourse,
     CreateNewAssignment,
     StudentDashboardView,
+    GradebookExportView,
 )
 
 urlpatterns = [
@@ -27,4 +28,9 @@ urlpatterns = [
         StudentDashboardView.as_view(),
         name="student_dashboard",
     ),
+    path(
+        "export/<str:scope>/<int:pk>/",
+        GradebookExportView.as_view(),
+        name="gradebook_export",
+    ),
 ]
@@ -0,0 +1,89 @@
+"""
+query helpers for voyage app
+"""
+from django.db.models import (
+    Avg,
+    Count,
+    ExpressionWrapper,
+    FloatField,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def subquery_aggregate(queryset, outer_field, aggregate, outer_ref="pk"):
+    """
+    Returns a correlated subquery computing aggregate over the queryset rows
+    whose outer_field matches outer_ref of the outer row, for use in .annotate()
+    """
+    rows = (
+        queryset.filter(**{outer_field: OuterRef(outer_ref)})
+        .order_by()
+        .values(outer_field)
+        .annotate(value=aggregate)
+        .values("value")
+    )
+    return Subquery(rows, output_field=aggregate.output_field)
+
+
+def subquery_count(queryset, outer_field, field="pk", outer_ref="pk"):
+    """
+    Returns a correlated COUNT(DISTINCT field), 0 when there are no rows
+    """
+    count = Count(field, distinct=True, output_field=IntegerField())
+    return Coalesce(subquery_aggregate(queryset, outer_field, count, outer_ref), 0)
+
+
+def subquery_avg(queryset, outer_field, field, outer_ref="pk"):
+    """
+    Returns a correlated AVG(field), None when there are no rows
+    """
+    average = Avg(field, output_field=FloatField())
+    return subquery_aggregate(queryset, outer_field, average, outer_ref)
+
+
+def subquery_sum(queryset, outer_field, field, outer_ref="pk"):
+    """
+    Returns a correlated SUM(field) of an integer column, 0 when there are no rows
+    """
+    total = Sum(field, output_field=IntegerField())
+    return Coalesce(subquery_aggregate(queryset, outer_field, total, outer_ref), 0)
+
+
+def rollup_average(prefix=""):
+    """
+    Returns the average grade of one gradebook rollup row, grade_sum over
+    graded_count, None when nothing is graded
+    """
+    return ExpressionWrapper(
+        Cast(f"{prefix}grade_sum", FloatField()) / NullIf(f"{prefix}graded_count", 0),
+        output_field=FloatField(),
+    )
+
+
+def subquery_rollup_avg(queryset, outer_field, outer_ref="pk"):
+    """
+    Returns the average grade over the matching gradebook rollup rows,
+    None when nothing is graded
+    """
+    average = ExpressionWrapper(
+        Cast(Sum("grade_sum"), FloatField()) / NullIf(Sum("graded_count"), 0),
+        output_field=FloatField(),
+    )
+    return subquery_aggregate(queryset, outer_field, average, outer_ref)
+
+
+def bulk_create_pks(model, objs, key):
+    """
+    bulk-creates objs and returns their primary keys in order, looking them up
+    by the unique key on backends that don't return them (MySQL)
+    """
+    model.objects.bulk_create(objs)
+    if not objs or objs[0].pk is not None:
+        return [obj.pk for obj in objs]
+    values = [getattr(obj, key) for obj in objs]
+    lookup = dict(model.objects.filter(**{f"{key}__in": values}).values_list(key, "pk"))
+    return [lookup[value] for value in values]
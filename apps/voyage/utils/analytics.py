@@ -0,0 +1,205 @@
+"""
+grade analytics for voyage app
+
+Submissions are read with one values_list per scope into a pandas frame and
+summarized per assignment, course or program with vectorized groupbys, so
+the statistics of every row of a page or dashboard cost two queries however
+many rows they cover.
+"""
+import numpy as np
+import pandas as pd
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from ..models import Assignment, StudentAssignment
+from .grading import MAX_GRADE
+
+# the Assignment column each scope is grouped by
+SCOPES = {"assignment": "assignment_id", "course": "course_id", "program": "program_id"}
+
+PERCENTILES = (10, 25, 75, 90)
+
+# grades are counted in buckets of BUCKET_WIDTH points, MAX_GRADE falling in
+# the last one
+BUCKET_WIDTH = 10
+BUCKETS = MAX_GRADE // BUCKET_WIDTH
+
+CHUNK_SIZE = 50000
+
+BARS = "▁▂▃▄▅▆▇█"
+
+COLUMNS = ["assignment_id", "course_id", "program_id", "grade", "latency"]
+
+
+def _frame(queryset, columns, chunk_size):
+    """
+    Reads the rows of a values_list queryset into a DataFrame chunk by chunk.
+    The compiled SQL runs on a plain cursor, skipping Django's per-row value
+    converters; the columns are converted by pandas as a whole instead. The
+    SQL selects annotations after fields, so they must come last in columns.
+    """
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return pd.DataFrame(columns=columns)
+    chunks = []
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks.append(pd.DataFrame.from_records(rows, columns=columns))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _datetimes(column):
+    """
+    Converts a column of datetimes, or of the ISO strings SQLite returns for
+    them, stored in UTC
+    """
+    return pd.to_datetime(column, utc=True, format="ISO8601")
+
+
+def load(scope=None, ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Returns a frame of the submitted StudentAssignments of the given scope
+    ids (all when scope is None), with their assignment, course, program,
+    grade (NaN until graded) and latency, the hours from due to submitted
+    """
+    assignments = Assignment.objects.order_by()
+    submissions = StudentAssignment.objects.filter(submitted__isnull=False)
+    if scope is not None:
+        field = "pk" if scope == "assignment" else SCOPES[scope]
+        assignments = assignments.filter(**{f"{field}__in": list(ids)})
+        submissions = submissions.filter(assignment__in=assignments.values("pk"))
+
+    placement = _frame(
+        assignments.values_list("id", "course_id", "program_id", "due"),
+        ["assignment_id", "course_id", "program_id", "due"],
+        chunk_size,
+    )
+    frame = _frame(
+        submissions.order_by()
+        .annotate(score=Cast("grade", FloatField()))
+        .values_list("assignment_id", "submitted", "score"),
+        ["assignment_id", "submitted", "grade"],
+        chunk_size,
+    ).merge(placement, on="assignment_id")
+
+    frame["grade"] = pd.to_numeric(frame["grade"]).astype(float)
+    latency = _datetimes(frame["submitted"]) - _datetimes(frame["due"])
+    frame["latency"] = latency / pd.Timedelta(hours=1)
+    return frame[COLUMNS]
+
+
+def statistics(frame, scope):
+    """
+    Returns a frame indexed by the ids of scope with the submission and
+    graded counts, mean, median, standard deviation and percentiles of the
+    grades, the histogram bucket counts and the mean and median latency in
+    hours with the number of late submissions
+    """
+    key = frame[SCOPES[scope]]
+    graded = frame[frame["grade"].notna()]
+    grades = graded.groupby(SCOPES[scope])["grade"]
+    latency = frame["latency"].groupby(key)
+
+    stats = pd.DataFrame(
+        {
+            "submitted": key.value_counts(),
+            "graded": grades.size(),
+            "mean": grades.mean(),
+            "std": grades.std(ddof=0),
+            "latency_mean": latency.mean(),
+            "latency_median": latency.median(),
+            "late": (frame["latency"] > 0).groupby(key).sum(),
+        }
+    )
+    stats["graded"] = stats["graded"].fillna(0).astype(int)
+
+    if len(graded):
+        # the median is the 50th percentile, sorted in the same pass
+        quantiles = {0.5: "median", **{p / 100: f"p{p}" for p in PERCENTILES}}
+        percentiles = grades.quantile(list(quantiles)).unstack()
+        percentiles = percentiles.rename(columns=quantiles)
+        stats = stats.join(percentiles)
+
+        codes, ids = pd.factorize(graded[SCOPES[scope]], sort=True)
+        buckets = np.clip(graded["grade"].to_numpy() // BUCKET_WIDTH, 0, BUCKETS - 1)
+        counts = np.bincount(
+            codes * BUCKETS + buckets.astype(int), minlength=len(ids) * BUCKETS
+        ).reshape(-1, BUCKETS)
+        stats["histogram"] = pd.Series(counts.tolist(), index=ids)
+    else:
+        for column in ["median"] + [f"p{p}" for p in PERCENTILES]:
+            stats[column] = np.nan
+        stats["histogram"] = None
+
+    empty = [0] * BUCKETS
+    stats["histogram"] = [
+        value if isinstance(value, list) else empty for value in stats["histogram"]
+    ]
+    return stats
+
+
+def _number(value):
+    """
+    Converts a numpy float into a rounded float, NaN into None
+    """
+    return None if pd.isna(value) else round(float(value), 2)
+
+
+def as_dicts(stats):
+    """
+    Returns the rows of statistics() as {id: {...}} plain, serializable dicts
+    """
+    return {
+        int(pk): {
+            "submitted": int(row.submitted),
+            "graded": int(row.graded),
+            "mean": _number(row.mean),
+            "median": _number(row.median),
+            "std": _number(row.std),
+            **{f"p{p}": _number(getattr(row, f"p{p}")) for p in PERCENTILES},
+            "histogram": [int(count) for count in row.histogram],
+            "latency_mean": _number(row.latency_mean),
+            "latency_median": _number(row.latency_median),
+            "late": int(row.late),
+        }
+        for pk, row in zip(stats.index, stats.itertuples(index=False))
+    }
+
+
+def sparkline(histogram):
+    """
+    Returns the histogram bucket counts as a line of block characters
+    """
+    top = max(histogram, default=0)
+    if not top:
+        return ""
+    steps = len(BARS) - 1
+    return "".join(BARS[-(-count * steps // top)] for count in histogram)
+
+
+def grade_statistics(scope, ids=None):
+    """
+    Returns the statistics of the given ids of scope (all when ids is None)
+    as {id: {...}} dicts, computed from one load
+    """
+    frame = load(None if ids is None else scope, ids)
+    return as_dicts(statistics(frame, scope))
+
+
+def report(scope=None, ids=None):
+    """
+    Returns the statistics of every assignment, course and program covered
+    by the given ids of scope (everything when scope is None) from one load,
+    as {scope: {id: {...}}}
+    """
+    frame = load(scope, ids)
+    return {name: as_dicts(statistics(frame, name)) for name in SCOPES}
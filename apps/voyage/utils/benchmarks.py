@@ -0,0 +1,215 @@
+"""
+benchmarks for the voyage admin changelists and dashboards
+"""
+import cProfile
+import pstats
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Content, Course, Faculty, Program, Student
+from . import gradebook, teaching
+from .synthetic import ANCHOR, SyntheticData
+
+
+class Benchmark:
+    """
+    Times every hot path against the data currently in the database and
+    counts the queries each one runs.
+    """
+
+    def __init__(self, repeat=3, profile=False):
+        self.repeat = repeat
+        self.profile = profile
+        self.client = Client()
+        user, _ = get_user_model().objects.get_or_create(
+            username="benchmark", defaults={"is_staff": True, "is_superuser": True}
+        )
+        self.client.force_login(user)
+
+    def paths(self):
+        """
+        Returns (name, method, url, data factory) for every benchmarked path
+        """
+        paths = []
+        for model in admin.site._registry:
+            opts = model._meta
+            if opts.app_label == "voyage":
+                url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+                paths.append((f"admin:{opts.model_name}", "get", url, None))
+
+        faculty = (
+            Faculty.objects.annotate(num=Count("content__assignment"))
+            .order_by("-num", "pk")
+            .first()
+        )
+        student = Student.objects.order_by("pk").first()
+        if faculty:
+            url = reverse("faculty_dashboard", args=[faculty.pk])
+            paths.append(("faculty_dashboard", "get", url, None))
+        if student:
+            url = reverse("student_dashboard", args=[student.pk])
+            paths.append(("student_dashboard", "get", url, None))
+        paths.append(("faculty_list", "get", reverse("faculty_list"), None))
+        paths.append(("student_list", "get", reverse("student_list"), None))
+
+        program = Program.objects.order_by("pk").first()
+        content = Content.objects.order_by("pk").first()
+        if program and content:
+            url = reverse("create_new_assignment")
+            paths.append(
+                (
+                    "create_assignment",
+                    "post",
+                    url,
+                    self._assignment_form(program, content),
+                )
+            )
+        return paths
+
+    @staticmethod
+    def _assignment_form(program, content):
+        """
+        Returns a factory for assignment POST data on a fresh course each time
+        """
+
+        def form():
+            course = Course.objects.create(name=f"benchmark course {time.time_ns()}")
+            return {
+                "program": program.pk,
+                "course": course.pk,
+                "content": content.pk,
+                "due": (ANCHOR + timedelta(days=30)).date().isoformat(),
+                "instructions": "Benchmark instructions",
+                "rubric": "Benchmark rubric",
+            }
+
+        return form
+
+    def request(self, method, url, data, profiler=None):
+        """
+        Returns the time, database time, query count and status of one request
+        """
+        payload = data() if data else None
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            response = getattr(self.client, method)(url, payload)
+            if profiler:
+                profiler.disable()
+            elapsed = (time.perf_counter() - started) * 1000
+        db_time = sum(float(query["time"]) for query in context.captured_queries)
+        return (
+            elapsed,
+            db_time * 1000,
+            len(context.captured_queries),
+            response.status_code,
+        )
+
+    def measure(self, method, url, data):
+        """
+        Returns the timings, query counts and top functions of one path. Each
+        repeat clears the cache and requests the path twice, so the cold
+        figures time the full work and the warm ones the cached pages.
+        """
+        profiler = cProfile.Profile() if self.profile else None
+        cold, warm = [], []
+        for _ in range(self.repeat):
+            cache.clear()
+            cold.append(self.request(method, url, data, profiler))
+            warm.append(self.request(method, url, data))
+
+        result = {"status": cold[-1][3], **summary(cold), **summary(warm, "warm_")}
+        if profiler:
+            result["top_functions"] = top_functions(profiler)
+        return result
+
+    def run(self):
+        """
+        Returns {path name: measurements} for every path
+        """
+        return {
+            name: self.measure(method, url, data)
+            for name, method, url, data in self.paths()
+        }
+
+
+def summary(requests, prefix=""):
+    """
+    Returns the median and minimum times, median database time and query
+    count of repeated requests, as returned by Benchmark.request()
+    """
+    timings = [elapsed for elapsed, _, _, _ in requests]
+    return {
+        f"{prefix}queries": requests[-1][2],
+        f"{prefix}median_ms": round(statistics.median(timings), 2),
+        f"{prefix}min_ms": round(min(timings), 2),
+        f"{prefix}db_ms": round(statistics.median(db for _, db, _, _ in requests), 2),
+    }
+
+
+def top_functions(profiler, limit=5, package="apps/voyage"):
+    """
+    Returns the functions of package with the highest cumulative time
+    """
+    stats = pstats.Stats(profiler).stats
+    rows = [
+        (cumulative, f"{filename.split(package)[-1].lstrip('/')}:{name}")
+        for (filename, _, name), (_, _, _, cumulative, _) in stats.items()
+        if package in filename
+    ]
+    return [
+        {"function": function, "cumulative_ms": round(cumulative * 1000, 2)}
+        for cumulative, function in sorted(rows, reverse=True)[:limit]
+    ]
+
+
+def seed(scale, sizes, seed=0, batch_size=5000):
+    """
+    Generates the synthetic dataset for one scale, then builds the gradebook
+    rollups and teaching links that bulk_create bypasses
+    """
+    SyntheticData(seed=seed, prefix=f"bench-{scale}", batch_size=batch_size).generate(
+        **sizes
+    )
+    gradebook.rebuild(batch_size=batch_size)
+    teaching.rebuild(batch_size=batch_size)
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of regressions of results against baseline. A path regresses
+    when it runs more queries or its median time grows by more than threshold,
+    cold or warm.
+    """
+    regressions = []
+    for scale, paths in results.items():
+        for name, current in paths.items():
+            previous = baseline.get(scale, {}).get(name)
+            if not previous:
+                continue
+            for prefix in ("", "warm_"):
+                queries, median = f"{prefix}queries", f"{prefix}median_ms"
+                if queries not in previous:
+                    # a baseline from before warm timings were recorded
+                    continue
+                label = f"{scale} {name}{' (warm)' if prefix else ''}"
+                if current[queries] > previous[queries]:
+                    regressions.append(
+                        f"{label}: {previous[queries]} -> {current[queries]} queries"
+                    )
+                if current[median] > previous[median] * (1 + threshold):
+                    regressions.append(
+                        f"{label}: {previous[median]}ms -> {current[median]}ms"
+                    )
+    return regressions
@@ -0,0 +1,154 @@
+"""
+versioned cache of the dashboards for voyage app
+
+Cached values are keyed by the version counters of the entities they were
+computed from, e.g. ("program", 3). Writes bump the counters of the entities
+they affect once they commit (see signals.py), so stale entries are never
+read again and age out of the cache by its LRU bound or timeout.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import Assignment, Content
+
+VERSION_KEY = "voyage:version:{}:{}"
+VALUE_KEY = "voyage:{}:{}"
+
+
+def _initial():
+    """
+    Returns the starting value of a counter. A counter evicted from the cache
+    restarts from the clock, never from a value older entries were stored under.
+    """
+    return time.time_ns()
+
+
+def version(*entities):
+    """
+    Returns a token of the current versions of entities, (kind, pk) pairs
+    """
+    keys = [VERSION_KEY.format(kind, pk) for kind, pk in entities]
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return "-".join(
+        f"{kind}{pk}.{found[key]}" for (kind, pk), key in zip(entities, keys)
+    )
+
+
+def bump(*entities):
+    """
+    Invalidates everything cached under the current versions of entities,
+    once the current transaction commits
+    """
+    keys = {VERSION_KEY.format(kind, pk) for kind, pk in entities if pk is not None}
+
+    def incr():
+        missing = {}
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                missing[key] = _initial()
+        cache.set_many(missing, timeout=None)
+
+    if keys:
+        transaction.on_commit(incr)
+
+
+def get_or_set(name, token, compute, *args):
+    """
+    Returns the value cached as name under token, computing and caching
+    compute(*args) on a miss
+    """
+    return cache.get_or_set(
+        VALUE_KEY.format(name, token),
+        lambda: compute(*args),
+        settings.DASHBOARD_CACHE_TIMEOUT,
+    )
+
+
+def _faculties_teaching(course_ids):
+    """
+    Returns the ids of the faculty with content in the given courses
+    """
+    return (
+        Content.objects.filter(assignment__course__in=course_ids)
+        .values_list("faculty_id", flat=True)
+        .distinct()
+    )
+
+
+def record_changes(changes):
+    """
+    Invalidates the student dashboards affected by StudentAssignment changes,
+    (before, after) gradebook snapshot pairs
+    """
+    assignment_ids = {
+        state[1] for pair in changes if pair[0] != pair[1] for state in pair if state
+    }
+    if assignment_ids:
+        programs = (
+            Assignment.objects.filter(pk__in=assignment_ids)
+            .values_list("program_id", flat=True)
+            .distinct()
+        )
+        bump(*(("program", pk) for pk in programs))
+
+
+def assignments_changed(rows):
+    """
+    Invalidates the dashboards affected by saved or deleted assignments,
+    (program_id, course_id, content_id) rows: the students of the program and
+    the faculty teaching the course
+    """
+    programs = {row[0] for row in rows}
+    courses = {row[1] for row in rows}
+    faculties = set(_faculties_teaching(courses)) | set(
+        Content.objects.filter(pk__in={row[2] for row in rows}).values_list(
+            "faculty_id", flat=True
+        )
+    )
+    bump(
+        *(("program", pk) for pk in programs),
+        *(("faculty", pk) for pk in faculties),
+    )
+
+
+def students_changed(student_ids, program_ids):
+    """
+    Invalidates the dashboards of the given students and of the faculty
+    teaching a course of their programs, whose student counts changed
+    """
+    faculties = (
+        Content.objects.filter(
+            assignment__course__assignment__program__in=set(program_ids)
+        )
+        .values_list("faculty_id", flat=True)
+        .distinct()
+    )
+    bump(
+        *(("student", pk) for pk in student_ids),
+        *(("faculty", pk) for pk in faculties),
+    )
+
+
+def content_changed(content_id, faculty_ids):
+    """
+    Invalidates the dashboards showing a content: the students of the
+    programs using it, and its old and new faculty
+    """
+    programs = (
+        Assignment.objects.filter(content=content_id)
+        .values_list("program_id", flat=True)
+        .distinct()
+    )
+    bump(
+        *(("program", pk) for pk in programs),
+        *(("faculty", pk) for pk in faculty_ids),
+    )
@@ -0,0 +1,116 @@
+"""
+dashboard rollups for voyage app
+"""
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from ..models import (
+    Assignment,
+    Course,
+    ProgramCourseRollup,
+    Student,
+    StudentAssignment,
+)
+from . import analytics, rollup_average, subquery_count, subquery_sum
+
+
+def _number(value):
+    """
+    Converts a Decimal or float aggregate into a rounded float, keeping None
+    """
+    return round(float(value), 2) if value is not None else None
+
+
+def faculty_dashboard(faculty):
+    """
+    Returns the courses taught by one faculty member with their student and
+    assignment counts as plain dicts, read from the program x course rollups
+    in one query, and their grade statistics
+    """
+    courses = list(
+        Course.objects.filter(pk__in=faculty.courses().values("pk"))
+        .annotate(
+            students_count=subquery_count(
+                Student.objects.all(), "program__programcourserollup__course"
+            ),
+            assignments_count=subquery_sum(
+                ProgramCourseRollup.objects.all(), "course", "assignment_count"
+            ),
+        )
+        .order_by("name")
+        .values("pk", "name", "students_count", "assignments_count")
+    )
+    stats = analytics.grade_statistics("course", [course["pk"] for course in courses])
+    for course in courses:
+        course["grades"] = _grades(stats.get(course["pk"]))
+    return courses
+
+
+def _grades(stats):
+    """
+    Returns the analytics of one scope with the sparkline of its histogram,
+    or None when nothing was submitted
+    """
+    if stats is None:
+        return None
+    return dict(stats, sparkline=analytics.sparkline(stats["histogram"]))
+
+
+def student_dashboard(student):
+    """
+    Returns the per-course and per-assignment figures for one student's
+    program as a plain, serializable dict, computed in a single query over
+    the assignment rollups and the student's own submissions, with the grade
+    statistics of the program's assignments and courses
+    """
+    mine = StudentAssignment.objects.filter(assignment=OuterRef("pk"), student=student)
+    rows = (
+        Assignment.objects.filter(program_id=student.program_id)
+        .values("id", "content__name", "course_id", "course__name", "due")
+        .annotate(
+            avg_grade=rollup_average("assignmentrollup__"),
+            num_submissions=Coalesce("assignmentrollup__submitted_count", 0),
+            grade=Subquery(mine.values("grade")[:1]),
+            submitted=Subquery(mine.values("submitted")[:1]),
+        )
+        .order_by("course__name", "due", "id")
+    )
+
+    stats = analytics.report("program", [student.program_id])
+    courses = {}
+    assignments = []
+    for row in rows:
+        course = courses.setdefault(
+            row["course_id"],
+            {
+                "id": row["course_id"],
+                "name": row["course__name"],
+                "num_assignments": 0,
+                "num_submitted": 0,
+                "grades": _grades(stats["course"].get(row["course_id"])),
+            },
+        )
+        course["num_assignments"] += 1
+        if row["submitted"] is not None:
+            course["num_submitted"] += 1
+
+        assignments.append(
+            {
+                "id": row["id"],
+                "name": row["content__name"],
+                "course_id": row["course_id"],
+                "due": row["due"].isoformat(),
+                "avg_grade": _number(row["avg_grade"]),
+                "num_submissions": row["num_submissions"],
+                "grade": _number(row["grade"]),
+                "submitted": row["submitted"].isoformat() if row["submitted"] else None,
+                "grades": _grades(stats["assignment"].get(row["id"])),
+            }
+        )
+
+    return {
+        "student": student.pk,
+        "program": student.program_id,
+        "courses": list(courses.values()),
+        "assignments": assignments,
+    }
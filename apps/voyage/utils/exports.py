@@ -0,0 +1,87 @@
+"""
+streaming gradebook exports for voyage app
+"""
+import csv
+import io
+import zlib
+
+from django.db import connections
+
+from ..models import StudentAssignment
+
+CHUNK_SIZE = 2000
+
+# scope name -> StudentAssignment lookup of the exported object
+SCOPES = {
+    "program": "assignment__program_id",
+    "course": "assignment__course_id",
+    "assignment": "assignment_id",
+}
+
+COLUMNS = [
+    ("id", "id"),
+    ("program", "assignment__program__name"),
+    ("course", "assignment__course__name"),
+    ("assignment_id", "assignment_id"),
+    ("assignment", "assignment__content__name"),
+    ("student_id", "student_id"),
+    ("username", "student__user__username"),
+    ("github", "student__github"),
+    ("submitted", "submitted"),
+    ("grade", "grade"),
+    ("reviewed", "reviewed"),
+    ("reviewer", "reviewer__github"),
+    ("feedback", "feedback"),
+]
+
+
+def gradebook_rows(scope, pk, chunk_size=CHUNK_SIZE):
+    """
+    Yields one tuple per StudentAssignment in the scope, in primary key order.
+    MySQLdb reads a whole result set into memory even with iterator(), so on
+    MySQL the rows are fetched in keyset-paginated chunks instead.
+    """
+    rows = (
+        StudentAssignment.objects.filter(**{SCOPES[scope]: pk})
+        .order_by("pk")
+        .values_list(*(path for _, path in COLUMNS))
+    )
+    if connections[rows.db].vendor != "mysql":
+        yield from rows.iterator(chunk_size=chunk_size)
+        return
+
+    last = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last)[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0]
+
+
+def csv_chunks(rows, chunk_size=CHUNK_SIZE):
+    """
+    Yields the header and rows as CSV text, chunk_size rows at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """
+    Compresses a stream of text chunks into a gzip file as it goes
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
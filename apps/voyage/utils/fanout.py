@@ -0,0 +1,57 @@
+"""
+creates a StudentAssignment row for every student and every assignment of
+their program, so submission status is a lookup rather than an anti-join
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from ..models import Assignment, Student, StudentAssignment
+
+BATCH_SIZE = 2000
+
+
+def create_missing(student_ids=None, assignment_ids=None, batch_size=BATCH_SIZE):
+    """
+    Creates the missing rows for the given students and/or assignments, or for
+    everyone when neither is given. Existing rows are skipped by the unique
+    (student, assignment) constraint, so it is safe to run repeatedly.
+    Returns the number of rows written or skipped.
+    """
+    students = Student.objects.all()
+    assignments = Assignment.objects.all()
+    if assignment_ids is not None:
+        assignments = assignments.filter(pk__in=assignment_ids)
+    if student_ids is not None:
+        students = students.filter(pk__in=student_ids)
+        assignments = assignments.filter(program__in=students.values("program"))
+
+    by_program = defaultdict(list)
+    for pk, program_id in assignments.values_list("pk", "program_id"):
+        by_program[program_id].append(pk)
+
+    rows = (
+        students.filter(program__in=list(by_program))
+        .order_by("pk")
+        .values_list("pk", "program_id")
+    )
+    total, batch = 0, []
+    for student_id, program_id in rows.iterator(chunk_size=batch_size):
+        for assignment_id in by_program[program_id]:
+            batch.append(
+                StudentAssignment(student_id=student_id, assignment_id=assignment_id)
+            )
+        if len(batch) >= batch_size:
+            total += _flush(batch)
+            batch = []
+    return total + _flush(batch)
+
+
+def _flush(batch):
+    """
+    inserts one batch, skipping the rows that already exist
+    """
+    if batch:
+        with transaction.atomic():
+            StudentAssignment.objects.bulk_create(batch, ignore_conflicts=True)
+    return len(batch)
@@ -0,0 +1,334 @@
+"""
+incremental maintenance of the gradebook rollup tables
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from ..models import (
+    Assignment,
+    AssignmentRollup,
+    ProgramCourseRollup,
+    StudentAssignment,
+    StudentCourseRollup,
+)
+
+COUNTERS = ("submitted_count", "graded_count", "grade_sum")
+
+# the maintained fields of each rollup; a ProgramCourseRollup also counts the
+# assignments of its program and course, and is removed with the last of them
+FIELDS = {
+    StudentCourseRollup: COUNTERS,
+    AssignmentRollup: COUNTERS,
+    ProgramCourseRollup: COUNTERS + ("assignment_count",),
+}
+
+CENTS = Decimal("0.01")
+
+# above this many rows of one rollup table, a batch is applied with one
+# locking read and bulk writes instead of an UPDATE per row
+BULK_THRESHOLD = 20
+
+
+def snapshot(student_assignment):
+    """
+    Returns the fields of a StudentAssignment that the rollups depend on
+    """
+    return (
+        student_assignment.student_id,
+        student_assignment.assignment_id,
+        student_assignment.submitted is not None,
+        student_assignment.grade,
+    )
+
+
+def stored_snapshot(pk):
+    """
+    Returns the snapshot of the StudentAssignment currently in the database
+    """
+    row = (
+        StudentAssignment.objects.filter(pk=pk)
+        .values_list("student_id", "assignment_id", "submitted", "grade")
+        .first()
+    )
+    if row is None:
+        return None
+    student_id, assignment_id, submitted, grade = row
+    return student_id, assignment_id, submitted is not None, grade
+
+
+def _contribution(state, sign):
+    """
+    Returns the counter deltas a snapshot adds (sign=1) or removes (sign=-1)
+    """
+    _, _, submitted, grade = state
+    return {
+        "submitted_count": sign * int(submitted),
+        "graded_count": sign * int(grade is not None),
+        "grade_sum": sign * Decimal(grade if grade is not None else 0),
+    }
+
+
+def _bump(model, lookup, deltas):
+    """
+    Adds deltas to the rollup row matching lookup, creating it on first use
+    and removing it with its last assignment
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not changes:
+        return
+    if model.objects.filter(**lookup).update(**changes):
+        if deltas.get("assignment_count", 0) < 0:
+            model.objects.filter(**lookup, assignment_count__lte=0).delete()
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        # the row is gone, e.g. it was cascade-deleted with its student
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # another writer created the row first
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _totals():
+    """
+    Returns an empty accumulator of deltas keyed by (model, lookup)
+    """
+    return defaultdict(lambda: defaultdict(int))
+
+
+def _add(totals, state, placement, sign):
+    """
+    Accumulates the contribution of a snapshot to the rollups of its
+    assignment's (program_id, course_id) placement, None if it is unknown
+    """
+    student_id, assignment_id = state[0], state[1]
+    keys = [(AssignmentRollup, (("assignment_id", assignment_id),))]
+    if placement is not None:
+        program_id, course_id = placement
+        keys += [
+            (
+                StudentCourseRollup,
+                (("student_id", student_id), ("course_id", course_id)),
+            ),
+            (
+                ProgramCourseRollup,
+                (("program_id", program_id), ("course_id", course_id)),
+            ),
+        ]
+    for key in keys:
+        for field, delta in _contribution(state, sign).items():
+            totals[key][field] += delta
+
+
+def _apply(totals):
+    """
+    Writes accumulated deltas to the rollups in a consistent order
+    """
+    by_model = defaultdict(dict)
+    for (model, lookup), deltas in totals.items():
+        if any(deltas.values()):
+            by_model[model][lookup] = dict(deltas)
+
+    with transaction.atomic():
+        for model in sorted(by_model, key=lambda model: model.__name__):
+            rows = by_model[model]
+            if len(rows) > BULK_THRESHOLD:
+                _bump_many(model, rows)
+                continue
+            for lookup in sorted(rows):
+                _bump(model, dict(lookup), rows[lookup])
+
+
+def record_changes(changes):
+    """
+    Applies a batch of (before, after) snapshot pairs to the rollups.
+    Either side may be None for a created or deleted StudentAssignment.
+    """
+    assignment_ids = {
+        state[1] for pair in changes for state in pair if state is not None
+    }
+    placements = {
+        pk: (program_id, course_id)
+        for pk, program_id, course_id in Assignment.objects.filter(
+            pk__in=assignment_ids
+        ).values_list("pk", "program_id", "course_id")
+    }
+
+    totals = _totals()
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is not None:
+                _add(totals, state, placements.get(state[1]), sign)
+    _apply(totals)
+
+
+def assignment_moved(pk, before, after):
+    """
+    Moves the totals of Assignment pk from its stored (program_id, course_id)
+    placement before to after. Either is None for a created or deleted
+    assignment; a deleted one has already lost its StudentAssignments, so
+    only its count is removed.
+    """
+    if before == after:
+        return
+    totals = _totals()
+    if before is not None and after is not None:
+        rows = StudentAssignment.objects.filter(assignment=pk).values_list(
+            "student_id", "assignment_id", "submitted", "grade"
+        )
+        for student_id, assignment_id, submitted, grade in rows:
+            state = (student_id, assignment_id, submitted is not None, grade)
+            _add(totals, state, before, -1)
+            _add(totals, state, after, 1)
+    for placement, sign in ((before, -1), (after, 1)):
+        if placement is not None:
+            lookup = (("program_id", placement[0]), ("course_id", placement[1]))
+            totals[ProgramCourseRollup, lookup]["assignment_count"] += sign
+    _apply(totals)
+
+
+def _bump_many(model, rows, batch_size=1000):
+    """
+    Adds the deltas of many rollup rows, keyed by lookup tuples, reading the
+    rows once with a lock and writing them back with bulk_update/bulk_create
+    """
+    names = [name for name, _ in next(iter(rows))]
+    candidates = model.objects.select_for_update().filter(
+        **{f"{name}__in": {dict(lookup)[name] for lookup in rows} for name in names}
+    )
+    existing = {
+        tuple((name, getattr(row, name)) for name in names): row
+        for row in candidates.order_by("pk")
+    }
+
+    updated, created = [], []
+    for lookup, deltas in rows.items():
+        row = existing.get(lookup)
+        if row is not None:
+            for field, delta in deltas.items():
+                setattr(row, field, getattr(row, field) + delta)
+            updated.append(row)
+        elif not any(delta < 0 for delta in deltas.values()):
+            created.append(lookup)
+
+    model.objects.bulk_update(updated, FIELDS[model], batch_size=batch_size)
+    if "assignment_count" in FIELDS[model]:
+        model.objects.filter(
+            pk__in=[row.pk for row in updated if row.assignment_count <= 0]
+        ).delete()
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                [model(**dict(lookup), **rows[lookup]) for lookup in created],
+                batch_size=batch_size,
+            )
+    except IntegrityError:
+        # another writer created some of the rows first
+        for lookup in created:
+            _bump(model, dict(lookup), rows[lookup])
+
+
+def record_change(before, after):
+    """
+    Applies the difference between two snapshots of one StudentAssignment
+    """
+    if before != after:
+        record_changes([(before, after)])
+
+
+def compute_rollups():
+    """
+    Returns the rollup rows computed from scratch, keyed by model and lookup
+    """
+    aggregates = {
+        "submitted_count": Count("id", filter=Q(submitted__isnull=False)),
+        "graded_count": Count("id", filter=Q(grade__isnull=False)),
+        "grade_sum": Sum("grade", default=0),
+    }
+    groupings = {
+        StudentCourseRollup: {
+            "student_id": "student",
+            "course_id": "assignment__course",
+        },
+        AssignmentRollup: {"assignment_id": "assignment"},
+        ProgramCourseRollup: {
+            "program_id": "assignment__program",
+            "course_id": "assignment__course",
+        },
+    }
+
+    rollups = {}
+    for model, fields in groupings.items():
+        rows = (
+            StudentAssignment.objects.order_by()
+            .values(*fields.values())
+            .annotate(**aggregates)
+        )
+        for row in rows:
+            lookup = tuple((name, row[path]) for name, path in fields.items())
+            # SQLite sums decimals as floats, so round back to the column's scale
+            row["grade_sum"] = Decimal(str(row["grade_sum"])).quantize(CENTS)
+            rollups[model, lookup] = {field: row[field] for field in COUNTERS}
+
+    for row in (
+        Assignment.objects.order_by()
+        .values("program", "course")
+        .annotate(assignment_count=Count("id"))
+    ):
+        lookup = (("program_id", row["program"]), ("course_id", row["course"]))
+        counters = rollups.setdefault(
+            (ProgramCourseRollup, lookup), dict.fromkeys(COUNTERS, 0)
+        )
+        counters["assignment_count"] = row["assignment_count"]
+    return rollups
+
+
+def rebuild(batch_size=1000):
+    """
+    Replaces the contents of the rollup tables with freshly computed rows
+    """
+    rollups = compute_rollups()
+    with transaction.atomic():
+        for model in (StudentCourseRollup, AssignmentRollup, ProgramCourseRollup):
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [
+                    model(**dict(lookup), **counters)
+                    for (rollup_model, lookup), counters in rollups.items()
+                    if rollup_model is model
+                ],
+                batch_size=batch_size,
+            )
+    return len(rollups)
+
+
+def verify():
+    """
+    Returns a list of (model, lookup, stored, expected) for every rollup row
+    that differs from a fresh computation
+    """
+    expected = compute_rollups()
+
+    stored = {}
+    for model, fields in (
+        (StudentCourseRollup, ("student_id", "course_id")),
+        (AssignmentRollup, ("assignment_id",)),
+        (ProgramCourseRollup, ("program_id", "course_id")),
+    ):
+        for row in model.objects.values(*fields, *FIELDS[model]):
+            lookup = tuple((field, row[field]) for field in fields)
+            stored[model, lookup] = {field: row[field] for field in FIELDS[model]}
+
+    mismatches = []
+    for key in sorted(set(stored) | set(expected), key=lambda k: (k[0].__name__, k[1])):
+        empty = dict.fromkeys(FIELDS[key[0]], 0)
+        have = stored.get(key, empty)
+        want = {**empty, **expected.get(key, {})}
+        if any(have[field] != want[field] for field in FIELDS[key[0]]):
+            mismatches.append((key[0], dict(key[1]), have, want))
+    return mismatches
@@ -0,0 +1,133 @@
+"""
+bulk grading of student assignments
+"""
+import json
+
+from django.contrib.admin.models import CHANGE, LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import StudentAssignment
+from . import caching, gradebook
+
+MAX_GRADE = 100
+
+BATCH_SIZE = 500
+
+GRADED_FIELDS = ["grade", "feedback", "reviewed", "reviewer", "dtm_updated"]
+
+
+def bulk_grade(faculty, entries, user=None, batch_size=BATCH_SIZE):
+    """
+    Grades many StudentAssignments as faculty. entries is a list of
+    (index, {"student_assignment_id", "grade", "feedback"}) pairs; rows are
+    locked and checked in one query and written with bulk_update in the same
+    transaction.
+    Returns the number of graded rows and a list of per-row errors.
+    """
+    ids = [entry["student_assignment_id"] for _, entry in entries]
+    with transaction.atomic():
+        # the rows stay locked until written, so a concurrent request can't
+        # change them between the read and the gradebook update
+        locked = (
+            StudentAssignment.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("pk")
+        )
+        rows = {
+            pk: row
+            for pk, *row in locked.values_list(
+                "pk",
+                "student_id",
+                "assignment_id",
+                "submitted",
+                "grade",
+                "feedback",
+                "assignment__content__faculty_id",
+            )
+        }
+        return _grade(faculty, entries, rows, user, batch_size)
+
+
+def _grade(faculty, entries, rows, user, batch_size):
+    """
+    Checks the entries against the locked rows and writes the valid ones
+    """
+    now = timezone.now()
+    errors, graded, changes, seen = [], [], [], set()
+    for index, entry in entries:
+        pk = entry["student_assignment_id"]
+        error = None
+        if pk in seen:
+            error = "Graded more than once in this request."
+        elif pk not in rows:
+            error = "Does not exist."
+        elif rows[pk][2] is None:
+            error = "Has not been submitted."
+        elif rows[pk][5] != faculty.pk:
+            error = "Belongs to another faculty member's content."
+        if error:
+            errors.append(
+                {
+                    "index": index,
+                    "student_assignment_id": pk,
+                    "errors": {"student_assignment_id": [error]},
+                }
+            )
+            continue
+
+        seen.add(pk)
+        student_id, assignment_id, submitted, grade, feedback, _ = rows[pk]
+        obj = StudentAssignment(
+            pk=pk,
+            student_id=student_id,
+            assignment_id=assignment_id,
+            submitted=submitted,
+            grade=entry["grade"],
+            feedback=entry.get("feedback", feedback),
+            reviewed=now,
+            reviewer_id=faculty.pk,
+        )
+        obj.dtm_updated = now
+        graded.append(obj)
+        # bulk_update skips the signals, so feed the gradebook directly
+        changes.append(
+            (
+                (student_id, assignment_id, True, grade),
+                gradebook.snapshot(obj),
+            )
+        )
+
+    if not graded:
+        return 0, errors
+    StudentAssignment.objects.bulk_update(graded, GRADED_FIELDS, batch_size=batch_size)
+    gradebook.record_changes(changes)
+    caching.record_changes(changes)
+    if user is not None:
+        _log_changes(user, graded, batch_size)
+    return len(graded), errors
+
+
+def _log_changes(user, graded, batch_size):
+    """
+    Records one admin history entry per graded row in bulk
+    """
+    content_type = ContentType.objects.get_for_model(StudentAssignment)
+    message = json.dumps(
+        [{"changed": {"fields": ["Grade", "Feedback", "Reviewed", "Reviewer"]}}]
+    )
+    LogEntry.objects.bulk_create(
+        [
+            LogEntry(
+                user_id=user.pk,
+                content_type_id=content_type.pk,
+                object_id=str(obj.pk),
+                object_repr=f"StudentAssignment {obj.pk}",
+                action_flag=CHANGE,
+                change_message=message,
+            )
+            for obj in graded
+        ],
+        batch_size=batch_size,
+    )
@@ -0,0 +1,350 @@
+"""
+bulk CSV imports of rosters and grades for voyage app
+"""
+import csv
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Assignment, Faculty, Program, Student, StudentAssignment
+from . import bulk_create_pks, caching, gradebook
+from .grading import MAX_GRADE
+
+BATCH_SIZE = 1000
+
+# keeps task results small when a whole file is rejected
+MAX_REPORTED_ERRORS = 1000
+
+GITHUB_HANDLE = re.compile(r"^[A-Za-z\d](?:[A-Za-z\d]|-(?=[A-Za-z\d])){0,38}$")
+
+
+class CsvImportError(Exception):
+    """
+    Raised when a file can't be imported at all, e.g. a column is missing
+    """
+
+
+class CsvImport:
+    """
+    Reads a CSV file as a stream and imports it batch by batch, each batch
+    in its own transaction. Rows with errors are reported by line number and
+    skipped without affecting the rest of their batch.
+    """
+
+    columns = ()
+
+    def __init__(self, batch_size=BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress or (lambda summary: None)
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, file):
+        """
+        Imports a binary or text file object and returns the summary
+        """
+        if isinstance(file.read(0), bytes):
+            file = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        reader = csv.DictReader(file)
+        missing = set(self.columns) - set(reader.fieldnames or ())
+        if missing:
+            raise CsvImportError(f"Missing columns: {', '.join(sorted(missing))}")
+
+        # the header is line 1
+        rows = enumerate(reader, 2)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                self.import_batch([(line, self.clean(row)) for line, row in batch])
+            self.rows += len(batch)
+            self.progress(self.summary())
+        return self.summary()
+
+    @staticmethod
+    def clean(row):
+        """
+        Strips the values of a row, dropping cells beyond the header
+        """
+        return {
+            key: (value or "").strip() for key, value in row.items() if key is not None
+        }
+
+    def import_batch(self, batch):
+        """
+        Validates and writes one batch of (line, row) pairs
+        """
+        raise NotImplementedError
+
+    def error(self, line, errors):
+        """
+        Records the errors of one row, {column: message}
+        """
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def summary(self):
+        """
+        Returns the counts so far and the reported errors
+        """
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+class RosterImport(CsvImport):
+    """
+    Creates a User and a Student for every row of
+    username,email,first_name,last_name,github,program
+    where program is the Program id. GitHub handles are checked against both
+    Student.github and Faculty.github, and usernames against the users.
+    Users get an unusable password, so they sign in through GitHub.
+    Handles are compared case-insensitively, as GitHub does. The
+    StudentAssignment rows of all the committed students are created by one
+    task queued once the file is imported, or stops on an error.
+    """
+
+    columns = ("username", "email", "github", "program")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.programs = set(Program.objects.values_list("pk", flat=True))
+        self.seen_usernames = set()
+        self.seen_handles = set()
+        self.student_ids = []
+
+    def run(self, file):
+        try:
+            return super().run(file)
+        finally:
+            if self.student_ids:
+                # pylint: disable=import-outside-toplevel
+                from ..tasks import create_student_assignments, enqueue
+
+                enqueue(create_student_assignments, student_ids=self.student_ids)
+
+    def import_batch(self, batch):
+        handles = {row["github"].lower() for _, row in batch}
+        usernames = [row["username"] for _, row in batch]
+        taken_handles = set()
+        for model in (Student, Faculty):
+            taken_handles.update(
+                model.objects.annotate(handle=Lower("github"))
+                .filter(handle__in=handles)
+                .values_list("handle", flat=True)
+            )
+        taken_usernames = set(
+            get_user_model()
+            .objects.filter(username__in=usernames)
+            .values_list("username", flat=True)
+        )
+
+        valid = []
+        for line, row in batch:
+            errors = self.validate(row, taken_handles, taken_usernames)
+            if errors:
+                self.error(line, errors)
+                continue
+            self.seen_handles.add(row["github"].lower())
+            self.seen_usernames.add(row["username"])
+            valid.append(row)
+        if not valid:
+            return
+
+        users = [
+            get_user_model()(
+                username=row["username"],
+                email=row["email"],
+                first_name=row.get("first_name", ""),
+                last_name=row.get("last_name", ""),
+                password=make_password(None),
+            )
+            for row in valid
+        ]
+        user_ids = bulk_create_pks(get_user_model(), users, "username")
+        student_ids = bulk_create_pks(
+            Student,
+            [
+                Student(
+                    user_id=user_id, github=row["github"], program_id=row["program"]
+                )
+                for user_id, row in zip(user_ids, valid)
+            ],
+            "github",
+        )
+        caching.students_changed(student_ids, {row["program"] for row in valid})
+        # counted last, so a batch that fails is not fanned out
+        self.created += len(valid)
+        self.student_ids.extend(student_ids)
+
+    def validate(self, row, taken_handles, taken_usernames):
+        """
+        Returns {column: message} for the problems of one row
+        """
+        errors = {}
+        if not row["username"]:
+            errors["username"] = "Required."
+        elif (
+            row["username"] in taken_usernames or row["username"] in self.seen_usernames
+        ):
+            errors["username"] = "Already taken."
+        if not row["email"]:
+            errors["email"] = "Required."
+        if not GITHUB_HANDLE.match(row["github"]):
+            errors["github"] = "Not a valid GitHub handle."
+        elif (
+            row["github"].lower() in taken_handles
+            or row["github"].lower() in self.seen_handles
+        ):
+            errors["github"] = "Already used by a student or faculty member."
+        if not row["program"].isdigit() or int(row["program"]) not in self.programs:
+            errors["program"] = "Unknown program id."
+        return errors
+
+
+class GradeImport(CsvImport):
+    """
+    Creates or updates a StudentAssignment for every row of
+    github,assignment,grade,submitted,feedback,reviewer
+    where github is the student's handle, assignment the Assignment id and
+    reviewer an optional faculty handle. The gradebook rollups are updated
+    directly, since bulk writes skip the model signals.
+    """
+
+    columns = ("github", "assignment", "grade")
+
+    fields = ["grade", "submitted", "reviewed", "reviewer", "feedback", "dtm_updated"]
+
+    def import_batch(self, batch):
+        students = {
+            github: (pk, program_id)
+            for github, pk, program_id in Student.objects.filter(
+                github__in={row["github"] for _, row in batch}
+            ).values_list("github", "pk", "program_id")
+        }
+        reviewers = dict(
+            Faculty.objects.filter(
+                github__in={row["reviewer"] for _, row in batch if row.get("reviewer")}
+            ).values_list("github", "pk")
+        )
+        assignments = dict(
+            Assignment.objects.filter(
+                pk__in={
+                    int(row["assignment"])
+                    for _, row in batch
+                    if row["assignment"].isdigit()
+                }
+            ).values_list("pk", "program_id")
+        )
+
+        valid = {}
+        for line, row in batch:
+            errors, values = self.validate(row, students, assignments, reviewers)
+            if errors:
+                self.error(line, errors)
+            else:
+                # a later row for the same submission wins
+                valid[values["student_id"], values["assignment_id"]] = values
+        if not valid:
+            return
+
+        existing = {}
+        for obj in StudentAssignment.objects.filter(
+            student_id__in={student_id for student_id, _ in valid},
+            assignment_id__in={assignment_id for _, assignment_id in valid},
+        ).order_by("pk"):
+            existing.setdefault((obj.student_id, obj.assignment_id), obj)
+
+        now = timezone.now()
+        created, updated, changes = [], [], []
+        for key, values in valid.items():
+            obj = existing.get(key)
+            before = gradebook.snapshot(obj) if obj else None
+            if obj is None:
+                obj = StudentAssignment(
+                    student_id=key[0], assignment_id=key[1], submitted=now
+                )
+                created.append(obj)
+            else:
+                obj.dtm_updated = now
+                updated.append(obj)
+            obj.grade = values["grade"]
+            obj.submitted = values["submitted"] or obj.submitted or now
+            obj.reviewed = now
+            obj.reviewer_id = values["reviewer_id"] or obj.reviewer_id
+            if values["feedback"]:
+                obj.feedback = values["feedback"]
+            changes.append((before, gradebook.snapshot(obj)))
+
+        StudentAssignment.objects.bulk_create(created)
+        StudentAssignment.objects.bulk_update(updated, self.fields)
+        gradebook.record_changes(changes)
+        caching.record_changes(changes)
+        self.created += len(created)
+        self.updated += len(updated)
+
+    def validate(self, row, students, assignments, reviewers):
+        """
+        Returns ({column: message}, parsed values) for one row
+        """
+        errors, values = {}, {}
+        student = students.get(row["github"])
+        if student is None:
+            errors["github"] = "No student with this GitHub handle."
+        else:
+            values["student_id"] = student[0]
+
+        assignment_id = int(row["assignment"]) if row["assignment"].isdigit() else None
+        program_id = assignments.get(assignment_id)
+        if program_id is None:
+            errors["assignment"] = "Unknown assignment id."
+        elif student is not None and student[1] != program_id:
+            errors["assignment"] = "Not in the student's program."
+        else:
+            values["assignment_id"] = assignment_id
+
+        try:
+            values["grade"] = Decimal(row["grade"]).quantize(Decimal("0.01"))
+            if not 0 <= values["grade"] <= MAX_GRADE:
+                errors["grade"] = f"Must be between 0 and {MAX_GRADE}."
+        except InvalidOperation:
+            errors["grade"] = "Not a number."
+
+        values["submitted"] = None
+        if row.get("submitted"):
+            submitted = parse_datetime(row["submitted"])
+            if submitted is None:
+                try:
+                    submitted = datetime.fromisoformat(row["submitted"])
+                except ValueError:
+                    errors["submitted"] = "Not an ISO 8601 date and time."
+            if submitted is not None and timezone.is_naive(submitted):
+                submitted = timezone.make_aware(submitted)
+            values["submitted"] = submitted
+
+        values["reviewer_id"] = None
+        if row.get("reviewer"):
+            values["reviewer_id"] = reviewers.get(row["reviewer"])
+            if values["reviewer_id"] is None:
+                errors["reviewer"] = "No faculty with this GitHub handle."
+
+        values["feedback"] = row.get("feedback") or None
+        return errors, values
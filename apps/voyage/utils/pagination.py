@@ -0,0 +1,146 @@
+"""
+pagination helpers for large admin tables and API lists
+"""
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+KEYSET_VAR = "cursor"
+
+# below this many rows an exact COUNT(*) is cheap enough to run every time
+ESTIMATE_THRESHOLD = 10000
+
+COUNT_CACHE_TIMEOUT = 300
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Returns the row count the database keeps in its table statistics,
+    or None when the backend has no statistics for the table
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "mysql":
+        sql = (
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+    elif connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+    elif connection.vendor == "sqlite":
+        # sqlite_stat1 only exists once ANALYZE has been run
+        sql = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if not row or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    return count if count >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids a full COUNT(*) on unfiltered large tables by using
+    the database's table statistics, falling back to a cached exact count
+    """
+
+    @cached_property
+    def count(self):
+        """
+        Returns the estimated number of objects when the queryset is unfiltered
+        """
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+
+        estimate = estimated_row_count(queryset.model, queryset.db)
+        if estimate is None:
+            key = f"voyage:count:{queryset.model._meta.db_table}"
+            return cache.get_or_set(key, queryset.count, COUNT_CACHE_TIMEOUT)
+        if estimate < ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages through rows ordered by descending primary key with
+    a ?cursor=<pk> parameter instead of an OFFSET, so deep pages cost the same
+    as the first one. Sorting on a column falls back to numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.keyset = None
+        if ORDER_VAR not in request.GET:
+            try:
+                self.keyset = int(request.GET[KEYSET_VAR])
+            except (KeyError, ValueError):
+                pass
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        """
+        Excludes the cursor from the lookups applied as filters
+        """
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        """
+        Replaces the current page with the rows after the cursor
+        """
+        super().get_results(request)
+        if self.keyset is not None:
+            self.result_list = self.queryset.filter(pk__lt=self.keyset)[
+                : self.list_per_page
+            ]
+
+    @property
+    def keyset_paged(self):
+        """
+        Returns True when rows are in primary key order and can use the cursor
+        """
+        return ORDER_VAR not in self.params
+
+    @property
+    def first_page_url(self):
+        """
+        Returns the url of the first page without a cursor
+        """
+        return self.get_query_string({KEYSET_VAR: None, PAGE_VAR: None})
+
+    @property
+    def next_page_url(self):
+        """
+        Returns the url of the page after the last row shown, if there is one
+        """
+        if not self.keyset_paged:
+            return None
+        rows = list(self.result_list)
+        if len(rows) < self.list_per_page:
+            return None
+        return self.get_query_string({KEYSET_VAR: rows[-1].pk, PAGE_VAR: None})
+
+
+class PrimaryKeyCursorPagination(CursorPagination):
+    """
+    Cursor pagination over descending primary keys for the API, so every page
+    is an indexed range scan and no COUNT(*) is run
+    """
+
+    ordering = "-pk"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
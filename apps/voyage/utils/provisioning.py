@@ -0,0 +1,276 @@
+"""
+provisions a copy of an assignment's content repo for every student, pushing
+from a local bare mirror of the content repo with a bounded thread pool
+"""
+import fcntl
+import logging
+import os
+import subprocess
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+from ..models import StudentAssignment, StudentRepository
+
+logger = logging.getLogger(__name__)
+
+Status = StudentRepository.Status
+
+BATCH_SIZE = 2000
+
+# seconds before the second attempt of a push, doubled after every failure
+RETRY_DELAY = 2
+
+# how often progress is reported while pushes complete
+PROGRESS_EVERY = 100
+
+
+class GitError(Exception):
+    """
+    Raised when a git command fails or times out
+    """
+
+
+def git(*args, cwd=None):
+    """
+    Runs git with args, never prompting for credentials, and returns stdout
+    """
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=cwd,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+            capture_output=True,
+            text=True,
+            timeout=settings.REPO_GIT_TIMEOUT,
+            check=False,
+        )
+    except subprocess.TimeoutExpired as error:
+        raise GitError(f"git {args[0]} timed out") from error
+    if result.returncode:
+        raise GitError(
+            result.stderr.strip() or f"git {args[0]} exited with {result.returncode}"
+        )
+    return result.stdout
+
+
+def local_path(url):
+    """
+    Returns the filesystem path of a file:// URL or absolute path, None for
+    remote URLs
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return unquote(parsed.path)
+    if os.path.isabs(url):
+        return url
+    return None
+
+
+@contextmanager
+def locked(path):
+    """
+    Holds an exclusive lock next to path, so that workers and tasks running at
+    the same time don't update the same mirror
+    """
+    with open(f"{path}.lock", "w", encoding="utf-8") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def refresh_mirror(url, path):
+    """
+    Clones url as a bare mirror at path, or fetches into the existing mirror
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with locked(path):
+        if os.path.isdir(path):
+            git("remote", "update", "--prune", cwd=path)
+        else:
+            git("clone", "--mirror", "--quiet", url, path)
+
+
+def push_copy(mirror, url, attempts):
+    """
+    Pushes the branches and tags of mirror to url, creating url first when it
+    is a local bare repo, with up to attempts tries. Nothing is force-pushed,
+    so a student's own commits are never overwritten.
+    Returns (tries used, error message or None).
+    """
+    error = None
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            time.sleep(RETRY_DELAY * 2 ** (attempt - 2))
+        try:
+            path = local_path(url)
+            if path and not os.path.isdir(path):
+                git("init", "--bare", "--quiet", path)
+            git(
+                "push",
+                "--quiet",
+                url,
+                "refs/heads/*:refs/heads/*",
+                "refs/tags/*:refs/tags/*",
+                cwd=mirror,
+            )
+            return attempt, None
+        except GitError as exc:
+            error = str(exc)
+    return attempts, error
+
+
+class Provisioner:
+    """
+    Creates a StudentRepository row for every StudentAssignment in scope and
+    pushes the content repo to each one that isn't ready yet. The content repo
+    is fetched once into a local mirror, and the pushes run in a pool of
+    worker threads (git does the work in subprocesses). Statuses are written
+    as each push finishes, so an interrupted run resumes where it stopped;
+    failed rows are retried only when asked to.
+    """
+
+    def __init__(
+        self, workers=None, attempts=None, target=None, mirror_dir=None, progress=None
+    ):
+        self.workers = workers or settings.REPO_PROVISION_WORKERS
+        self.attempts = max(1, attempts or settings.REPO_PROVISION_ATTEMPTS)
+        self.target = target or settings.REPO_TARGET_URL
+        self.mirror_dir = mirror_dir or settings.REPO_MIRROR_DIR
+        self.progress = progress or (lambda summary: None)
+        self.ready = 0
+        self.failed = 0
+        if not self.target:
+            raise ImproperlyConfigured("REPO_TARGET_URL is not set")
+
+    def run(self, student_ids=None, assignment_ids=None, retry_failed=False):
+        """
+        Provisions the repos of the given students and/or assignments, or of
+        everyone when neither is given, and returns the summary
+        """
+        rows = StudentAssignment.objects.all()
+        if student_ids is not None:
+            rows = rows.filter(student__in=student_ids)
+        if assignment_ids is not None:
+            rows = rows.filter(assignment__in=assignment_ids)
+        self.create_missing(rows)
+
+        statuses = [Status.PENDING, Status.PROVISIONING]
+        if retry_failed:
+            statuses.append(Status.FAILED)
+        repos = StudentRepository.objects.filter(
+            student_assignment__in=rows, status__in=statuses
+        )
+        contents = (
+            repos.order_by()
+            .values_list(
+                "student_assignment__assignment__content",
+                "student_assignment__assignment__content__repo",
+            )
+            .distinct()
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for content_id, repo in list(contents):
+                self.provision_content(
+                    pool,
+                    content_id,
+                    repo,
+                    repos.filter(student_assignment__assignment__content=content_id),
+                )
+        return self.summary()
+
+    def create_missing(self, rows):
+        """
+        Creates the pending StudentRepository rows of the StudentAssignments
+        that don't have one yet
+        """
+        missing = rows.filter(repository__isnull=True).values_list(
+            "pk",
+            "student_id",
+            "student__github",
+            "assignment_id",
+            "assignment__content__name",
+        )
+        batch = []
+        for pk, student_id, github, assignment_id, content in missing.iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            url = self.target.format(
+                github=github,
+                content=slugify(content),
+                assignment=assignment_id,
+                student=student_id,
+            )
+            batch.append(StudentRepository(student_assignment_id=pk, url=url))
+            if len(batch) >= BATCH_SIZE:
+                StudentRepository.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        StudentRepository.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def provision_content(self, pool, content_id, repo, repos):
+        """
+        Refreshes the mirror of one content repo and pushes it to repos. Rows
+        with the same url, e.g. one content used in two courses, share a push.
+        """
+        by_url = defaultdict(list)
+        for pk, url in repos.values_list("pk", "url"):
+            by_url[url].append(pk)
+        ids = [pk for pks in by_url.values() for pk in pks]
+        mirror = os.path.join(self.mirror_dir, f"content-{content_id}.git")
+        try:
+            refresh_mirror(repo, mirror)
+        except GitError as error:
+            logger.warning("Can't mirror %s: %s", repo, error)
+            self.record(ids, 1, str(error))
+            return
+
+        for start in range(0, len(ids), BATCH_SIZE):
+            StudentRepository.objects.filter(
+                pk__in=ids[start : start + BATCH_SIZE]
+            ).update(status=Status.PROVISIONING, dtm_updated=timezone.now())
+
+        futures = {
+            pool.submit(push_copy, mirror, url, self.attempts): pks
+            for url, pks in by_url.items()
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            self.record(futures[future], *future.result())
+            if done % PROGRESS_EVERY == 0:
+                self.progress(self.summary())
+        self.progress(self.summary())
+
+    def record(self, ids, tries, error):
+        """
+        Stores the outcome of one push for the rows in ids
+        """
+        now = timezone.now()
+        for start in range(0, len(ids), BATCH_SIZE):
+            StudentRepository.objects.filter(
+                pk__in=ids[start : start + BATCH_SIZE]
+            ).update(
+                status=Status.FAILED if error else Status.READY,
+                attempts=F("attempts") + tries,
+                error=error,
+                provisioned=None if error else now,
+                dtm_updated=now,
+            )
+        if error:
+            self.failed += len(ids)
+        else:
+            self.ready += len(ids)
+
+    def summary(self):
+        """
+        Returns the counts so far
+        """
+        return {"ready": self.ready, "failed": self.failed}
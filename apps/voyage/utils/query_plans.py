@@ -0,0 +1,130 @@
+"""
+EXPLAIN checks for the hot StudentAssignment lookups
+"""
+import json
+import re
+
+from django.db import connections
+
+from ..models import Assignment, Faculty, Student, StudentAssignment
+
+# any pk works, EXPLAIN only needs the shape of the query
+SAMPLE_PK = 1
+
+HOT_QUERIES = {}
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)(.*)")
+POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def hot_query(name):
+    """
+    Registers a function returning a queryset under name
+    """
+
+    def register(function):
+        HOT_QUERIES[name] = function
+        return function
+
+    return register
+
+
+@hot_query("student.assignments_submitted")
+def student_submitted():
+    """
+    Student.assignments_submitted(), served by voyage_sa_student_submitted
+    """
+    return Student(pk=SAMPLE_PK).assignments_submitted()
+
+
+@hot_query("student.assignments_not_submited")
+def student_not_submitted():
+    """
+    Student.assignments_not_submited(), served by voyage_sa_student_submitted
+    """
+    return Student(pk=SAMPLE_PK).assignments_not_submited()
+
+
+@hot_query("student.assignments_graded")
+def student_graded():
+    """
+    Student.assignments_graded(), served by voyage_sa_student_submitted
+    """
+    return Student(pk=SAMPLE_PK).assignments_graded()
+
+
+@hot_query("faculty.assignments_graded")
+def faculty_graded():
+    """
+    Faculty.assignments_graded(), served by voyage_sa_reviewer_grade
+    """
+    return Faculty(pk=SAMPLE_PK).assignments_graded()
+
+
+@hot_query("assignment.submissions(graded=True)")
+def assignment_graded():
+    """
+    Assignment.submissions(graded=True), served by voyage_sa_assignment_grade
+    """
+    return Assignment(pk=SAMPLE_PK).submissions(graded=True)
+
+
+@hot_query("assignment.submissions(graded=False)")
+def assignment_not_graded():
+    """
+    Assignment.submissions(graded=False), served by voyage_sa_assignment_grade
+    """
+    return Assignment(pk=SAMPLE_PK).submissions(graded=False)
+
+
+@hot_query("assignment completed (grade >= 100)")
+def assignment_completed():
+    """
+    the completed count of the course and assignment changelists, served by
+    voyage_sa_assignment_grade
+    """
+    return StudentAssignment.objects.filter(assignment_id=SAMPLE_PK, grade__gte=100)
+
+
+def full_scans(queryset, using="default"):
+    """
+    Returns (plan, [(table, detail), ...]) listing every full table scan in the
+    query plan of queryset
+    """
+    vendor = connections[using].vendor
+    queryset = queryset.using(using)
+    if vendor == "mysql":
+        plan = queryset.explain(format="json")
+        return plan, [
+            (table["table_name"], table.get("possible_keys") or "no usable index")
+            for table in _mysql_tables(json.loads(plan))
+            if table.get("access_type") == "ALL"
+        ]
+
+    plan = queryset.explain()
+    if vendor == "sqlite":
+        matches = (SQLITE_SCAN.search(line) for line in plan.splitlines())
+        return plan, [
+            (match.group(1), match.group(2).strip() or "no usable index")
+            for match in matches
+            if match
+        ]
+    if vendor == "postgresql":
+        return plan, [
+            (table, "sequential scan") for table in POSTGRES_SCAN.findall(plan)
+        ]
+    return plan, []
+
+
+def _mysql_tables(node):
+    """
+    Yields every "table" entry of a MySQL JSON plan
+    """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "table" and isinstance(value, dict):
+                yield value
+            yield from _mysql_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_tables(value)
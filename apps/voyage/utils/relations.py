@@ -0,0 +1,176 @@
+"""
+memoized, prefetchable relationship methods for voyage models, and the
+count_<name>() / has_<name>() companions of queryset methods
+"""
+from functools import update_wrapper
+from operator import attrgetter
+
+from django.db.models import F
+from django.db.models.signals import post_save
+
+OWNER = "_relation_owner"
+
+
+def add_companions(cls, name):
+    """
+    Adds count_<name>() and has_<name>() to cls, taking the same arguments as
+    the queryset method name and running COUNT and EXISTS in the database, or
+    reading the rows when the queryset has already been fetched
+    """
+
+    def count(self, *args, **kwargs):
+        return getattr(self, name)(*args, **kwargs).count()
+
+    def has(self, *args, **kwargs):
+        return getattr(self, name)(*args, **kwargs).exists()
+
+    count.__doc__ = f"Returns the number of {name}() rows"
+    has.__doc__ = f"Returns True if {name}() has any rows"
+    for prefix, method in (("count", count), ("has", has)):
+        method.__name__ = f"{prefix}_{name}"
+        method.__qualname__ = f"{cls.__name__}.{prefix}_{name}"
+        setattr(cls, method.__name__, method)
+
+
+def countable(method):
+    """
+    Decorates a model method returning a queryset with count_ and has_
+    companions, see add_companions()
+    """
+    return CountableMethod(method)
+
+
+class CountableMethod:
+    """
+    Class attribute behind @countable, installing the plain method and its
+    companions on the model
+    """
+
+    def __init__(self, method):
+        self.method = method
+
+    def contribute_to_class(self, cls, name):
+        """
+        Installs the method and its companions
+        """
+        setattr(cls, name, self.method)
+        add_companions(cls, name)
+
+
+def relation(model, lookup):
+    """
+    Decorates a model method returning the model rows related to the instance
+    through lookup, e.g. @relation("Course", "assignment__content__faculty").
+    Calling it without arguments returns the same queryset for the life of the
+    instance, so its rows are fetched once however many times it is called,
+    until the instance is saved. Like a related manager, it can be filled for
+    a whole page of instances with prefetch_related("courses") or a Prefetch.
+    Calls with arguments are not memoized. The method gets count_ and has_
+    companions, see add_companions().
+    """
+
+    def decorator(method):
+        return RelationDescriptor(method, model, lookup)
+
+    return decorator
+
+
+class RelationDescriptor:
+    """
+    Class attribute behind @relation, returning a BoundRelation per instance
+    """
+
+    def __init__(self, method, model, lookup):
+        update_wrapper(self, method)
+        self.method = method
+        self.model_name = model
+        self.lookup = lookup
+        self.name = method.__name__
+        self.owner = None
+
+    def contribute_to_class(self, cls, name):
+        """
+        Installs the descriptor and its companions, and clears the memoized
+        rows on save
+        """
+        self.name = name
+        self.owner = cls
+        setattr(cls, name, self)
+        add_companions(cls, name)
+        post_save.connect(self.clear, sender=cls, weak=False)
+
+    @property
+    def model(self):
+        """
+        Returns the related model, resolved once the app registry is ready
+        """
+        return self.owner._meta.apps.get_model(
+            self.owner._meta.app_label, self.model_name
+        )
+
+    def clear(self, sender, instance, **kwargs):
+        """
+        Forgets the memoized rows of a saved instance
+        """
+        getattr(instance, "_prefetched_objects_cache", {}).pop(self.name, None)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return BoundRelation(self, instance)
+
+
+class BoundRelation:
+    """
+    The relationship method of one instance, also implementing the interface
+    prefetch_related_objects() expects from a related manager
+    """
+
+    def __init__(self, descriptor, instance):
+        self.descriptor = descriptor
+        self.instance = instance
+        self.__doc__ = descriptor.__doc__
+
+    def __call__(self, *args, **kwargs):
+        if args or kwargs:
+            return self.descriptor.method(self.instance, *args, **kwargs)
+        if not hasattr(self.instance, "_prefetched_objects_cache"):
+            self.instance._prefetched_objects_cache = {}
+        cache = self.instance._prefetched_objects_cache
+        if self.descriptor.name not in cache:
+            cache[self.descriptor.name] = self.get_queryset()
+        return cache[self.descriptor.name]
+
+    def get_queryset(self):
+        """
+        Returns the unmemoized queryset of the method
+        """
+        return self.descriptor.method(self.instance)
+
+    def _apply_rel_filters(self, queryset):
+        """
+        Restricts the queryset of a Prefetch to the rows of this instance
+        """
+        return queryset.filter(**{self.descriptor.lookup: self.instance}).distinct()
+
+    def get_prefetch_queryset(self, instances, queryset=None):
+        """
+        Returns the related rows of all instances in one query, each annotated
+        with the instance it belongs to
+        """
+        if queryset is None:
+            queryset = self.descriptor.model._default_manager.all()
+        lookup = self.descriptor.lookup
+        queryset = (
+            queryset.filter(**{f"{lookup}__in": instances})
+            .annotate(**{OWNER: F(lookup)})
+            .distinct()
+        )
+        return (
+            queryset,
+            attrgetter(OWNER),
+            attrgetter("pk"),
+            False,
+            self.descriptor.name,
+            False,
+        )
@@ -0,0 +1,291 @@
+"""
+bulk synthetic data for load testing the voyage app
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from ..models import (
+    Assignment,
+    Content,
+    Course,
+    Faculty,
+    Program,
+    Student,
+    StudentAssignment,
+)
+from . import bulk_create_pks, fanout
+
+# fixed so the same seed always produces the same rows
+ANCHOR = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+SCALES = {
+    "small": {
+        "faculty": 10,
+        "programs": 3,
+        "courses": 10,
+        "contents": 50,
+        "assignments": 60,
+        "students": 300,
+        "student_assignments": 5000,
+    },
+    "medium": {
+        "faculty": 100,
+        "programs": 10,
+        "courses": 50,
+        "contents": 500,
+        "assignments": 1000,
+        "students": 10000,
+        "student_assignments": 500000,
+    },
+    "large": {
+        "faculty": 500,
+        "programs": 40,
+        "courses": 200,
+        "contents": 2500,
+        "assignments": 8000,
+        "students": 100000,
+        "student_assignments": 5000000,
+    },
+}
+
+
+class SyntheticData:
+    """
+    Generates a consistent dataset with bulk_create, batch by batch.
+    Every object name starts with prefix so several runs can coexist.
+    """
+
+    def __init__(self, seed=0, prefix="load", batch_size=5000, log=None):
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.password = make_password(f"{prefix}-password")
+
+    def _create(self, model, objs, key):
+        """
+        bulk-creates objs in batches and returns their primary keys in order,
+        looking them up by the unique key on backends that don't return them
+        """
+        pks = []
+        for start in range(0, len(objs), self.batch_size):
+            batch = objs[start : start + self.batch_size]
+            with transaction.atomic():
+                pks.extend(bulk_create_pks(model, batch, key))
+        self.log(f"{model.__name__}: {len(pks)}")
+        return pks
+
+    def _users(self, kind, count):
+        """
+        creates count users sharing one precomputed password hash
+        """
+        users = [
+            get_user_model()(
+                username=f"{self.prefix}_{kind}_{i}",
+                email=f"{self.prefix}_{kind}_{i}@example.com",
+                password=self.password,
+            )
+            for i in range(count)
+        ]
+        return self._create(get_user_model(), users, "username")
+
+    def faculty(self, count):
+        """
+        creates faculty members and their users
+        """
+        users = self._users("faculty", count)
+        objs = [
+            Faculty(
+                user_id=user_id,
+                github=f"{self.prefix}-f{i}",
+                is_active=self.random.random() < 0.9,
+            )
+            for i, user_id in enumerate(users)
+        ]
+        return self._create(Faculty, objs, "github")
+
+    def programs(self, count):
+        """
+        creates programs of six to twelve months
+        """
+        objs = []
+        for i in range(count):
+            start = ANCHOR + timedelta(days=self.random.randint(-365, 0))
+            end = start + timedelta(days=self.random.randint(180, 365))
+            objs.append(
+                Program(name=f"{self.prefix} program {i}", start=start, end=end)
+            )
+        return self._create(Program, objs, "name")
+
+    def courses(self, count):
+        """
+        creates courses
+        """
+        objs = [Course(name=f"{self.prefix} course {i}") for i in range(count)]
+        return self._create(Course, objs, "name")
+
+    def contents(self, count, faculty):
+        """
+        creates content owned by random faculty, returning (pk, faculty_id) pairs
+        """
+        owners = [self.random.choice(faculty) for _ in range(count)]
+        objs = [
+            Content(
+                name=f"{self.prefix} content {i}",
+                faculty_id=owner,
+                repo=f"https://github.com/{self.prefix}-f{owner}/content-{i}",
+            )
+            for i, owner in enumerate(owners)
+        ]
+        return list(zip(self._create(Content, objs, "repo"), owners))
+
+    def assignments(self, count, programs, courses, contents):
+        """
+        creates assignments with unique (program, course, content) triples,
+        returning {program_id: [(assignment_id, due, faculty_id), ...]}
+        """
+        triples = set()
+        limit = len(programs) * len(courses) * len(contents)
+        while len(triples) < min(count, limit):
+            triples.add(
+                (
+                    self.random.choice(programs),
+                    self.random.choice(courses),
+                    self.random.randrange(len(contents)),
+                )
+            )
+
+        objs = []
+        for program_id, course_id, index in sorted(triples):
+            objs.append(
+                Assignment(
+                    program_id=program_id,
+                    course_id=course_id,
+                    content_id=contents[index][0],
+                    due=ANCHOR + timedelta(days=self.random.randint(-180, 60)),
+                    instructions="Synthetic instructions",
+                    rubric="Synthetic rubric",
+                )
+            )
+        pks = self._create_assignments(objs)
+
+        by_program = {program_id: [] for program_id in programs}
+        for pk, obj, (_, _, index) in zip(pks, objs, sorted(triples)):
+            by_program[obj.program_id].append((pk, obj.due, contents[index][1]))
+        return by_program
+
+    def _create_assignments(self, objs):
+        """
+        Assignment has no single unique column, so look pks up by the triple
+        """
+        pks = []
+        for start in range(0, len(objs), self.batch_size):
+            batch = objs[start : start + self.batch_size]
+            with transaction.atomic():
+                Assignment.objects.bulk_create(batch)
+                if batch[0].pk is None:
+                    lookup = {
+                        (program_id, course_id, content_id): pk
+                        for pk, program_id, course_id, content_id in (
+                            Assignment.objects.filter(
+                                content_id__in={obj.content_id for obj in batch}
+                            ).values_list("pk", "program_id", "course_id", "content_id")
+                        )
+                    }
+                    pks.extend(
+                        lookup[obj.program_id, obj.course_id, obj.content_id]
+                        for obj in batch
+                    )
+                else:
+                    pks.extend(obj.pk for obj in batch)
+        self.log(f"Assignment: {len(pks)}")
+        return pks
+
+    def students(self, count, programs):
+        """
+        creates students spread across programs, returning (pk, program_id) pairs
+        """
+        users = self._users("student", count)
+        placements = [self.random.choice(programs) for _ in range(count)]
+        objs = [
+            Student(
+                user_id=user_id,
+                github=f"{self.prefix}-s{i}",
+                is_active=self.random.random() < 0.95,
+                program_id=program_id,
+            )
+            for i, (user_id, program_id) in enumerate(zip(users, placements))
+        ]
+        return list(zip(self._create(Student, objs, "github"), placements))
+
+    def student_assignments(self, count, students, assignments):
+        """
+        creates about count submissions with unique (student, assignment) pairs,
+        each for an assignment in the student's own program
+        """
+        per_student, extra = divmod(count, max(len(students), 1))
+        created = 0
+        batch = []
+        for i, (student_id, program_id) in enumerate(students):
+            available = assignments.get(program_id, [])
+            wanted = min(per_student + (i < extra), len(available))
+            for assignment_id, due, faculty_id in self.random.sample(available, wanted):
+                batch.append(
+                    self._submission(student_id, assignment_id, due, faculty_id)
+                )
+                if len(batch) >= self.batch_size:
+                    created += self._flush(batch)
+                    batch = []
+        created += self._flush(batch)
+        self.log(f"StudentAssignment: {created}")
+        return created
+
+    def _submission(self, student_id, assignment_id, due, faculty_id):
+        """
+        builds one StudentAssignment, submitted around the due date and
+        graded by the content's faculty most of the time
+        """
+        obj = StudentAssignment(student_id=student_id, assignment_id=assignment_id)
+        if self.random.random() < 0.8:
+            obj.submitted = due + timedelta(hours=self.random.randint(-240, 48))
+            if self.random.random() < 0.7:
+                obj.grade = Decimal(self.random.randint(4000, 10000)) / 100
+                obj.reviewed = obj.submitted + timedelta(days=self.random.randint(0, 7))
+                obj.reviewer_id = faculty_id
+                obj.feedback = "Synthetic feedback"
+        return obj
+
+    def _flush(self, batch):
+        """
+        writes one batch of StudentAssignment rows in its own transaction
+        """
+        if batch:
+            with transaction.atomic():
+                StudentAssignment.objects.bulk_create(batch)
+        return len(batch)
+
+    def generate(self, **sizes):
+        """
+        creates a full dataset with the given number of rows per model, then
+        the empty StudentAssignment rows of every student's other program
+        assignments, which the app keeps for every pair (see fanout.py)
+        """
+        faculty = self.faculty(sizes["faculty"])
+        programs = self.programs(sizes["programs"])
+        courses = self.courses(sizes["courses"])
+        contents = self.contents(sizes["contents"], faculty)
+        assignments = self.assignments(
+            sizes["assignments"], programs, courses, contents
+        )
+        students = self.students(sizes["students"], programs)
+        created = self.student_assignments(
+            sizes["student_assignments"], students, assignments
+        )
+        rows = fanout.create_missing(batch_size=self.batch_size)
+        self.log(f"StudentAssignment pairs checked: {rows}")
+        return created
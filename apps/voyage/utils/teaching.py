@@ -0,0 +1,153 @@
+"""
+incremental maintenance of the teaching link tables, the faculty x course
+and faculty x program pairs with their assignment counts (program x course
+pairs are counted by the gradebook's ProgramCourseRollup)
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from ..models import Assignment, FacultyCourse, FacultyProgram
+
+# the fields of each link table and the Assignment paths they are grouped by
+LINKS = {
+    FacultyCourse: {"faculty_id": "content__faculty", "course_id": "course"},
+    FacultyProgram: {"faculty_id": "content__faculty", "program_id": "program"},
+}
+
+
+def _links(state):
+    """
+    Returns the (model, lookup) keys of the links a placement contributes to
+    """
+    values = dict(zip(("program_id", "course_id", "faculty_id"), state))
+    return [
+        (model, tuple((field, values[field]) for field in fields))
+        for model, fields in LINKS.items()
+    ]
+
+
+def _adjust(model, lookup, delta):
+    """
+    Adds delta to the count of the link matching lookup, creating the row on
+    first use and removing it once no assignment is left
+    """
+    changed = model.objects.filter(**lookup).update(
+        assignment_count=F("assignment_count") + delta
+    )
+    if delta < 0:
+        model.objects.filter(**lookup, assignment_count__lte=0).delete()
+    elif not changed:
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, assignment_count=delta)
+        except IntegrityError:
+            # another writer created the row first
+            model.objects.filter(**lookup).update(
+                assignment_count=F("assignment_count") + delta
+            )
+
+
+def record_changes(changes):
+    """
+    Applies a batch of (before, after) pairs of Assignment placements,
+    (program_id, course_id, faculty_id), to the links. Either side may be
+    None for a created or deleted Assignment.
+    """
+    totals = Counter()
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None or None in state:
+                continue
+            for key in _links(state):
+                totals[key] += sign
+
+    with transaction.atomic():
+        for (model, lookup), delta in sorted(
+            totals.items(), key=lambda item: (item[0][0].__name__, item[0][1])
+        ):
+            if delta:
+                _adjust(model, dict(lookup), delta)
+
+
+def record_change(before, after):
+    """
+    Applies the difference between two placements of one Assignment
+    """
+    if before != after:
+        record_changes([(before, after)])
+
+
+def content_moved(content_id, before, after):
+    """
+    Moves the links of a content's assignments from faculty before to after
+    """
+    if before == after:
+        return
+    rows = Assignment.objects.filter(content=content_id).values_list(
+        "program_id", "course_id"
+    )
+    record_changes(
+        [
+            ((program_id, course_id, before), (program_id, course_id, after))
+            for program_id, course_id in rows
+        ]
+    )
+
+
+def compute_links():
+    """
+    Returns the link rows computed from scratch, keyed by model and lookup
+    """
+    links = {}
+    for model, fields in LINKS.items():
+        rows = (
+            Assignment.objects.order_by()
+            .values(*fields.values())
+            .annotate(assignment_count=Count("id"))
+        )
+        for row in rows:
+            lookup = tuple((name, row[path]) for name, path in fields.items())
+            links[model, lookup] = row["assignment_count"]
+    return links
+
+
+def rebuild(batch_size=1000):
+    """
+    Replaces the contents of the link tables with freshly computed rows
+    """
+    links = compute_links()
+    with transaction.atomic():
+        for model in LINKS:
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                [
+                    model(**dict(lookup), assignment_count=count)
+                    for (link_model, lookup), count in links.items()
+                    if link_model is model
+                ],
+                batch_size=batch_size,
+            )
+    return len(links)
+
+
+def verify():
+    """
+    Returns a list of (model, lookup, stored, expected) for every link row
+    that differs from a fresh computation
+    """
+    expected = compute_links()
+
+    stored = {}
+    for model, fields in LINKS.items():
+        for row in model.objects.values(*fields, "assignment_count"):
+            lookup = tuple((field, row[field]) for field in fields)
+            stored[model, lookup] = row["assignment_count"]
+
+    mismatches = []
+    for key in sorted(set(stored) | set(expected), key=lambda k: (k[0].__name__, k[1])):
+        have, want = stored.get(key, 0), expected.get(key, 0)
+        if have != want:
+            mismatches.append((key[0], dict(key[1]), have, want))
+    return mismatches
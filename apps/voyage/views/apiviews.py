@@ -0,0 +1,348 @@
+"""
+API views for voyage app
+"""
+import uuid
+
+from celery.backends.base import DisabledBackend
+from celery.result import AsyncResult
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import models
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
+from kombu.exceptions import OperationalError
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.fields import BooleanField
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from apps.voyage.models import (
+    Assignment,
+    Content,
+    Course,
+    Faculty,
+    FacultyCourse,
+    Program,
+    ProgramCourseRollup,
+    Student,
+    StudentAssignment,
+)
+from apps.voyage.serializers import (
+    AssignmentSerializer,
+    CourseSerializer,
+    FacultySerializer,
+    GradeEntrySerializer,
+    ProgramSerializer,
+    StudentAssignmentSerializer,
+    StudentSerializer,
+    requested_fields,
+)
+from apps.voyage.tasks import IMPORTS, import_csv
+from apps.voyage.utils import subquery_avg, subquery_count
+from apps.voyage.utils.grading import bulk_grade
+from apps.voyage.utils.pagination import PrimaryKeyCursorPagination
+
+# upper bound on the entries of one bulk grading request
+MAX_GRADE_ENTRIES = 10000
+
+
+class VoyageViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Base read-only viewset. Lists are cursor paginated, aggregate fields are
+    annotated in the list query only when they are requested with ?fields=,
+    and filter_params maps query parameters to queryset lookups; values of
+    boolean fields are parsed like serializer input, e.g. ?is_active=false.
+    """
+
+    permission_classes = [IsAdminUser]
+    pagination_class = PrimaryKeyCursorPagination
+    filter_params = {}
+    prefetch = {}
+    query_budget = 5
+
+    def get_annotations(self):
+        """
+        Returns {field name: expression} for the aggregate fields
+        """
+        return {}
+
+    def get_queryset(self):
+        """
+        Applies the filters, and the annotations and prefetches of the
+        requested fields
+        """
+        queryset = super().get_queryset()
+        wanted = requested_fields(self.request)
+
+        annotations = {
+            name: expression
+            for name, expression in self.get_annotations().items()
+            if wanted is None or name in wanted
+        }
+        prefetches = [
+            lookup
+            for name, lookup in self.prefetch.items()
+            if wanted is None or name in wanted
+        ]
+
+        try:
+            queryset = queryset.filter(**self.get_filters())
+        except (ValueError, DjangoValidationError) as error:
+            raise ValidationError({"filters": str(error)})
+
+        return queryset.annotate(**annotations).prefetch_related(*prefetches)
+
+    def get_filters(self):
+        """
+        Returns the lookups of the filter parameters given in the request
+        """
+        filters = {}
+        for param, lookup in self.filter_params.items():
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            model = self.queryset.model
+            for name in lookup.split(LOOKUP_SEP):
+                field = model._meta.get_field(name)
+                model = field.related_model
+            if isinstance(field, models.BooleanField):
+                try:
+                    value = BooleanField().to_internal_value(value)
+                except ValidationError as error:
+                    raise ValidationError({param: error.detail})
+            filters[lookup] = value
+        return filters
+
+
+class FacultyViewSet(VoyageViewSet):
+    """
+    Faculty members with their content and course, assignment and grading counts
+    """
+
+    queryset = Faculty.objects.select_related("user")
+    serializer_class = FacultySerializer
+    filter_params = {"is_active": "is_active"}
+    prefetch = {
+        "content": Prefetch(
+            "content_set",
+            queryset=Content.objects.only("id", "name", "repo", "faculty"),
+        )
+    }
+
+    def get_annotations(self):
+        return {
+            "courses_count": subquery_count(FacultyCourse.objects.all(), "faculty"),
+            "assignments_count": subquery_count(
+                Assignment.objects.all(), "content__faculty"
+            ),
+            "graded_count": subquery_count(
+                StudentAssignment.objects.filter(grade__isnull=False), "reviewer"
+            ),
+        }
+
+
+class StudentViewSet(VoyageViewSet):
+    """
+    Students with their assignment, submission and grade figures
+    """
+
+    queryset = Student.objects.select_related("user", "program")
+    serializer_class = StudentSerializer
+    filter_params = {"program": "program_id", "is_active": "is_active"}
+
+    def get_annotations(self):
+        return {
+            "assignments_count": subquery_count(
+                Assignment.objects.all(), "program", outer_ref="program"
+            ),
+            "submitted_count": subquery_count(
+                StudentAssignment.objects.filter(submitted__isnull=False), "student"
+            ),
+            "avg_grade": subquery_avg(
+                StudentAssignment.objects.filter(grade__isnull=False),
+                "student",
+                "grade",
+            ),
+        }
+
+
+class ProgramViewSet(VoyageViewSet):
+    """
+    Programs with their course and student counts
+    """
+
+    queryset = Program.objects.all()
+    serializer_class = ProgramSerializer
+
+    def get_annotations(self):
+        return {
+            "courses_count": subquery_count(
+                ProgramCourseRollup.objects.all(), "program"
+            ),
+            "students_count": subquery_count(Student.objects.all(), "program"),
+        }
+
+
+class CourseViewSet(VoyageViewSet):
+    """
+    Courses with their assignment, submission and grade figures
+    """
+
+    queryset = Course.objects.all()
+    serializer_class = CourseSerializer
+
+    def get_annotations(self):
+        return {
+            "assignments_count": subquery_count(Assignment.objects.all(), "course"),
+            "submissions_count": subquery_count(
+                StudentAssignment.objects.filter(submitted__isnull=False),
+                "assignment__course",
+            ),
+            "avg_grade": subquery_avg(
+                StudentAssignment.objects.filter(grade__isnull=False),
+                "assignment__course",
+                "grade",
+            ),
+        }
+
+
+class AssignmentViewSet(VoyageViewSet):
+    """
+    Assignments with their submission and grade figures
+    """
+
+    queryset = Assignment.objects.select_related("program", "course", "content")
+    serializer_class = AssignmentSerializer
+    filter_params = {
+        "program": "program_id",
+        "course": "course_id",
+        "faculty": "content__faculty_id",
+    }
+
+    def get_annotations(self):
+        return {
+            "submissions_count": subquery_count(
+                StudentAssignment.objects.filter(submitted__isnull=False),
+                "assignment",
+            ),
+            "graded_count": subquery_count(
+                StudentAssignment.objects.filter(grade__isnull=False), "assignment"
+            ),
+            "avg_grade": subquery_avg(
+                StudentAssignment.objects.filter(grade__isnull=False),
+                "assignment",
+                "grade",
+            ),
+        }
+
+
+class StudentAssignmentViewSet(VoyageViewSet):
+    """
+    Submissions and their grading details
+    """
+
+    queryset = StudentAssignment.objects.all()
+    serializer_class = StudentAssignmentSerializer
+    filter_params = {
+        "student": "student_id",
+        "assignment": "assignment_id",
+        "reviewer": "reviewer_id",
+        "course": "assignment__course_id",
+        "program": "assignment__program_id",
+    }
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[IsAuthenticated],
+        query_budget=12,
+    )
+    def grade(self, request):
+        """
+        Grades a list of {student_assignment_id, grade, feedback} entries as
+        the calling faculty member. Valid rows are saved even when others fail;
+        the response lists the number graded and the errors by entry index.
+        """
+        faculty = Faculty.objects.filter(user=request.user).first()
+        if faculty is None:
+            raise PermissionDenied("Only faculty members can grade.")
+        if not isinstance(request.data, list):
+            raise ValidationError("Expected a list of grades.")
+        if len(request.data) > MAX_GRADE_ENTRIES:
+            raise ValidationError(f"At most {MAX_GRADE_ENTRIES} grades per request.")
+
+        entries, errors = [], []
+        for index, data in enumerate(request.data):
+            serializer = GradeEntrySerializer(data=data)
+            if serializer.is_valid():
+                entries.append((index, serializer.validated_data))
+            else:
+                errors.append(
+                    {
+                        "index": index,
+                        "student_assignment_id": (
+                            data.get("student_assignment_id")
+                            if isinstance(data, dict)
+                            else None
+                        ),
+                        "errors": serializer.errors,
+                    }
+                )
+
+        graded, rejected = bulk_grade(faculty, entries, user=request.user)
+        errors = sorted(errors + rejected, key=lambda error: error["index"])
+        return Response({"graded": graded, "errors": errors})
+
+
+class ImportViewSet(viewsets.ViewSet):
+    """
+    Starts CSV roster and grade imports as background tasks and reports
+    their progress
+    """
+
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def create(self, request):
+        """
+        Stores the uploaded file and queues its import. Expects the multipart
+        fields kind (roster or grades) and file. Answers 503, dropping the
+        file, when the broker can't be reached.
+        """
+        kind = request.data.get("kind")
+        upload = request.FILES.get("file")
+        if kind not in IMPORTS:
+            raise ValidationError({"kind": f"One of {', '.join(IMPORTS)}."})
+        if upload is None:
+            raise ValidationError({"file": "A CSV file is required."})
+
+        name = default_storage.save(f"imports/{uuid.uuid4().hex}-{kind}.csv", upload)
+        try:
+            result = import_csv.delay(kind, name)
+        except OperationalError:
+            default_storage.delete(name)
+            return Response(
+                {"detail": "The import queue is unavailable, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return Response({"id": result.id}, status=status.HTTP_202_ACCEPTED)
+
+    def retrieve(self, request, pk=None):
+        """
+        Returns the state of an import with its running counts or summary
+        """
+        result = AsyncResult(pk, app=import_csv.app)
+        if isinstance(result.backend, DisabledBackend):
+            return Response(
+                {"id": pk, "detail": "No Celery result backend is configured."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        data = {"id": pk, "state": result.state}
+        if result.state == "FAILURE":
+            data["error"] = str(result.info)
+        elif isinstance(result.info, dict):
+            data["summary"] = result.info
+        return Response(data)
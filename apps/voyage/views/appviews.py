@@ -1,14 +1,25 @@
 """
 views for voyage app
 """
-from django.views.generic import DetailView, ListView, TemplateView
-from django.http import HttpResponseRedirect
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.views.generic import DetailView, ListView, TemplateView, View
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse_lazy
-from django.db.models import Count, Avg
 from django.shortcuts import render
 
-from apps.voyage.models import Faculty, Student, Assignment
+from apps.voyage.models import (
+    Faculty,
+    Student,
+    Course,
+    Program,
+    Assignment,
+    ProgramCourseRollup,
+)
 from apps.voyage.forms import CreateCourseForm, CreateAssignmentForm
+from apps.voyage.utils import caching
+from apps.voyage.utils.dashboards import faculty_dashboard, student_dashboard
+from apps.voyage.utils.exports import csv_chunks, gradebook_rows, gzip_chunks
 from qux.seo.mixin import SEOMixin
 
 
@@ -22,11 +33,12 @@ class VoyageDefaultView(SEOMixin, TemplateView):
 
 class FacultyListView(ListView):
     """
-    View for listing all faculty members.
+    View for listing all faculty members with the courses they teach,
+    prefetched for the whole list in one query.
     """
 
     template_name = "voyage/faculty_list.html"
-    model = Faculty
+    queryset = Faculty.objects.select_related("user").prefetch_related("courses")
     context_object_name = "faculties"
 
 
@@ -36,29 +48,43 @@ class FacultyDashboardView(DetailView):
     """
 
     template_name = "voyage/faculty_dashboard.html"
-    model = Faculty
+    queryset = Faculty.objects.select_related("user")
     context_object_name = "faculty"
+    query_budget = 6
 
     def get_context_data(self, **kwargs):
         """
         Override to add additional context data, such as the courses taught by the faculty.
+        Student and assignment counts per course come from one grouped query,
+        cached until one of the faculty's courses changes. The grade statistics
+        span every program teaching those courses, so their grades count too.
         """
         context = super().get_context_data(**kwargs)
-        faculty = self.get_object()
-        courses_taught = faculty.courses()
-
-        context["courses_taught"] = courses_taught
-
+        faculty = self.object
+        programs = (
+            ProgramCourseRollup.objects.filter(course__facultycourse__faculty=faculty)
+            .values_list("program_id", flat=True)
+            .distinct()
+        )
+        token = caching.version(
+            ("faculty", faculty.pk), *(("program", pk) for pk in programs)
+        )
+        context["courses_taught"] = caching.get_or_set(
+            "faculty_dashboard", token, faculty_dashboard, faculty
+        )
+        context["dashboard_version"] = token
+        context["dashboard_timeout"] = settings.DASHBOARD_CACHE_TIMEOUT
         return context
 
 
 class StudentListView(ListView):
     """
-    View for listing all students.
+    View for listing all students with the courses of their program,
+    prefetched for the whole list in one query.
     """
 
-    model = Student
-    template_name = "student_list.html"
+    queryset = Student.objects.select_related("user").prefetch_related("courses")
+    template_name = "voyage/student_list.html"
     context_object_name = "students"
 
 
@@ -67,47 +93,27 @@ class StudentDashboardView(DetailView):
     View for displaying the dashboard of a specific student.
     """
 
-    model = Student
+    queryset = Student.objects.select_related("user", "program")
     template_name = "voyage/student_dashboard.html"
     context_object_name = "student"
+    query_budget = 6
 
     def get_context_data(self, **kwargs):
         """
         Override to add additional context data, such as the courses,
-        assignments, grades, and submissions of the student.
+        assignments, grades, and submissions of the student, cached until the
+        student or an assignment or submission of their program changes.
         """
         context = super().get_context_data(**kwargs)
         student = self.object
-
-        courses = student.courses()
-
-        assignments_counts = (
-            Assignment.objects.filter(course__in=courses)
-            .values("course__name")
-            .annotate(num_assignments=Count("id"))
+        token = caching.version(
+            ("student", student.pk), ("program", student.program_id)
         )
-
-        assignments = Assignment.objects.filter(
-            program=student.program,
-            course__in=courses,
-        )
-
-        avg_grades = assignments.values("id", "content__name").annotate(
-            avg_grade=Avg("studentassignment__grade")
-        )
-
-        submissions = student.assignments_submitted()
-
-        submissions_counts = assignments.values("content__name").annotate(
-            num_submissions=Count("studentassignment")
+        context["dashboard"] = caching.get_or_set(
+            "student_dashboard", token, student_dashboard, student
         )
-
-        context["courses"] = courses
-        context["assignments_counts"] = assignments_counts
-        context["avg_grades"] = avg_grades
-        context["submissions"] = submissions
-        context["submissions_counts"] = submissions_counts
-
+        context["dashboard_version"] = token
+        context["dashboard_timeout"] = settings.DASHBOARD_CACHE_TIMEOUT
         return context
 
 
@@ -161,3 +167,51 @@ class CreateNewAssignment(TemplateView):
             form.save()
             return HttpResponseRedirect(reverse_lazy("faculty_list"))
         return render(request, self.template_name, {"form": form})
+
+
+class GradebookExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Streams the gradebook of a program, course or assignment as CSV, gzipped
+    with ?gzip=1. Rows are read and written in chunks, so memory stays flat
+    and the download starts before the whole query has been read.
+    """
+
+    models = {"program": Program, "course": Course, "assignment": Assignment}
+
+    def test_func(self):
+        """
+        Staff can export any gradebook, faculty only those of the programs,
+        courses and assignments they teach
+        """
+        user = self.request.user
+        if user.is_staff:
+            return True
+        faculty = Faculty.objects.filter(user=user).first()
+        if faculty is None:
+            return False
+        taught = {
+            "program": faculty.programs,
+            "course": faculty.courses,
+            "assignment": faculty.assignments,
+        }.get(self.kwargs["scope"])
+        return taught is not None and taught().filter(pk=self.kwargs["pk"]).exists()
+
+    def get(self, request, scope, pk):
+        """
+        Returns the streaming CSV response
+        """
+        model = self.models.get(scope)
+        if model is None or not model.objects.filter(pk=pk).exists():
+            raise Http404(f"No {scope} {pk}")
+
+        chunks = csv_chunks(gradebook_rows(scope, pk))
+        filename = f"gradebook-{scope}-{pk}.csv"
+        if request.GET.get("gzip"):
+            response = StreamingHttpResponse(
+                gzip_chunks(chunks), content_type="application/gzip"
+            )
+            filename += ".gz"
+        else:
+            response = StreamingHttpResponse(chunks, content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
@@ -37,7 +37,6 @@ INSTALLED_APPS = [
     "django.contrib.sitemaps",
     "django_extensions",
     "rest_framework",
-    "debug_toolbar",
     "impersonate",
     "qux",
     "qux.seo",
@@ -46,11 +45,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "apps.voyage.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "apps.voyage.middleware.QueryMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -58,6 +58,14 @@ MIDDLEWARE = [
     "htmlmin.middleware.MarkRequestMiddleware",
 ]
 
+# Django Debug Toolbar is too heavy to run outside development
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.csrf.CsrfViewMiddleware") + 1,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -203,5 +211,95 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# Query metrics (apps.voyage.middleware.QueryMetricsMiddleware)
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "").lower() == "true"
+QUERY_DUPLICATE_THRESHOLD = int(os.getenv("QUERY_DUPLICATE_THRESHOLD", 5))
+
+# Sampling profiler (apps.voyage.middleware.ProfilingMiddleware), off unless
+# PROFILING_DIR is set
+PROFILING_DIR = os.getenv("PROFILING_DIR", None)
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_PATHS = ["/admin/", "/dashboard/"]
+PROFILING_HEADER = "X-Profile"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", None)
+
+# Celery (project/celery.py reads the CELERY_ settings). Task progress and
+# results, e.g. of CSV imports, need a result backend. Tasks run in process
+# by default when DEBUG is on or no broker is configured, so development
+# doesn't need a worker. Publishing gives up on an unreachable broker after
+# one attempt of CELERY_BROKER_CONNECTION_TIMEOUT seconds, and
+# apps.voyage.tasks.enqueue then runs the task in process.
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", None)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", None)
+CELERY_TASK_ALWAYS_EAGER = (
+    os.getenv("CELERY_TASK_ALWAYS_EAGER", str(DEBUG or not CELERY_BROKER_URL)).lower()
+    == "true"
+)
+CELERY_BROKER_CONNECTION_TIMEOUT = float(
+    os.getenv("CELERY_BROKER_CONNECTION_TIMEOUT", 1)
+)
+CELERY_BROKER_TRANSPORT_OPTIONS = {"max_retries": 0}
+CELERY_TASK_TRACK_STARTED = True
+
+# Cache of the dashboards (apps/voyage/utils/caching.py) and admin counts.
+# CACHE_BACKEND is "locmem", "file" or "redis" (needs the redis package).
+# locmem is per process, so run several worker processes with file (one
+# host) or redis. locmem and file hold at most CACHE_MAX_ENTRIES, evicting a
+# tenth of them when full, least recently used first on locmem; bound Redis
+# with maxmemory and maxmemory-policy allkeys-lru.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHE_LOCATION = os.getenv("CACHE_LOCATION", None)
+CACHE_OPTIONS = {
+    "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000)),
+    "CULL_FREQUENCY": 10,
+}
+CACHES = {
+    "default": {
+        "locmem": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": CACHE_LOCATION or "voyage",
+            "OPTIONS": CACHE_OPTIONS,
+        },
+        "file": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_LOCATION or str(BASE_DIR / "var" / "cache"),
+            "OPTIONS": CACHE_OPTIONS,
+        },
+        "redis": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_LOCATION or "redis://localhost:6379/0",
+        },
+    }[CACHE_BACKEND]
+}
+# cached dashboards are invalidated by version, the timeout only bounds the
+# staleness of what isn't versioned, e.g. course names and usernames
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 3600))
+
+# Student repo provisioning (apps/voyage/utils/provisioning.py) is off until
+# REPO_TARGET_URL is set. It is formatted with github, content (the slugified
+# content name), assignment and student, e.g.
+# git@github.com:{github}/{content}.git or file:///srv/repos/{github}/{content}.git
+# Remote targets must accept pushes to new repos; local bare repos are created.
+REPO_TARGET_URL = os.getenv("REPO_TARGET_URL", None)
+REPO_MIRROR_DIR = os.getenv("REPO_MIRROR_DIR", str(BASE_DIR / "var" / "mirrors"))
+REPO_PROVISION_WORKERS = int(os.getenv("REPO_PROVISION_WORKERS", 8))
+REPO_PROVISION_ATTEMPTS = int(os.getenv("REPO_PROVISION_ATTEMPTS", 3))
+REPO_GIT_TIMEOUT = int(os.getenv("REPO_GIT_TIMEOUT", 300))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "apps.voyage.metrics": {
+            "handlers": ["console"],
+            "level": os.getenv("METRICS_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 SITE_HEADER = os.getenv("SITE_HEADER", "Voyage")
 SITE_TITLE = os.getenv("SITE_TITLE", "Voyage from enine.school")